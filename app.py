@@ -37,11 +37,17 @@ with st.sidebar:
 import streamlit as st
 from audiorecorder import audiorecorder
 
-from model_service import process, SCENARIOS, start_conversation, judge_final_evaluation
+from model_service import (process_stream, SCENARIOS, start_conversation, judge_final_evaluation,
+                           new_incremental_judge)
+from conversation_context import ConversationContext
 
 # Initialize session state for conversation history
 if 'conversation_history' not in st.session_state:
     st.session_state.conversation_history = []
+if 'conversation_context' not in st.session_state:
+    st.session_state.conversation_context = ConversationContext()
+if 'turn_judge' not in st.session_state:
+    st.session_state.turn_judge = new_incremental_judge()
 if 'evaluation_history' not in st.session_state:
     st.session_state.evaluation_history = []
 if 'selected_scenario' not in st.session_state:
@@ -90,6 +96,8 @@ selected = st.selectbox(
 if selected != st.session_state.selected_scenario:
     st.session_state.selected_scenario = selected
     st.session_state.conversation_history = []
+    st.session_state.conversation_context = ConversationContext()
+    st.session_state.turn_judge = new_incremental_judge()
     st.session_state.evaluation_history = []
     st.session_state.conversation_complete = False
     st.session_state.conversation_started = False
@@ -175,47 +183,58 @@ with col_chat:
             st.audio(audio_bytes, format='audio/wav')
             
             if st.button("📤 Send & Get Feedback", type="primary", use_container_width=True):
-                with st.spinner('🎯 Transcribing and analyzing your speech...'):
-                    # Get scenario config
-                    scenario_config = SCENARIOS[st.session_state.selected_scenario] if st.session_state.selected_scenario != "free" else None
-                    
-                    try:
-                        transcript, coach, judge = process(
+                # Get scenario config
+                scenario_config = SCENARIOS[st.session_state.selected_scenario] if st.session_state.selected_scenario != "free" else None
+                
+                try:
+                    with st.spinner('🎯 Transcribing your speech...'):
+                        transcript, coach_stream, judge = process_stream(
                             audio_bytes, 
-                            st.session_state.conversation_history,
+                            st.session_state.conversation_context,
                             scenario_config
                         )
+                    
+                    # Judge this turn in the background while the coach replies
+                    st.session_state.turn_judge.submit(len(st.session_state.conversation_history) + 1, transcript)
+
+                    st.markdown("**🧑 You said:**")
+                    st.info(transcript)
+                    st.markdown("**🤖 Coach:**")
+                    # Coach text appears as Gemini streams it; the completion marker is stripped on the fly
+                    st.write_stream(coach_stream)
+                    coach = coach_stream.text
+                    
+                    # Check if conversation is complete
+                    if coach_stream.is_complete:
+                        st.session_state.conversation_complete = True
                         
-                        # Check if conversation is complete
-                        if "[CONVERSATION_COMPLETE]" in coach:
-                            st.session_state.conversation_complete = True
-                            coach = coach.replace("[CONVERSATION_COMPLETE]", "").strip()
-                            
-                            # Generate final IELTS evaluation
-                            with st.spinner('📊 Generating final IELTS evaluation...'):
-                                st.session_state.final_evaluation = judge_final_evaluation(
-                                    st.session_state.conversation_history + [{'user': transcript, 'coach': coach}]
-                                )
-                        
-                        # Add to conversation history
-                        st.session_state.conversation_history.append({
-                            'user': transcript,
-                            'transcript': transcript,  # Store transcript separately
-                            'coach': coach
-                        })
-                        
-                        # Don't store per-turn evaluations anymore - just note the turn
-                        st.session_state.evaluation_history.append({
-                            'turn': len(st.session_state.conversation_history),
-                            'transcript': transcript,
-                            'evaluation': judge  # This is just a note now
-                        })
-                        
-                        st.rerun()
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error: {str(e)}")
-                        st.info("💡 Tip: Make sure your audio is clear and in WAV format. Try recording again.")
+                        # Generate final IELTS evaluation
+                        with st.spinner('📊 Generating final IELTS evaluation...'):
+                            st.session_state.final_evaluation = judge_final_evaluation(
+                                st.session_state.conversation_history + [{'user': transcript, 'coach': coach}],
+                                judge=st.session_state.turn_judge
+                            )
+                    
+                    # Add to conversation history
+                    st.session_state.conversation_history.append({
+                        'user': transcript,
+                        'transcript': transcript,  # Store transcript separately
+                        'coach': coach
+                    })
+                    st.session_state.conversation_context.append(transcript, coach)
+                    
+                    # Don't store per-turn evaluations anymore - just note the turn
+                    st.session_state.evaluation_history.append({
+                        'turn': len(st.session_state.conversation_history),
+                        'transcript': transcript,
+                        'evaluation': judge  # This is just a note now
+                    })
+                    
+                    st.rerun()
+                    
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+                    st.info("💡 Tip: Make sure your audio is clear and in WAV format. Try recording again.")
 
 with col_eval:
     st.header("⚖️ IELTS Evaluation")
@@ -251,6 +270,8 @@ with st.sidebar:
     st.header("🔧 Controls")
     if st.button("� Start New Conversation", use_container_width=True):
         st.session_state.conversation_history = []
+        st.session_state.conversation_context = ConversationContext()
+        st.session_state.turn_judge = new_incremental_judge()
         st.session_state.evaluation_history = []
         st.rerun()
     
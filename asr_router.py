@@ -0,0 +1,296 @@
+"""asr_router.py
+Hedged-request ASR router
+-------------------------
+Sends each utterance to the preferred ASR backend first. If no answer has
+arrived after a hedge delay (by default the primary's rolling p95
+latency), the same audio goes to the next backend too. The first
+successful transcript wins and the other request is cancelled. If the
+primary fails before the delay, the hedge starts straight away.
+
+Backends are ranked by rolling latency and error rate, so a backend that
+keeps failing or slowing down stops being tried first. Each backend also
+has a circuit breaker (circuit_breaker.py). While it is open, the backend
+is ranked last and refuses calls at once, so the router goes straight to
+the next one.
+
+A sync call that loses the race can't be cancelled once its thread has
+picked it up, and it holds a pool thread until it returns. Backends that
+can hang take an `attempt_timeout`, which is passed to their callables as
+`timeout=` so a loser frees its thread in bounded time. stats() reports
+how many pool threads are busy and how many losers were left running.
+
+Usage:
+    router = HedgedASRRouter([
+        ASRBackend("Typhoon", typhoon.transcribe, typhoon.atranscribe),
+        ASRBackend("Gemini", gemini_transcribe, agemini_transcribe),
+    ])
+    text = router.transcribe(audio_bytes)          # or: await router.atranscribe(...)
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from circuit_breaker import CLOSED, CircuitBreaker, CircuitOpenError
+
+class BackendStats:
+    """Rolling outcome window for one backend: (ok, seconds) per call."""
+
+    def __init__(self, size: int = 100):
+        self.outcomes = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self.outcomes.append((ok, seconds))
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.outcomes.clear()
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def latency(self, q: float) -> float | None:
+        ordered = sorted(s for ok, s in self.outcomes if ok)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        p50, p95 = self.latency(0.50), self.latency(0.95)
+        return {
+            "calls": len(self.outcomes),
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+class ASRBackend:
+    """One transcription backend: sync and async callables `(audio_bytes, language_code, **options) -> str`.
+
+    Options (e.g. `mime_type`) are forwarded untouched; they are only passed when given.
+    Calls go through `breaker`; while it is open they raise CircuitOpenError immediately.
+    With `attempt_timeout` set, the callables also get `timeout=attempt_timeout` and must
+    give up after that many seconds.
+    """
+
+    def __init__(self, name: str, transcribe, atranscribe=None, window: int = 100,
+                 breaker: CircuitBreaker | None = None, attempt_timeout: float | None = None):
+        self.name = name
+        self._transcribe = transcribe
+        self._atranscribe = atranscribe
+        self.stats = BackendStats(window)
+        self.breaker = breaker or CircuitBreaker(name)
+        self.attempt_timeout = attempt_timeout
+
+    def _options(self, options: dict) -> dict:
+        if self.attempt_timeout is None:
+            return options
+        return {**options, "timeout": self.attempt_timeout}
+
+    def _admit(self) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def _record(self, ok: bool, start: float, error: Exception | None = None) -> None:
+        seconds = time.perf_counter() - start
+        recovering = self.breaker.state != CLOSED
+        self.breaker.record(ok, seconds, error)
+        if recovering and self.breaker.state == CLOSED:
+            self.stats.clear()  # the outage's failures no longer describe this backend
+        self.stats.record(ok, seconds)
+
+    def transcribe(self, audio_bytes: bytes, language_code: str, **options) -> str:
+        self._admit()
+        start = time.perf_counter()
+        try:
+            text = self._transcribe(audio_bytes, language_code, **self._options(options))
+        except Exception as e:
+            self._record(False, start, e)
+            raise
+        self._record(True, start)
+        return text
+
+    async def atranscribe(self, audio_bytes: bytes, language_code: str, **options) -> str:
+        self._admit()
+        start = time.perf_counter()
+        try:
+            options = self._options(options)
+            if self._atranscribe is not None:
+                text = await self._atranscribe(audio_bytes, language_code, **options)
+            else:
+                text = await asyncio.to_thread(self._transcribe, audio_bytes, language_code, **options)
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise  # lost the race: not a failure
+        except Exception as e:
+            self._record(False, start, e)
+            raise
+        self._record(True, start)
+        return text
+
+class HedgedASRRouter:
+    """Route transcriptions across backends with a p95-based hedge."""
+
+    def __init__(self, backends: list, hedge_delay: float | None = None,
+                 default_delay: float = 3.0, min_delay: float = 0.25, max_delay: float = 15.0,
+                 min_samples: int = 5, hedge: bool = True, max_workers: int = 16):
+        self.backends = list(backends)
+        self.hedge_delay = hedge_delay      # fixed delay; None = primary's rolling p95
+        self.default_delay = default_delay  # used until the primary has min_samples
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.hedges = 0
+        self.wins = {b.name: 0 for b in self.backends}
+        self.max_workers = max_workers
+        self.busy = 0                       # sync calls submitted to the pool and not finished
+        self.abandoned = 0                  # sync calls that lost the race and were left running
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asr-hedge")
+
+    def _submit(self, backend: ASRBackend, *args, **options):
+        with self._lock:
+            self.busy += 1
+        # run in a copy of the caller's context: its rate priority and trace follow the call
+        future = self._pool.submit(contextvars.copy_context().run, backend.transcribe, *args, **options)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _future) -> None:
+        with self._lock:
+            self.busy -= 1
+
+    # ----- policy -----
+    def _score(self, backend: ASRBackend) -> float:
+        """Expected seconds to a good answer; lower is better."""
+        if len(backend.stats) < self.min_samples:
+            # not enough data: assume the default hedge delay, so an untried backup
+            # doesn't overtake a measured healthy primary (ties keep configured order)
+            return self.default_delay
+        p50 = backend.stats.latency(0.50)
+        if p50 is None:
+            return float("inf")  # nothing but failures in the window
+        return p50 / max(1.0 - backend.stats.error_rate, 0.05)
+
+    def _circuit_rank(self, backend: ASRBackend) -> int:
+        # a backend due a probe goes first once (the hedge covers it if it hangs);
+        # one whose circuit is open goes last and would be refused anyway
+        if backend.breaker.probe_due:
+            return 0
+        return 1 if backend.breaker.available else 2
+
+    def ranked(self) -> list:
+        """Backends best-first (probes first, open circuits last); configured order breaks ties."""
+        return sorted(self.backends,
+                      key=lambda b: (self._circuit_rank(b), self._score(b), self.backends.index(b)))
+
+    def delay_for(self, backend: ASRBackend) -> float:
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        p95 = backend.stats.latency(0.95)
+        if len(backend.stats) < self.min_samples or p95 is None:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, p95))
+
+    def _failed(self, errors: dict) -> RuntimeError:
+        lines = "\n".join(f"{name}: {err}" for name, err in errors.items())
+        msg = f"All ASR backends failed.\n{lines}"
+        print(msg)
+        return RuntimeError(msg)
+
+    # ----- sync -----
+    def transcribe(self, audio_bytes: bytes, language_code: str = "auto", **options) -> str:
+        order = self.ranked()
+        errors = {}
+        running = {}
+        queue = list(order)
+
+        def launch():
+            backend = queue.pop(0)
+            running[self._submit(backend, audio_bytes, language_code, **options)] = backend
+
+        launch()
+        while running:
+            timeout = self.delay_for(running[next(iter(running))]) if self.hedge and queue else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:  # primary is slow: hedge
+                self.hedges += 1
+                launch()
+                continue
+            for future in done:
+                backend = running.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"{backend.name} ASR failed: {e}")
+                    errors[backend.name] = e
+                    continue
+                for other in running:
+                    if not other.cancel():  # queued: dropped; already running: result ignored
+                        with self._lock:
+                            self.abandoned += 1
+                self.wins[backend.name] += 1
+                return text
+            if queue and (not running or not self.hedge):
+                launch()
+        raise self._failed(errors)
+
+    # ----- async -----
+    async def atranscribe(self, audio_bytes: bytes, language_code: str = "auto", **options) -> str:
+        order = self.ranked()
+        errors = {}
+        running = {}
+        queue = list(order)
+
+        def launch():
+            backend = queue.pop(0)
+            running[asyncio.ensure_future(backend.atranscribe(audio_bytes, language_code, **options))] = backend
+
+        launch()
+        try:
+            while running:
+                timeout = self.delay_for(running[next(iter(running))]) if self.hedge and queue else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    backend = running.pop(task)
+                    try:
+                        text = task.result()
+                    except Exception as e:
+                        print(f"{backend.name} ASR failed: {e}")
+                        errors[backend.name] = e
+                        continue
+                    self.wins[backend.name] += 1
+                    return text
+                if queue and (not running or not self.hedge):
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+        raise self._failed(errors)
+
+    def stats(self) -> dict:
+        return {
+            "order": [b.name for b in self.ranked()],
+            "hedges": self.hedges,
+            "wins": dict(self.wins),
+            "pool": {"workers": self.max_workers, "busy": self.busy, "abandoned": self.abandoned},
+            "backends": {b.name: {**b.stats.summary(), "hedge_delay_s": round(self.delay_for(b), 3),
+                                  "circuit": b.breaker.snapshot()}
+                         for b in self.backends},
+        }
@@ -0,0 +1,243 @@
+"""audio_preprocess.py
+Audio preprocessing in front of ASR
+-----------------------------------
+decode -> downmix to mono -> resample to 16 kHz -> trim leading/trailing
+silence (NumPy energy VAD) -> encode (WAV by default, FLAC/Opus optional)
+
+Browser/Streamlit recordings arrive as 44.1/48 kHz stereo WAV. ASR models
+work at 16 kHz mono, so sending the raw clip mostly uploads bytes that are
+thrown away server-side. Anything that cannot be decoded is passed through
+unchanged.
+
+Optional deps:
+  soundfile -> FLAC encoding        pydub + ffmpeg -> non-WAV input, Opus
+  scipy     -> polyphase resampling (NumPy FIR fallback otherwise)
+
+Env vars:
+  AUDIO_PREPROCESS=1   AUDIO_ENCODE=wav|flac|opus
+"""
+
+import io
+import os
+import threading
+import time
+import wave
+from dataclasses import dataclass, field
+
+import numpy as np
+
+TARGET_RATE = 16000
+FRAME_MS    = 30
+PAD_MS      = 200          # speech kept either side of the VAD boundaries
+MIN_DB      = -50.0        # frames quieter than this are never speech
+MARGIN_DB   = 12.0         # speech must be this far above the noise floor
+
+ENCODE = os.getenv("AUDIO_ENCODE", "wav").lower()
+ENABLED = os.getenv("AUDIO_PREPROCESS", "1") != "0"
+
+MIME_TYPES = {"wav": "audio/wav", "flac": "audio/flac", "opus": "audio/ogg"}
+
+@dataclass
+class PreparedAudio:
+    data: bytes                   # bytes to upload
+    mime_type: str
+    pcm: np.ndarray | None        # int16 mono @ sample_rate (None if passed through)
+    sample_rate: int
+    original_bytes: int
+    trimmed_s: float = 0.0
+    stage_ms: dict = field(default_factory=dict)
+
+    @property
+    def filename(self) -> str:
+        return "audio." + {"audio/flac": "flac", "audio/ogg": "ogg"}.get(self.mime_type, "wav")
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.pcm) / self.sample_rate if self.pcm is not None else 0.0
+
+# ---------- Stages ----------
+def decode(audio_bytes: bytes) -> tuple[np.ndarray, int]:
+    """Return (float32 samples shaped (frames, channels) in [-1, 1], sample rate)."""
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as w:
+            channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return _decode_with_pydub(audio_bytes)
+    if width == 1:
+        samples = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, "<i2").astype(np.float32) / 32768
+    elif width == 3:
+        b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608
+    else:
+        samples = np.frombuffer(raw, "<i4").astype(np.float32) / 2147483648
+    return samples.reshape(-1, channels), rate
+
+def _decode_with_pydub(audio_bytes: bytes) -> tuple[np.ndarray, int]:
+    from pydub import AudioSegment  # optional; raises ImportError if missing
+    seg = AudioSegment.from_file(io.BytesIO(audio_bytes))
+    ints = np.array(seg.get_array_of_samples()).astype(np.float32)
+    return ints.reshape(-1, seg.channels) / float(1 << (8 * seg.sample_width - 1)), seg.frame_rate
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    # column-wise adds are several times faster than mean(axis=1) on interleaved frames
+    mono = samples[:, 0].copy()
+    for c in range(1, samples.shape[1]):
+        mono += samples[:, c]
+    if samples.shape[1] > 1:
+        mono *= 1.0 / samples.shape[1]
+    return mono
+
+def _lowpass_taps(cutoff: float, taps: int = 101) -> np.ndarray:
+    """Windowed-sinc FIR low-pass; cutoff as a fraction of the input rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (h / h.sum()).astype(np.float32)
+
+def resample(mono: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    if rate == target or len(mono) == 0:
+        return mono
+    try:
+        from math import gcd
+        from scipy.signal import resample_poly
+        g = gcd(rate, target)
+        return resample_poly(mono, target // g, rate // g).astype(np.float32)
+    except ImportError:
+        pass
+    if target < rate:  # anti-alias before decimating
+        mono = np.convolve(mono, _lowpass_taps(0.5 * target / rate * 0.9), mode="same")
+    n_out = int(round(len(mono) * target / rate))
+    positions = np.arange(n_out) * (rate / target)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+def frame_db(mono: np.ndarray, rate: int, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """RMS level (dBFS) of consecutive non-overlapping frames."""
+    size = max(1, rate * frame_ms // 1000)
+    n = len(mono) // size
+    if n == 0:
+        return np.zeros(0, np.float32)
+    frames = mono[:n * size].reshape(n, size)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms + 1e-10)
+
+def speech_mask(db: np.ndarray) -> np.ndarray:
+    """Energy VAD: frames well above the noise floor (10th percentile level)."""
+    if len(db) == 0:
+        return np.zeros(0, bool)
+    threshold = max(MIN_DB, float(np.percentile(db, 10)) + MARGIN_DB)
+    return db > threshold
+
+def trim_silence(mono: np.ndarray, rate: int) -> np.ndarray:
+    """Cut leading/trailing silence, keeping PAD_MS either side. All-silent clips are kept whole."""
+    mask = speech_mask(frame_db(mono, rate))
+    voiced = np.flatnonzero(mask)
+    if len(voiced) == 0:
+        return mono
+    size = rate * FRAME_MS // 1000
+    pad = rate * PAD_MS // 1000
+    start = max(0, voiced[0] * size - pad)
+    end = min(len(mono), (voiced[-1] + 1) * size + pad)
+    return mono[start:end]
+
+def to_int16(mono: np.ndarray) -> np.ndarray:
+    return (np.clip(mono, -1.0, 1.0) * 32767).astype("<i2")
+
+def encode_wav(pcm: np.ndarray, rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+def encode(pcm: np.ndarray, rate: int, fmt: str = ENCODE) -> tuple[bytes, str]:
+    """Encode int16 mono PCM; falls back to WAV when the optional encoder is missing."""
+    try:
+        if fmt == "flac":
+            import soundfile as sf
+            buf = io.BytesIO()
+            sf.write(buf, pcm, rate, format="FLAC")
+            return buf.getvalue(), MIME_TYPES["flac"]
+        if fmt == "opus":
+            from pydub import AudioSegment
+            seg = AudioSegment(pcm.tobytes(), frame_rate=rate, sample_width=2, channels=1)
+            buf = io.BytesIO()
+            seg.export(buf, format="ogg", codec="libopus", bitrate="24k")
+            return buf.getvalue(), MIME_TYPES["opus"]
+    except Exception as e:
+        _warn_once(f"AUDIO_ENCODE={fmt} unavailable ({e}); sending WAV")
+    return encode_wav(pcm, rate), MIME_TYPES["wav"]
+
+_warned = set()
+
+def _warn_once(msg: str) -> None:
+    if msg not in _warned:
+        _warned.add(msg)
+        print(msg)
+
+# ---------- Pipeline ----------
+_stats_lock = threading.Lock()
+_stats = {"clips": 0, "passthrough": 0, "bytes_in": 0, "bytes_out": 0, "trimmed_s": 0.0, "stage_ms": {}}
+
+def _record(prepared: PreparedAudio, passthrough: bool) -> None:
+    with _stats_lock:
+        _stats["clips"] += 1
+        _stats["passthrough"] += passthrough
+        _stats["bytes_in"] += prepared.original_bytes
+        _stats["bytes_out"] += len(prepared.data)
+        _stats["trimmed_s"] += prepared.trimmed_s
+        for stage, ms in prepared.stage_ms.items():
+            _stats["stage_ms"][stage] = _stats["stage_ms"].get(stage, 0.0) + ms
+
+def preprocess(audio_bytes: bytes, fmt: str = ENCODE, trim: bool = True) -> PreparedAudio:
+    """Run the full pipeline; per-stage cost lands in `PreparedAudio.stage_ms`."""
+    stage_ms = {}
+    t = time.perf_counter()
+
+    def lap(stage):
+        nonlocal t
+        now = time.perf_counter()
+        stage_ms[stage] = (now - t) * 1000
+        t = now
+
+    try:
+        samples, rate = decode(audio_bytes)
+    except Exception as e:
+        _warn_once(f"Audio preprocessing skipped, could not decode input: {e}")
+        prepared = PreparedAudio(audio_bytes, "audio/wav", None, 0, len(audio_bytes))
+        _record(prepared, True)
+        return prepared
+    lap("decode")
+    mono = downmix(samples)
+    lap("downmix")
+    mono = resample(mono, rate)
+    lap("resample")
+    before = len(mono)
+    if trim:
+        mono = trim_silence(mono, TARGET_RATE)
+    lap("vad")
+    pcm = to_int16(mono)
+    data, mime_type = encode(pcm, TARGET_RATE, fmt)
+    lap("encode")
+    prepared = PreparedAudio(data, mime_type, pcm, TARGET_RATE, len(audio_bytes),
+                             trimmed_s=(before - len(mono)) / TARGET_RATE, stage_ms=stage_ms)
+    _record(prepared, False)
+    return prepared
+
+def stats() -> dict:
+    """Totals since start: clips, bytes in/out, trimmed seconds, mean ms per stage."""
+    with _stats_lock:
+        processed = max(1, _stats["clips"] - _stats["passthrough"])
+        return {
+            "clips": _stats["clips"],
+            "passthrough": _stats["passthrough"],
+            "bytes_in": _stats["bytes_in"],
+            "bytes_out": _stats["bytes_out"],
+            "trimmed_s": round(_stats["trimmed_s"], 2),
+            "mean_stage_ms": {k: round(v / processed, 2) for k, v in _stats["stage_ms"].items()},
+        }
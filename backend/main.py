@@ -1,18 +1,31 @@
 """
 FastAPI Backend for English Learning App
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
 import sys
 import os
+import asyncio
 import json
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 load_dotenv()
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from model_service import transcribe, coach_feedback, judge_final_evaluation, start_conversation, SCENARIOS
+from model_service import (atranscribe, acoach_feedback, astream_coach_feedback, ajudge_final_scores, instant_scores,
+                           astart_conversation, aclose, init, warm_model_registry, streaming_metrics, asr_metrics,
+                           live_transcriber, new_incremental_judge, limit_metrics, health, release_context_cache,
+                           context_cache_metrics, opening_metrics, warm_opening_pool, SCENARIOS)
+from rate_governor import BATCH, LIVE, priority
+from session_store import make_session_store
+from shared_state import worker_count
+from drain import Draining, turns
+import audio_preprocess
+import telemetry
+from telemetry import stage, trace
 
 app = FastAPI(title="English Learning API")
 
@@ -24,13 +37,144 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_SECONDS = telemetry.histogram("http_request_seconds", "HTTP request duration (until the response starts)",
+                                   ("method", "route", "status"))
+
+class RequestTimer:
+    """ASGI middleware: http_request_seconds by route template (not raw path, so session ids don't explode labels)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start, status = time.perf_counter(), 500
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                route = scope.get("route")
+                HTTP_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                     route=getattr(route, "path", "unmatched"), status=status)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+app.add_middleware(RequestTimer)
+
+telemetry.callback("inflight_turns", "Turns being processed by this worker", lambda: {(): turns.active})
+
+@app.exception_handler(Draining)
+async def draining_handler(request, exc: Draining):
+    """Shutting down: tell the client (or load balancer) to retry on another worker."""
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1", "Connection": "close"})
+
 class ConversationStart(BaseModel):
     scenario_id: str
 
 class FinalEvaluation(BaseModel):
-    conversation_history: List[dict]
+    session_id: str
+
+sessions = make_session_store()
+
+# Process-local background judge work per session (see incremental_judge.py)
+judges: OrderedDict = OrderedDict()
+final_evaluations: dict = {}   # session_id -> Task precomputing the evaluation
+MAX_JUDGES = 1000
+EVALUATION_WAIT_S = 60   # how long another worker's precomputed evaluation is waited for
+
+def judge_for(session_id: str):
+    judge = judges.get(session_id)
+    if judge is None:
+        judge = judges[session_id] = new_incremental_judge()
+        while len(judges) > MAX_JUDGES:
+            _, old = judges.popitem(last=False)
+            old.cancel()
+    judges.move_to_end(session_id)
+    return judge
+
+async def evaluate(session):
+    """Final evaluation (markdown + typed scores), cached on the session; aggregates per-turn notes when available."""
+    if session.evaluation is None:
+        with priority(BATCH):  # queued behind live and interactive turns
+            result = await ajudge_final_scores(session.context, judges.get(session.id))
+        session.evaluation, session.scores = result.to_markdown(), result.to_dict()
+        sessions.save(session)
+    return session
 
-sessions = {}
+def end_of_turn(session) -> None:
+    """After a turn is saved: once the conversation is complete, free its coach cache and
+    start the final evaluation."""
+    if session.complete:
+        release_context_cache(session.id)
+        precompute_evaluation(session)
+
+def precompute_evaluation(session) -> None:
+    """Conversation just completed: start the final evaluation before the client asks."""
+    if session.complete and session.id not in final_evaluations:
+        session.evaluating = time.time()   # tells the other workers to wait for this one
+        sessions.save(session)
+        task = asyncio.ensure_future(evaluate(session))
+        final_evaluations[session.id] = task
+        turns.track(task)   # a restart finishes it before exiting
+
+        def done(task):
+            final_evaluations.pop(session.id, None)
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Final evaluation precompute failed for {session.id}: {task.exception()}")
+                session.evaluating = None
+                sessions.save(session)
+
+        task.add_done_callback(done)
+
+def evaluation_task(session) -> asyncio.Future:
+    """The session's final evaluation in flight on this worker, started if there is none, so
+    concurrent or repeated requests share one judgment."""
+    task = final_evaluations.get(session.id)
+    if task is None:
+        async def run():
+            return await evaluation_from_other_worker(session) or await evaluate(session)
+
+        task = final_evaluations[session.id] = asyncio.ensure_future(run())
+        turns.track(task)
+        task.add_done_callback(lambda _: final_evaluations.pop(session.id, None))
+    return task
+
+async def evaluation_from_other_worker(session):
+    """The session completed on another worker, which is precomputing its evaluation: poll the
+    shared store for it instead of judging the conversation a second time. None = not coming."""
+    if not (sessions.shared and worker_count() > 1 and session.evaluating):
+        return None
+    while time.time() < session.evaluating + EVALUATION_WAIT_S:
+        await asyncio.sleep(0.25)
+        stored = sessions.get(session.id)
+        if stored is None or not stored.evaluating:
+            return None
+        if stored.evaluation is not None:
+            return stored
+    return None
+
+def get_session(session_id: str):
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return session
+
+def coach_scenario(scenario_id: str):
+    return SCENARIOS.get(scenario_id) if scenario_id != "free" else None
+
+@app.on_event("startup")
+def startup():
+    init()   # fail fast on a missing API key instead of on the first request
+    warm_model_registry()
+    warm_opening_pool()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await turns.drain()   # no-op when serve.py already drained before closing connections
+    await aclose()
 
 @app.get("/")
 def read_root():
@@ -48,36 +192,252 @@ def get_scenarios():
     } for k, v in SCENARIOS.items()]}
 
 @app.post("/api/conversation/start")
-def start_conversation_endpoint(data: ConversationStart):
+async def start_conversation_endpoint(data: ConversationStart):
     try:
         scenario = SCENARIOS.get(data.scenario_id)
-        opening = start_conversation(scenario)
-        return {"success": True, "opening_message": opening, "scenario_id": data.scenario_id}
+        opening = await astart_conversation(scenario)
+        session = sessions.create(data.scenario_id, opening)
+        return {"success": True, "opening_message": opening, "scenario_id": data.scenario_id,
+                "session_id": session.id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/conversation/process")
-async def process_conversation(file: UploadFile = File(...), scenario_id: str = "free", history: str = "[]"):
+async def process_conversation(file: UploadFile = File(...), session_id: str = Form(...)):
+    with turns.turn(), trace("process") as t:
+        with stage("session_load"):
+            session = get_session(session_id)
+        try:
+            with stage("read_upload"):
+                audio_bytes = await file.read()
+            scenario = coach_scenario(session.scenario_id)
+
+            with stage("asr"):
+                transcript = await atranscribe(audio_bytes)
+            judge_for(session.id).asubmit(len(session.turns) + 1, transcript)
+            with stage("coach"):
+                coach_response = await acoach_feedback(transcript, session.context, scenario, session.id)
+
+            is_complete = "[CONVERSATION_COMPLETE]" in coach_response
+            if is_complete:
+                coach_response = coach_response.replace("[CONVERSATION_COMPLETE]", "").strip()
+
+            with stage("save"):
+                session.add_turn(transcript, coach_response)
+                session.complete = session.complete or is_complete
+                sessions.save(session)
+            end_of_turn(session)
+
+            return {"success": True, "transcript": transcript, "coach_response": coach_response,
+                    "is_complete": is_complete, "turn": len(session.turns), "timings_ms": t.timings_ms()}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def coach_turn(session, transcript: str, received: float):
+    """Stream the coach reply for one transcribed turn → (event, data) pairs; saves the session."""
+    judge_for(session.id).asubmit(len(session.turns) + 1, transcript)  # runs alongside the coach
+    stream = astream_coach_feedback(transcript, session.context, coach_scenario(session.scenario_id), session.id)
+    first_token = None
+    async for text in stream:
+        if first_token is None:
+            first_token = time.perf_counter() - received
+        yield "token", {"text": text}
+
+    with stage("save"):
+        session.add_turn(transcript, stream.text)
+        session.complete = session.complete or stream.is_complete
+        sessions.save(session)
+    end_of_turn(session)
+    current = telemetry.current()
+    yield "done", {
+        "coach_response": stream.text,
+        "is_complete": stream.is_complete,
+        "turn": len(session.turns),
+        "ttft_ms": round(stream.ttft * 1000, 1) if stream.ttft is not None else None,
+        "first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+        "total_ms": round((time.perf_counter() - received) * 1000, 1),
+        "timings_ms": current.timings_ms() if current is not None else None,
+    }
+
+@app.post("/api/conversation/stream")
+async def stream_conversation(file: UploadFile = File(...), session_id: str = Form(...)):
+    """Server-Sent Events: `transcript` as soon as ASR finishes, then coach `token`s, then `done`."""
+    turns.admit()
+    session = get_session(session_id)
+    audio_bytes = await file.read()
+    received = time.perf_counter()
+
+    async def events():
+        with trace("stream"):
+            try:
+                turns.begin()
+            except Draining as e:
+                yield sse("error", {"detail": str(e)})
+                return
+            try:
+                with stage("asr"):
+                    transcript = await atranscribe(audio_bytes)
+                yield sse("transcript", {"transcript": transcript})
+                async for event, data in coach_turn(session, transcript, received):
+                    yield sse(event, data)
+            except Exception as e:
+                yield sse("error", {"detail": str(e)})
+            finally:
+                turns.end()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/api/conversation/live")
+async def live_conversation(ws: WebSocket):
+    """Live turns over one WebSocket.
+
+    client: {"type": "start", "session_id", "sample_rate"} → binary int16 mono PCM frames
+            → {"type": "stop"}                               (repeat per turn; a second start
+                                                             discards the unfinished recording)
+    server: "segment" when an utterance ends, "partial" as each segment is transcribed,
+            then "transcript", coach "token"s and "done" like /api/conversation/stream.
+    """
+    await ws.accept()
+    live = session = None
+
+    async def send(event: str, data: dict):
+        await ws.send_json({"type": event, **data})
+
+    async def on_partial(index: int, text: str, transcript: str):
+        await send("partial", {"segment": index, "text": text, "transcript": transcript})
+
     try:
-        audio_bytes = await file.read()
-        conversation_history = json.loads(history)
-        scenario = SCENARIOS.get(scenario_id) if scenario_id != "free" else None
-        
-        transcript = transcribe(audio_bytes)
-        coach_response = coach_feedback(transcript, conversation_history, scenario)
-        
-        is_complete = "[CONVERSATION_COMPLETE]" in coach_response
-        if is_complete:
-            coach_response = coach_response.replace("[CONVERSATION_COMPLETE]", "").strip()
-        
-        return {"success": True, "transcript": transcript, "coach_response": coach_response, "is_complete": is_complete}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        with priority(LIVE):  # live turns' ASR and coach calls are admitted first
+            while True:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    if live is None:
+                        await send("error", {"detail": "Send a start message first"})
+                        continue
+                    try:
+                        closed = await live.feed(message["bytes"])
+                    except ValueError as e:   # odd-length frame
+                        await send("error", {"detail": str(e)})
+                        continue
+                    for index in closed:
+                        await send("segment", {"segment": index, "audio_s": round(live.audio_s, 2)})
+                    continue
+
+                try:
+                    command = json.loads(message.get("text") or "{}")
+                except ValueError:
+                    command = None
+                if not isinstance(command, dict):
+                    await send("error", {"detail": "Text messages must be JSON objects"})
+                    continue
+                if command.get("type") == "start":
+                    # validate everything before touching the current recording or the turn count
+                    started = sessions.get(str(command.get("session_id", "")))
+                    if started is None:
+                        await send("error", {"detail": "Unknown or expired session"})
+                        continue
+                    try:
+                        restarted = live_transcriber(command.get("sample_rate", 16000), on_partial=on_partial)
+                    except ValueError as e:
+                        await send("error", {"detail": str(e)})
+                        continue
+                    if live is not None:
+                        await live.cancel()   # restarted recording: drop the unfinished one (same turn)
+                    else:
+                        try:
+                            turns.begin()   # a turn is in flight from the first frame until "done"
+                        except Draining as e:
+                            await send("error", {"detail": str(e), "retry": True})
+                            continue
+                    session, live = started, restarted
+                elif command.get("type") == "stop" and live is not None:
+                    with trace("live"):
+                        try:
+                            with stage("asr_tail"):
+                                transcript = await live.finish()
+                            await send("transcript", {"transcript": transcript,
+                                                      "asr_tail_ms": round(live.tail_s * 1000, 1),
+                                                      "segments": len(live.texts)})
+                            async for event, data in coach_turn(session, transcript, live.stopped_at):
+                                await send(event, data)
+                        except Exception as e:
+                            await send("error", {"detail": str(e)})
+                    live = None
+                    turns.end()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if live is not None:
+            turns.end()
+            await live.cancel()
+
+@app.get("/api/health")
+def get_health():
+    """Circuit breaker state per backend; 503 while no ASR backend is reachable or this worker is draining."""
+    report = {**health(), "turns": turns.stats()}
+    if turns.draining:
+        report["status"] = "draining"
+    return JSONResponse(report, status_code=503 if report["status"] in ("down", "draining") else 200)
+
+@app.get("/metrics")
+def get_prometheus_metrics():
+    """Prometheus scrape: stage/ASR/LLM/HTTP histograms, cache hits, fallbacks, queues, breakers."""
+    return PlainTextResponse(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
+
+@app.get("/api/metrics/streaming")
+def get_streaming_metrics():
+    return streaming_metrics()
+
+@app.get("/api/metrics/asr")
+def get_asr_metrics():
+    return asr_metrics()
+
+@app.get("/api/metrics/limits")
+def get_limit_metrics():
+    return limit_metrics()
+
+@app.get("/api/metrics/context-cache")
+def get_context_cache_metrics():
+    return context_cache_metrics()
+
+@app.get("/api/metrics/openings")
+def get_opening_metrics():
+    return opening_metrics()
+
+@app.get("/api/metrics/audio")
+def get_audio_metrics():
+    return audio_preprocess.stats()
 
 @app.post("/api/evaluation/final")
-def get_final_evaluation(data: FinalEvaluation):
+async def get_final_evaluation(data: FinalEvaluation):
+    session = get_session(data.session_id)
+    if not session.turns:
+        raise HTTPException(status_code=400, detail="Session has no turns to evaluate")
     try:
-        evaluation = judge_final_evaluation(data.conversation_history)
-        return {"success": True, "evaluation": evaluation}
+        session = await asyncio.shield(evaluation_task(session))   # a disconnect doesn't cancel it for the others
+        return {"success": True, "evaluation": session.evaluation, "scores": session.scores}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/evaluation/preview/{session_id}")
+def get_evaluation_preview(session_id: str):
+    """Instant local estimate (no LLM call); the final evaluation stays authoritative."""
+    session = get_session(session_id)
+    return {"success": True, **instant_scores(session.context)}
+
+@app.get("/api/sessions/{session_id}")
+def get_session_endpoint(session_id: str):
+    session = get_session(session_id)
+    return {"session_id": session.id, "scenario_id": session.scenario_id, "opening": session.opening,
+            "turns": session.turns, "is_complete": session.complete, "evaluation": session.evaluation,
+            "scores": session.scores}
+
+if __name__ == "__main__":
+    import serve   # python main.py = python serve.py (uvicorn, WEB_CONCURRENCY workers)
+    serve.main()
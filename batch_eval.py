@@ -0,0 +1,255 @@
+"""batch_eval.py
+Re-score an archive of recorded sessions offline
+------------------------------------------------
+Loads sessions from a directory or a JSONL file. Audio turns are
+transcribed, then each session gets the final IELTS evaluation. Sessions
+run with bounded concurrency, and ASR and the judge each have their own
+rate limit. Every result is appended to a JSONL sink as soon as it is
+ready, and the sink doubles as the checkpoint: a rerun skips sessions
+that already have an "ok" line and retries the failed ones. A throughput
+report is printed at the end.
+
+Input
+  JSONL: one session per line. session_store's Session.to_dict() works as is.
+      {"id": "s1", "turns": [{"user": "...", "coach": "..."}]}
+      {"id": "s2", "turns": ["transcript", {"audio": "s2/turn1.wav"}]}   # paths relative to the file
+      {"id": "s3", "audio": ["s3/1.webm", "s3/2.webm"]}
+  Directory: *.json / *.jsonl files as above, plus one sub-directory per
+      session whose audio files (sorted by name) are its turns.
+
+Usage:
+    python batch_eval.py archive/ --out results.jsonl [--concurrency 8] [--asr-rps 5] [--judge-rps 2]
+    python batch_eval.py sessions.jsonl --out results.jsonl --report report.json   # rerun = resume
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+from rate_governor import Governor, Limits
+
+AUDIO_EXTENSIONS = {".wav", ".webm", ".mp3", ".m4a", ".ogg", ".flac", ".opus"}
+
+@dataclass
+class BatchSession:
+    id: str
+    turns: list = field(default_factory=list)   # str transcript | {"audio": path} | {"user", "coach"}
+
+    @property
+    def audio_turns(self) -> int:
+        return sum(isinstance(t, dict) and "audio" in t for t in self.turns)
+
+# ---------- Loading ----------
+def _session_from_record(record: dict, base_dir: str, fallback_id: str) -> BatchSession:
+    turns = []
+    for turn in record.get("turns") or []:
+        if isinstance(turn, dict) and "audio" in turn:
+            turn = {**turn, "audio": os.path.join(base_dir, turn["audio"])}
+        turns.append(turn)
+    turns += [{"audio": os.path.join(base_dir, path)} for path in record.get("audio") or []]
+    return BatchSession(str(record.get("id") or fallback_id), turns)
+
+def _load_file(path: str) -> list[BatchSession]:
+    base_dir, stem = os.path.dirname(os.path.abspath(path)), os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [_session_from_record(json.load(f), base_dir, stem)]
+        return [_session_from_record(json.loads(line), base_dir, f"{stem}:{n}")
+                for n, line in enumerate(f, 1) if line.strip()]
+
+def load_sessions(source: str) -> list[BatchSession]:
+    """Sessions from a JSONL/JSON file or a directory (see module docstring)."""
+    if not os.path.isdir(source):
+        return _load_file(source)
+    sessions = []
+    for name in sorted(os.listdir(source)):
+        path = os.path.join(source, name)
+        if os.path.isdir(path):
+            audio = sorted(f for f in os.listdir(path) if os.path.splitext(f)[1].lower() in AUDIO_EXTENSIONS)
+            if audio:
+                sessions.append(BatchSession(name, [{"audio": os.path.join(path, f)} for f in audio]))
+        elif name.endswith((".json", ".jsonl")):
+            sessions += _load_file(path)
+    return sessions
+
+def completed_ids(out_path: str) -> set:
+    """Ids already scored successfully in the sink (the checkpoint)."""
+    done = set()
+    if os.path.exists(out_path):
+        with open(out_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash; that session is simply redone
+                if row.get("status") == "ok":
+                    done.add(row["id"])
+    return done
+
+# ---------- Engine ----------
+def _percentile(values: list, q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class BatchEvaluator:
+    """Runs `atranscribe_fn(audio_bytes, language_code)` for audio turns and
+    `ajudge_fn(history) -> JudgeResult` per session, writing one JSONL row per session."""
+
+    def __init__(self, atranscribe_fn, ajudge_fn, concurrency: int = 8,
+                 asr_rps: float = 0, judge_rps: float = 0, language_code: str = "auto"):
+        self.atranscribe_fn = atranscribe_fn
+        self.ajudge_fn = ajudge_fn
+        self.concurrency = concurrency
+        self.asr_limit = Governor("batch:asr", Limits(rps=asr_rps))
+        self.judge_limit = Governor("batch:judge", Limits(rps=judge_rps))
+        self.language_code = language_code
+        self.stats = {"ok": 0, "error": 0, "skipped": 0, "turns": 0, "audio_turns": 0,
+                      "asr_s": 0.0, "judge_s": 0.0, "latencies": []}
+
+    async def _transcribe(self, path: str) -> str:
+        with open(path, "rb") as f:
+            audio_bytes = f.read()
+        async with self.asr_limit.aslot():
+            start = time.perf_counter()
+            try:
+                return (await self.atranscribe_fn(audio_bytes, self.language_code)).strip()
+            finally:
+                self.stats["asr_s"] += time.perf_counter() - start
+
+    async def evaluate(self, session: BatchSession) -> dict:
+        start = time.perf_counter()
+        row = {"id": session.id}
+        try:
+            history = []
+            for turn in session.turns:
+                if isinstance(turn, str):
+                    history.append({"user": turn, "coach": ""})
+                elif "audio" in turn:
+                    history.append({"user": await self._transcribe(turn["audio"]), "coach": ""})
+                else:
+                    history.append({"user": turn["user"], "coach": turn.get("coach", "")})
+            if not history:
+                raise ValueError("session has no turns")
+            async with self.judge_limit.aslot():
+                judge_start = time.perf_counter()
+                try:
+                    result = await self.ajudge_fn(history)
+                finally:
+                    self.stats["judge_s"] += time.perf_counter() - judge_start
+            row.update(status="ok", scores=result.to_dict(), overall=result.overall_band,
+                       evaluation=result.to_markdown())
+            if session.audio_turns:
+                row["transcripts"] = [h["user"] for h in history]
+        except Exception as e:
+            row.update(status="error", error=f"{type(e).__name__}: {e}")
+        row["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return row
+
+    async def run(self, sessions: list[BatchSession], out_path: str, progress=None) -> dict:
+        """Evaluate every session not yet in `out_path`; returns the throughput report."""
+        done = completed_ids(out_path)
+        todo = [s for s in sessions if s.id not in done]
+        self.stats["skipped"] = len(sessions) - len(todo)
+        queue: asyncio.Queue = asyncio.Queue()
+        for session in todo:
+            queue.put_nowait(session)
+        started = time.perf_counter()
+
+        with open(out_path, "a", encoding="utf-8") as sink:
+            async def worker():
+                while True:
+                    try:
+                        session = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    row = await self.evaluate(session)
+                    sink.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    sink.flush()  # checkpoint: this session is never redone
+                    self.stats[row["status"]] += 1
+                    self.stats["turns"] += len(session.turns)
+                    self.stats["audio_turns"] += session.audio_turns
+                    self.stats["latencies"].append(row["elapsed_ms"])
+                    if progress is not None:
+                        progress(row)
+
+            workers = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, len(todo)) or 1)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+        return self.report(time.perf_counter() - started)
+
+    def report(self, wall_s: float) -> dict:
+        s = self.stats
+        processed = s["ok"] + s["error"]
+        return {
+            "sessions": processed, "ok": s["ok"], "error": s["error"], "skipped": s["skipped"],
+            "turns": s["turns"], "audio_turns": s["audio_turns"],
+            "wall_s": round(wall_s, 2),
+            "sessions_per_min": round(processed / wall_s * 60, 1) if wall_s else None,
+            "turns_per_min": round(s["turns"] / wall_s * 60, 1) if wall_s else None,
+            "latency_ms": {"p50": _percentile(s["latencies"], 0.5), "p95": _percentile(s["latencies"], 0.95),
+                           "max": max(s["latencies"], default=None)},
+            "asr_s": round(s["asr_s"], 2), "judge_s": round(s["judge_s"], 2),
+            "rate_wait_ms": {"asr": self.asr_limit.metrics()["wait_ms"], "judge": self.judge_limit.metrics()["wait_ms"]},
+            "concurrency": self.concurrency,
+        }
+
+def print_report(report: dict) -> None:
+    print("=" * 60)
+    print(f"sessions: {report['sessions']} ({report['ok']} ok, {report['error']} failed, "
+          f"{report['skipped']} already done)")
+    print(f"turns:    {report['turns']} ({report['audio_turns']} transcribed)")
+    print(f"wall:     {report['wall_s']} s  ->  {report['sessions_per_min']} sessions/min, "
+          f"{report['turns_per_min']} turns/min")
+    lat = report["latency_ms"]
+    print(f"session latency ms: p50 {lat['p50']}  p95 {lat['p95']}  max {lat['max']}")
+    print(f"time in ASR {report['asr_s']} s, judge {report['judge_s']} s (summed over {report['concurrency']} workers)")
+    print("=" * 60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory or JSONL/JSON file of sessions")
+    parser.add_argument("--out", required=True, help="JSONL result sink (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--asr-rps", type=float, default=5, help="ASR requests per second (0 = unlimited)")
+    parser.add_argument("--judge-rps", type=float, default=2, help="judge requests per second (0 = unlimited)")
+    parser.add_argument("--language", default="auto")
+    parser.add_argument("--limit", type=int, help="only the first N sessions")
+    parser.add_argument("--report", help="also write the throughput report as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from model_service import aclose, ajudge_final_scores, atranscribe
+    from rate_governor import BATCH, priority
+
+    sessions = load_sessions(args.source)[:args.limit]
+    evaluator = BatchEvaluator(atranscribe, ajudge_final_scores, args.concurrency,
+                               args.asr_rps, args.judge_rps, args.language)
+
+    def progress(row):
+        status = f"band {row['overall']:g}" if row["status"] == "ok" else row["error"]
+        print(f"[{evaluator.stats['ok'] + evaluator.stats['error']}] {row['id']}: {status} ({row['elapsed_ms']:.0f} ms)")
+
+    async def run():
+        try:
+            with priority(BATCH):  # a server sharing the process/limits keeps serving live turns first
+                return await evaluator.run(sessions, args.out, progress)
+        finally:
+            await aclose()
+
+    report = asyncio.run(run())
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Async Load Benchmark - /api/conversation/process
+-------------------------------------------------
+Fires N concurrent learner turns at the FastAPI app and compares:
+  blocking : old handler (sync transcribe/coach_feedback inside `async def`)
+  async    : current handler (atranscribe/acoach_feedback)
+
+Typhoon is replaced by a local stub HTTP server and Gemini by a stub provider
+with a fixed latency (providers.py), so only our own concurrency behaviour is
+measured. No API keys needed.
+
+Usage:
+    python bench_async.py [--sessions 20] [--asr-delay 0.5] [--llm-delay 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from stub_typhoon_server import start_stub_typhoon
+
+async def run_sessions(app, store, path: str, n: int) -> float:
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        async def one_turn():
+            files = {"file": ("audio.wav", b"\0" * 32000, "audio/wav")}
+            data = {"session_id": store.create("restaurant").id}
+            resp = await client.post(path, files=files, data=data)
+            resp.raise_for_status()
+        start = time.perf_counter()
+        await asyncio.gather(*(one_turn() for _ in range(n)))
+        return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--asr-delay", type=float, default=0.5)
+    parser.add_argument("--llm-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = start_stub_typhoon(args.asr_delay)
+
+    import model_service
+    from fastapi import File, Form, UploadFile
+    from providers import StubGemini
+
+    # Gemini stand-in with a fixed generation time
+    model_service.use_stubs(StubGemini(latency=args.llm_delay, coach_replies=("Sure! What would you like to drink?",)),
+                            server)
+
+    from main import app, sessions
+
+    @app.post("/bench/blocking")
+    async def blocking_process(file: UploadFile = File(...), session_id: str = Form(...)):
+        session = sessions.get(session_id)
+        audio_bytes = await file.read()
+        scenario = model_service.SCENARIOS.get(session.scenario_id)
+        transcript = model_service.transcribe(audio_bytes)
+        coach = model_service.coach_feedback(transcript, session.context, scenario)
+        return {"transcript": transcript, "coach_response": coach}
+
+    ideal = args.asr_delay + args.llm_delay
+    print("=" * 60)
+    print(f"{args.sessions} concurrent sessions, ASR {args.asr_delay}s + LLM {args.llm_delay}s per turn")
+    print("=" * 60)
+    blocking = asyncio.run(run_sessions(app, sessions, "/bench/blocking", args.sessions))
+    print(f"blocking : {blocking:7.2f}s  ({blocking / ideal:5.1f}x one turn)")
+    concurrent = asyncio.run(run_sessions(app, sessions, "/api/conversation/process", args.sessions))
+    print(f"async    : {concurrent:7.2f}s  ({concurrent / ideal:5.1f}x one turn)")
+    print(f"speed-up : {blocking / concurrent:7.1f}x")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
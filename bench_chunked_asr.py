@@ -0,0 +1,56 @@
+"""
+Chunked Long-Audio Transcription Benchmark (offline)
+----------------------------------------------------
+Models ASR latency as `base + rtf * clip_seconds` (a request pays a fixed
+round trip plus time proportional to the audio) and compares one request
+for the whole answer with chunked, parallel segment dispatch.
+
+Usage:
+    python bench_chunked_asr.py [--minutes 1 2 3] [--base 0.4] [--rtf 0.08] [--workers 8]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from chunked_asr import plan_segments, transcribe_chunked
+from test_chunked_asr import RATE, speech_with_pauses
+
+def modelled_asr(base: float, rtf: float):
+    def call(audio_bytes, language_code, mime_type="audio/wav"):
+        with wave.open(io.BytesIO(audio_bytes)) as w:
+            time.sleep(base + rtf * w.getnframes() / w.getframerate())
+        return "text"
+    return call
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--base", type=float, default=0.4, help="fixed seconds per request")
+    parser.add_argument("--rtf", type=float, default=0.08, help="seconds of ASR per second of audio")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chunk", type=float, default=20.0)
+    args = parser.parse_args()
+    asr = modelled_asr(args.base, args.rtf)
+
+    print("=" * 64)
+    print(f"{'clip':>6} {'chunks':>7} | {'single s':>9} {'chunked s':>10} {'1 chunk s':>10} {'speedup':>8}")
+    print("-" * 64)
+    for minutes in args.minutes:
+        pcm, _ = speech_with_pauses(phrases=int(minutes * 60 / 9.6) + 1)
+        segments = plan_segments(pcm, RATE, chunk_s=args.chunk)
+        single = args.base + args.rtf * len(pcm) / RATE  # modelled: no need to sleep through it
+        start = time.perf_counter()
+        transcribe_chunked(pcm, RATE, asr, max_workers=args.workers, chunk_s=args.chunk)
+        chunked = time.perf_counter() - start
+        one = args.base + args.rtf * max(b - a for a, b in segments) / RATE
+        print(f"{len(pcm) / RATE / 60:>5.1f}m {len(segments):>7} | {single:>9.2f} {chunked:>10.2f} "
+              f"{one:>10.2f} {single / chunked:>7.1f}x")
+    print("=" * 64)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Conversation Context Benchmark
+------------------------------
+Simulates a long session and compares, per turn:
+  legacy  : history list re-sent as JSON, parsed and fully concatenated
+  context : ConversationContext (recent turns verbatim + rolling summary)
+
+Reports prompt tokens, Python build time (JSON parse + prompt build) and a
+modelled coach latency (fixed overhead + per-input-token prefill cost).
+Pass --live to time real Gemini calls instead (needs GEMINI_API_KEY).
+
+Usage:
+    python bench_context.py [--turns 60] [--live]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conversation_context import ConversationContext, estimate_tokens
+
+USER_LINES = [
+    "I would like to book a table for two people tonight at around seven o'clock.",
+    "Do you have any vegetarian dishes? My friend don't eat meat.",
+    "Can I has the grilled salmon with a small salad on the side, please?",
+    "What do you recommend for the dessert? I like something with chocolate.",
+]
+COACH_LINES = [
+    "Of course! A table for two at seven. By the way, we say 'my friend doesn't eat meat'. Anything to drink?",
+    "Great choice. Small note: it's 'Can I have', not 'Can I has'. Would you like still or sparkling water?",
+]
+
+def legacy_prompt(history_json: str, text: str) -> str:
+    history = json.loads(history_json)
+    context = "Previous conversation:\n"
+    for entry in history:
+        context += f"User: {entry['user']}\nYou: {entry['coach']}\n\n"
+    return f"{context}User now says:\n'''\n{text}\n'''\n\nPlease respond as their conversation partner."
+
+def context_prompt(ctx: ConversationContext, text: str) -> str:
+    return f"{ctx.render()}User now says:\n'''\n{text}\n'''\n\nPlease respond as their conversation partner."
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--overhead-ms", type=float, default=400.0, help="modelled fixed LLM latency")
+    parser.add_argument("--prefill-us", type=float, default=150.0, help="modelled cost per input token (µs)")
+    parser.add_argument("--live", action="store_true", help="call Gemini instead of the latency model")
+    args = parser.parse_args()
+
+    if args.live:
+        import model_service
+        system = model_service.coach_system_prompt(model_service.SCENARIOS["restaurant"])
+
+    def coach_latency_ms(prompt: str) -> float:
+        if args.live:
+            t0 = time.perf_counter()
+            model_service._gemini_chat(system, prompt)
+            return (time.perf_counter() - t0) * 1000
+        return args.overhead_ms + estimate_tokens(prompt) * args.prefill_us / 1000
+
+    history, ctx = [], ConversationContext()
+    print("=" * 78)
+    print(f"{'turn':>4} | {'legacy tok':>10} {'build µs':>9} {'coach ms':>9} | {'context tok':>11} {'build µs':>9} {'coach ms':>9}")
+    print("-" * 78)
+    for turn in range(1, args.turns + 1):
+        text = USER_LINES[turn % len(USER_LINES)]
+
+        t0 = time.perf_counter()
+        legacy = legacy_prompt(json.dumps(history), text)
+        legacy_us = (time.perf_counter() - t0) * 1e6
+
+        t0 = time.perf_counter()
+        fresh = context_prompt(ctx, text)
+        context_us = (time.perf_counter() - t0) * 1e6
+
+        if turn in (1, 2, 5, 10, 20, 30, 40, 50, args.turns) or turn % 25 == 0:
+            print(f"{turn:>4} | {estimate_tokens(legacy):>10} {legacy_us:>9.1f} {coach_latency_ms(legacy):>9.1f} | "
+                  f"{estimate_tokens(fresh):>11} {context_us:>9.1f} {coach_latency_ms(fresh):>9.1f}")
+
+        coach = COACH_LINES[turn % len(COACH_LINES)]
+        history.append({"user": text, "coach": coach})
+        ctx.append(text, coach)
+    print("=" * 78)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Gemini Fallback Transcription Benchmark
+---------------------------------------
+Compares the per-fallback cost of the old and new Gemini ASR paths:
+  tempfile : NamedTemporaryFile write -> genai.upload_file -> generate -> unlink
+  inline   : audio bytes sent inline in the generate request (no disk, no upload)
+
+Offline (default): measures the local disk work the old path did and adds a
+modelled File API upload round trip (--upload-ms). With --live (needs
+GEMINI_API_KEY) both paths are timed end to end against Gemini.
+
+Usage:
+    python bench_gemini_fallback.py [--seconds 5 15 60] [--upload-ms 600] [--live]
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def make_wav(seconds: float, rate: int = 44100) -> bytes:
+    """Silent stereo 16-bit WAV, the shape audiorecorder exports."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0" * int(seconds * rate) * 4)
+    return buf.getvalue()
+
+def tempfile_roundtrip(audio_bytes: bytes) -> None:
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        tmp.write(audio_bytes)
+        tmp.flush()
+        os.fsync(tmp.fileno())
+        tmp_path = tmp.name
+    Path(tmp_path).unlink()
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 15, 60])
+    parser.add_argument("--upload-ms", type=float, default=600.0, help="modelled File API upload round trip")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    if args.live:
+        import google.generativeai as genai
+        import model_service
+
+        def old_path(audio_bytes):
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+                tmp.write(audio_bytes)
+                tmp_path = tmp.name
+            try:
+                audio_file = genai.upload_file(path=tmp_path)
+                model_service.models.get("gemini-2.5-flash").generate_content(
+                    [model_service.GEMINI_ASR_PROMPT, audio_file])
+                genai.delete_file(audio_file.name)
+            finally:
+                Path(tmp_path).unlink()
+
+    print("=" * 70)
+    print(f"{'clip':>6} {'size':>9} | {'tempfile ms':>12} {'inline ms':>10} {'saved ms':>9}")
+    print("-" * 70)
+    for seconds in args.seconds:
+        audio = make_wav(seconds)
+        if args.live:
+            old = timed(lambda: old_path(audio), args.repeat)
+            new = timed(lambda: model_service._gemini_transcribe(audio), args.repeat)
+        else:
+            old = timed(lambda: tempfile_roundtrip(audio), args.repeat) + args.upload_ms
+            new = 0.0  # the inline part is a dict around the same bytes object
+        print(f"{seconds:>5.0f}s {len(audio) / 1e6:>7.1f}MB | {old:>12.1f} {new:>10.1f} {old - new:>9.1f}")
+    print("=" * 70)
+    if not args.live:
+        print("tempfile = measured disk write+fsync+unlink + modelled upload round trip")
+
+if __name__ == "__main__":
+    main()
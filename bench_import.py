@@ -0,0 +1,72 @@
+"""
+Import Time Benchmark
+---------------------
+Measures `import model_service` in a fresh interpreter with `python -X importtime`.
+The child gets no API keys and no network. Prints the total and the slowest
+modules. Exits non-zero when the total is over budget or when a heavy SDK is
+imported eagerly, so it can gate startup regressions in CI.
+
+The SDKs (google.generativeai, requests, httpx, dotenv) belong on first use,
+in model_service.init() or the first Typhoon/Gemini call. numpy is expected,
+because audio_preprocess needs it.
+
+Usage:
+    python bench_import.py [--module model_service] [--budget-ms 400] [--top 15] [--runs 3]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FORBIDDEN = ("google.generativeai", "google.api_core", "requests", "httpx", "dotenv", "openai")
+
+def import_times(module: str) -> dict:
+    """{module: (self_us, cumulative_us)} from one `python -X importtime -c 'import <module>'`."""
+    env = {k: v for k, v in os.environ.items() if k not in ("TYPHOON_API_KEY", "GEMINI_API_KEY", "PYTHONPATH")}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=HERE, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"❌ import {module} failed:\n{proc.stderr[-2000:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="model_service")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "400")))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="best-of runs (the first warms the .pyc cache)")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    times = min(runs, key=lambda t: t[args.module][1])
+    total_ms = times[args.module][1] / 1000
+
+    print("=" * 70)
+    print(f"import {args.module}: {total_ms:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print("=" * 70)
+    print(f"{'self ms':>9} {'cum ms':>9}  module")
+    for name, (self_us, cumulative_us) in sorted(times.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+    eager = [f for f in FORBIDDEN if any(name == f or name.startswith(f + ".") for name in times)]
+    failed = False
+    if eager:
+        print(f"\n❌ imported eagerly: {', '.join(eager)} (load these on first use)")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\n❌ {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("\n✅ within budget, no SDKs imported eagerly")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Turn Pipeline Benchmark Suite
+-----------------------------
+Times each stage of a learner turn, with Typhoon and Gemini replaced by the
+zero-latency offline stubs (providers.py; Typhoon is the stub server on
+loopback). What is left is our own cost: multipart parsing, session/history
+JSON decoding, audio preprocessing, prompt construction, the ASR client and
+router, the LLM call wrapper (registry, governor, breaker, telemetry) and
+the whole /api/conversation/process request with its stage breakdown.
+
+Fixtures: short / medium / long audio (2 s, 15 s, 60 s of speech-like bursts;
+long audio goes through chunked ASR) and 1 / 10 / 50-turn histories.
+
+Each benchmark runs for --min-time seconds (at least 5 rounds, after a warm-up).
+The report shows median / min / IQR per round. Results can be saved per commit
+and compared, asv/pytest-benchmark style:
+
+    git checkout main   && python bench_pipeline.py --save           # .benchmarks/<commit>.json
+    git checkout branch && python bench_pipeline.py --compare main   # or a path / saved name
+    python bench_pipeline.py --compare a.json --current b.json       # compare two saved runs
+
+--fail-over 10 exits non-zero when any median is more than 10% slower than the baseline.
+
+Usage:
+    python bench_pipeline.py [--filter prompt] [--min-time 0.5] [--quick] [--save [NAME]]
+                             [--compare REF] [--current FILE] [--fail-over PCT] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import wave
+from dataclasses import dataclass, field
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+BENCH_DIR = os.path.join(ROOT, ".benchmarks")
+AUDIO_SECONDS = {"short": 2, "medium": 15, "long": 60}
+HISTORIES = (1, 10, 50)
+USER_LINE = "I would like to book a table for two people tonight, maybe at around seven o'clock if possible."
+COACH_LINE = ("Of course! A table for two at seven. Small note: we say 'at around seven' without 'maybe'. "
+              "Would you prefer a table inside or on the terrace?")
+
+# ---------- Fixtures ----------
+def speech_like_wav(seconds: float, rate: int = 16000) -> bytes:
+    """300 ms voiced bursts separated by 150 ms of near-silence, so trimming and VAD have work to do."""
+    import numpy as np
+    t = np.arange(int(seconds * rate)) / rate
+    voiced = (t % 0.45) < 0.3
+    signal = np.sin(2 * np.pi * 180 * t) * 0.4 + np.sin(2 * np.pi * 720 * t) * 0.1
+    noise = np.random.default_rng(0).normal(0, 0.002, t.size)
+    pcm = (np.where(voiced, signal, 0) + noise).clip(-1, 1) * 32767
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.astype("<i2").tobytes())
+    return buf.getvalue()
+
+_variants = itertools.count(1)
+
+def unique(audio: bytes) -> bytes:
+    """`audio` with two samples inside the first voiced burst changed, so the transcript cache misses."""
+    offset = 44 + 2 * 1000
+    return audio[:offset] + next(_variants).to_bytes(4, "little") + audio[offset + 4:]
+
+def history_session(turns: int, session_id: str = "bench"):
+    from session_store import Session
+    session = Session(id=session_id, scenario_id="restaurant", opening="Welcome! Do you have a reservation?")
+    for i in range(turns):
+        session.add_turn(f"{USER_LINE} ({i})", f"{COACH_LINE} ({i})")
+    return session
+
+# ---------- Runner ----------
+@dataclass
+class Case:
+    name: str
+    fn: object                 # fn() or async fn(), timed
+    setup: object = None       # called before each round, untimed
+    stages: dict = field(default_factory=dict)   # filled by fn: stage -> [ms]
+
+BENCHMARKS = []
+
+def benchmark(name: str, **params):
+    """Register `factory(ctx, **combination) -> Case` for every combination of `params`."""
+    def register(factory):
+        BENCHMARKS.append((name, factory, params))
+        return factory
+    return register
+
+def _combinations(params: dict) -> list:
+    combos = [{}]
+    for key, values in params.items():
+        combos = [{**c, key: v} for c in combos for v in values]
+    return combos
+
+def _case_name(name: str, combo: dict) -> str:
+    return f"{name}[{','.join(f'{k}={v}' for k, v in combo.items())}]" if combo else name
+
+def measure(case: Case, loop, min_time: float, min_rounds: int = 5, max_rounds: int = 2000) -> list:
+    def call():
+        result = case.fn()
+        if asyncio.iscoroutine(result):
+            loop.run_until_complete(result)
+
+    if case.setup:
+        case.setup()
+    call()                       # warm-up (imports, pools, caches)
+    case.stages.clear()
+    times, spent = [], 0.0
+    while len(times) < min_rounds or (spent < min_time and len(times) < max_rounds):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+    return times
+
+def summarize(times: list) -> dict:
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else [times[0]] * 3
+    return {"median": statistics.median(times), "min": min(times), "mean": statistics.fmean(times),
+            "iqr": quartiles[2] - quartiles[0], "rounds": len(times)}
+
+# ---------- Benchmarks ----------
+@benchmark("multipart.parse", audio=tuple(AUDIO_SECONDS))
+def bench_multipart(ctx, audio):
+    """Starlette form parsing of an upload, as FastAPI does before /process runs."""
+    import httpx
+    from starlette.requests import Request
+    req = httpx.Request("POST", "http://bench/api/conversation/process", data={"session_id": "bench"},
+                        files={"file": ("turn.wav", ctx.audio[audio], "audio/wav")})
+    body = req.read()
+    headers = [(k.lower().encode(), v.encode()) for k, v in req.headers.items()]
+
+    async def parse():
+        chunks = [body[i:i + 65536] for i in range(0, len(body), 65536)] or [b""]
+
+        async def receive():
+            chunk = chunks.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+        request = Request({"type": "http", "method": "POST", "headers": headers, "path": "/"}, receive)
+        form = await request.form()
+        await form["file"].read()
+        await form.close()
+    return Case("", parse)
+
+@benchmark("session.decode", turns=HISTORIES)
+def bench_session_decode(ctx, turns):
+    """What the SQLite session store does on every request: JSON -> Session (history included)."""
+    from session_store import Session
+    blob = json.dumps(history_session(turns).to_dict(), ensure_ascii=False)
+    return Case("", lambda: Session.from_dict(json.loads(blob)))
+
+@benchmark("session.encode", turns=HISTORIES)
+def bench_session_encode(ctx, turns):
+    session = history_session(turns)
+    return Case("", lambda: json.dumps(session.to_dict(), ensure_ascii=False))
+
+@benchmark("audio.prepare", audio=tuple(AUDIO_SECONDS))
+def bench_audio_prepare(ctx, audio):
+    """Decode, resample, trim silence and re-encode (model_service.prepare_audio)."""
+    ms = ctx.model_service
+    data = ctx.audio[audio]
+    return Case("", lambda: ms.prepare_audio(data))
+
+@benchmark("prompt.coach", turns=HISTORIES)
+def bench_prompt_coach(ctx, turns):
+    """Rolling-summary coach prompt (no session id: context caching off)."""
+    ms = ctx.model_service
+    session = history_session(turns)
+    scenario = ms.SCENARIOS["restaurant"]
+    return Case("", lambda: ms._coach_request(USER_LINE, session.context, scenario))
+
+@benchmark("prompt.coach_cached", turns=HISTORIES)
+def bench_prompt_coach_cached(ctx, turns):
+    """Coach contents with a session id: context-cache lookup + uncached suffix."""
+    ms = ctx.model_service
+    session = history_session(turns, f"prompt-{turns}")
+    scenario = ms.SCENARIOS["restaurant"]
+    return Case("", lambda: ms._coach_request(USER_LINE, session.context, scenario, session.id))
+
+@benchmark("prompt.final_eval", turns=HISTORIES)
+def bench_prompt_final_eval(ctx, turns):
+    ms = ctx.model_service
+    session = history_session(turns)
+    return Case("", lambda: ms._final_eval_user_prompt(session.context))
+
+@benchmark("llm.call")
+def bench_llm_call(ctx):
+    """_gemini_chat around a zero-latency model: registry, breaker, governor, telemetry."""
+    ms = ctx.model_service
+    return Case("", lambda: ms._gemini_chat(ms.FREE_COACH_PROMPT, USER_LINE, kind="coach"))
+
+@benchmark("llm.acall")
+def bench_llm_acall(ctx):
+    ms = ctx.model_service
+    return Case("", lambda: ms._agemini_chat(ms.FREE_COACH_PROMPT, USER_LINE, kind="coach"))
+
+@benchmark("asr.transcribe", audio=tuple(AUDIO_SECONDS))
+def bench_asr(ctx, audio):
+    """atranscribe against the stub server: preprocessing, cache lookup, router, HTTP client (loopback)."""
+    ms = ctx.model_service
+    state = {"data": b""}
+
+    def setup():
+        state["data"] = unique(ctx.audio[audio])
+    return Case("", lambda: ms.atranscribe(state["data"]), setup)
+
+@benchmark("turn.process", audio=("short", "medium"), turns=HISTORIES)
+def bench_turn(ctx, audio, turns):
+    """POST /api/conversation/process in-process (ASGI), history of `turns` turns; stages from timings_ms."""
+    import main
+    snapshot = history_session(turns, f"turn-{audio}-{turns}").to_dict()
+    state = {"data": b""}
+    case = Case("", None)
+
+    def setup():
+        ctx.drain()                                   # background turn judges from the last round
+        main.sessions.save(_session_from(snapshot))      # same history every round
+        state["data"] = unique(ctx.audio[audio])
+
+    async def turn():
+        resp = await ctx.client.post("/api/conversation/process", data={"session_id": snapshot["id"]},
+                                     files={"file": ("turn.wav", state["data"], "audio/wav")})
+        resp.raise_for_status()
+        for stage, ms in resp.json()["timings_ms"].items():
+            case.stages.setdefault(stage, []).append(ms / 1000)
+
+    case.fn, case.setup = turn, setup
+    return case
+
+def _session_from(snapshot: dict):
+    from session_store import Session
+    return Session.from_dict(snapshot)
+
+class Context:
+    """Shared fixtures: audio clips, model_service on stubs, the ASGI app client and its loop."""
+
+    def __init__(self):
+        import httpx
+        import model_service
+        from providers import StubGemini
+        from stub_typhoon_server import start_stub_typhoon
+
+        model_service.use_stubs(StubGemini(latency=0, chunk_interval=0, seed=0), start_stub_typhoon())
+        model_service.warm_model_registry()
+        self.model_service = model_service
+        self.audio = {name: speech_like_wav(seconds) for name, seconds in AUDIO_SECONDS.items()}
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._client = None
+        self._httpx = httpx
+
+    @property
+    def client(self):
+        if self._client is None:
+            from main import app
+            self._client = self._httpx.AsyncClient(transport=self._httpx.ASGITransport(app=app), base_url="http://bench")
+        return self._client
+
+    def drain(self) -> None:
+        async def wait_others():
+            me = asyncio.current_task()
+            others = [t for t in asyncio.all_tasks() if t is not me]
+            if others:
+                await asyncio.wait(others, timeout=5)
+        self.loop.run_until_complete(wait_others())
+
+# ---------- Results ----------
+def git_commit() -> tuple[str, bool]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "-uno"], cwd=ROOT, capture_output=True,
+                                    text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+def run(filter_: str | None, min_time: float) -> dict:
+    ctx = Context()
+    results = {}
+    for name, factory, params in BENCHMARKS:
+        for combo in _combinations(params):
+            full = _case_name(name, combo)
+            if filter_ and filter_ not in full:
+                continue
+            case = factory(ctx, **combo)
+            results[full] = summarize(measure(case, ctx.loop, min_time))
+            print_row(full, results[full])
+            for stage, times in case.stages.items():
+                results[f"{full} > {stage}"] = {**summarize(times), "stage": True}
+                print_row(f"  > {stage}", results[f"{full} > {stage}"])
+    commit, dirty = git_commit()
+    return {"commit": commit, "dirty": dirty, "python": platform.python_version(), "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "min_time": min_time, "results": results}
+
+def print_row(name: str, r: dict) -> None:
+    print(f"{name:52s} {r['median'] * 1000:10.3f} {r['min'] * 1000:10.3f} {r['iqr'] * 1000:9.3f} {r['rounds']:7d}")
+
+def resolve(ref: str) -> str:
+    """A results file: a path, a name saved under .benchmarks/, or a git ref whose commit was saved."""
+    if os.path.exists(ref):
+        return ref
+    candidates = [os.path.join(BENCH_DIR, f"{ref}.json")]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", ref], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        candidates += [os.path.join(BENCH_DIR, f"{commit}.json"), os.path.join(BENCH_DIR, f"{commit}-dirty.json")]
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    raise SystemExit(f"❌ no saved results for {ref!r} (run --save on that commit first)")
+
+def compare(base: dict, current: dict, threshold_pct: float) -> list:
+    """Print median changes; returns the names more than `threshold_pct` slower."""
+    print(f"\n{'benchmark':52s} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    slower = []
+    for name, now in current["results"].items():
+        before = base["results"].get(name)
+        if before is None:
+            continue
+        change = (now["median"] / before["median"] - 1) * 100 if before["median"] else 0.0
+        mark = ""
+        if change > threshold_pct:
+            mark = "  slower"
+            slower.append(name)
+        elif change < -threshold_pct:
+            mark = "  faster"
+        print(f"{name:52s} {before['median'] * 1000:10.3f} {now['median'] * 1000:10.3f} {change:+7.1f}%{mark}")
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per benchmark (after warm-up)")
+    parser.add_argument("--quick", action="store_true", help="--min-time 0.05")
+    parser.add_argument("--save", nargs="?", const="", help="save results to .benchmarks/NAME.json (default: commit)")
+    parser.add_argument("--json", help="also write the results to this path")
+    parser.add_argument("--compare", metavar="REF", help="baseline: results file, saved name or git ref")
+    parser.add_argument("--current", metavar="FILE", help="compare this saved run instead of running now")
+    parser.add_argument("--threshold", type=float, default=5.0, help="%% change reported as slower/faster")
+    parser.add_argument("--fail-over", type=float, help="exit 1 if any median is more than this %% slower")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(resolve(args.current)) as f:
+            current = json.load(f)
+    else:
+        min_time = 0.05 if args.quick else args.min_time
+        print("=" * 94)
+        print(f"{'benchmark (stubs, zero provider latency)':52s} {'median ms':>10} {'min ms':>10} {'IQR ms':>9} {'rounds':>7}")
+        print("=" * 94)
+        current = run(args.filter, min_time)
+
+    if args.save is not None:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        name = args.save or current["commit"] + ("-dirty" if current["dirty"] else "")
+        path = os.path.join(BENCH_DIR, f"{name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nsaved {path}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(resolve(args.compare)) as f:
+            base = json.load(f)
+        print(f"\nbaseline {base['commit']}{' (dirty)' if base.get('dirty') else ''} vs "
+              f"{current['commit']}{' (dirty)' if current.get('dirty') else ''}")
+        slower = compare(base, current, args.fail_over if args.fail_over is not None else args.threshold)
+        if args.fail_over is not None and slower:
+            print(f"\n❌ {len(slower)} benchmark(s) more than {args.fail_over:g}% slower")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Typhoon Connection Pool Benchmark
+---------------------------------
+Sustained ASR load against the local Typhoon stub, comparing:
+  per-call : requests.post() per utterance (old transcribe())
+  pooled   : model_service.TyphoonClient (sync, thread pool)
+  async    : model_service.TyphoonClient.atranscribe (asyncio)
+
+Prints per-request latency and the client's handshake counters. The stub is
+plain HTTP on loopback, so the per-handshake cost here is far below a real
+TCP+TLS handshake to api.opentyphoon.ai; the counters are the portable result.
+
+Usage:
+    python bench_typhoon_pool.py [--requests 200] [--concurrency 8] [--delay 0.02]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_typhoon_server import start_stub_typhoon
+
+AUDIO = b"\0" * 32000
+
+def report(name: str, latencies: list, wall: float):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(f"{name:9s}: {len(latencies) / wall:7.1f} req/s   "
+          f"p50 {statistics.median(ordered) * 1000:6.1f} ms   p95 {p95 * 1000:6.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.02, help="stub server processing time (s)")
+    args = parser.parse_args()
+
+    server = start_stub_typhoon(args.delay)
+    os.environ["TYPHOON_BASE_URL"] = server.base_url
+    os.environ.setdefault("TYPHOON_API_KEY", "bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+    import requests
+    import model_service
+    model_service.init(("typhoon",))
+
+    url = f"{server.base_url}/audio/transcriptions"
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        fn()
+        return time.perf_counter() - t0
+
+    def per_call():
+        files = {"file": ("audio.wav", AUDIO, "audio/wav")}
+        resp = requests.post(url, headers=model_service.typhoon.headers, files=files,
+                             data={"model": model_service.TYPHOON_ASR_MD}, timeout=90)
+        resp.raise_for_status()
+
+    print("=" * 70)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, stub delay {args.delay * 1000:.0f} ms")
+    print("=" * 70)
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        t0 = time.perf_counter()
+        lat = list(pool.map(lambda _: timed(per_call), range(args.requests)))
+        report("per-call", lat, time.perf_counter() - t0)
+
+    client = model_service.TyphoonClient(base_url=server.base_url, api_key=os.environ["TYPHOON_API_KEY"],
+                                         pool_size=args.concurrency)
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        t0 = time.perf_counter()
+        lat = list(pool.map(lambda _: timed(lambda: client.transcribe(AUDIO)), range(args.requests)))
+        report("pooled", lat, time.perf_counter() - t0)
+
+    async def run_async():
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                await aclient.atranscribe(AUDIO)
+                return time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        lat = await asyncio.gather(*(one() for _ in range(args.requests)))
+        report("async", lat, time.perf_counter() - t0)
+        await aclient.aclose()
+
+    aclient = model_service.TyphoonClient(base_url=server.base_url, api_key=os.environ["TYPHOON_API_KEY"],
+                                          pool_size=args.concurrency)
+    asyncio.run(run_async())
+
+    for name, c in (("pooled", client), ("async", aclient)):
+        m = c.metrics()
+        print(f"\n{name} client: {m['attempts']} attempts, {m['connections_opened']} connections opened, "
+              f"{m['handshakes_saved']} handshakes saved")
+        print(f"  fresh connection  : {m['fresh_connection_latency']}")
+        print(f"  reused connection : {m['reused_connection_latency']}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""circuit_breaker.py
+Per-backend circuit breaker
+---------------------------
+When a provider is down, every call used to wait for its own failure
+(connect timeout, read timeout, retries) before anything fell back. A
+breaker remembers recent outcomes and stops sending traffic to a backend
+that keeps failing:
+
+  closed     normal. Outcomes go into a rolling window. Once the window has
+             `min_calls` and the failure rate reaches `failure_rate`, it opens.
+  open       calls are refused at once with CircuitOpenError. The ASR router
+             moves on to the next backend without waiting. After `open_s` the
+             breaker goes half-open.
+  half_open  up to `probes` real calls are let through. A success closes the
+             breaker. A failure re-opens it, and the open time doubles each
+             time up to `max_open_s`.
+
+Calls slower than `slow_call_s` (if set) count as failures, so a backend
+that hangs trips the breaker just like one that errors.
+
+Usage:
+    breaker = CircuitBreaker("Typhoon")
+    with breaker.guard():          # raises CircuitOpenError while open
+        text = typhoon.transcribe(audio)
+
+Env vars (defaults for breakers built by model_service):
+  BREAKER_FAILURE_RATE=0.5  BREAKER_MIN_CALLS=5  BREAKER_WINDOW=20
+  BREAKER_OPEN_SECONDS=30   BREAKER_SLOW_CALL_S (unset)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(RuntimeError):
+    """The backend's breaker is open; the call was not attempted."""
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling failure-rate window (thread-safe)."""
+
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5, window: int = 20,
+                 open_s: float = 30.0, max_open_s: float = 300.0, probes: int = 1,
+                 slow_call_s: float | None = None, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_s = open_s
+        self.max_open_s = max_open_s
+        self.probes = probes
+        self.slow_call_s = slow_call_s
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)   # True = failure
+        self._lock = threading.Lock()
+        self._opened_at = 0.0
+        self._current_open_s = open_s
+        self._probing = 0
+        self.opens = 0
+        self.rejected = 0
+        self.last_error: str | None = None
+
+    # ----- state -----
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            print(f"Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+        if state == OPEN:
+            self._opened_at = self.clock()
+            self.opens += 1
+        elif state == CLOSED:
+            self._outcomes.clear()
+            self._current_open_s = self.open_s
+
+    def _due(self) -> bool:
+        return self.clock() - self._opened_at >= self._current_open_s
+
+    @property
+    def available(self) -> bool:
+        """Would a call be let through now? (no side effects)"""
+        with self._lock:
+            if self.state == OPEN:
+                return self._due()
+            if self.state == HALF_OPEN:
+                return self._probing < self.probes
+            return True
+
+    @property
+    def probe_due(self) -> bool:
+        """Open long enough (or half-open with a free probe slot): the next call is a probe."""
+        with self._lock:
+            if self.state == OPEN:
+                return self._due()
+            return self.state == HALF_OPEN and self._probing < self.probes
+
+    # ----- call protocol: allow() -> call -> record() | abandon() -----
+    def allow(self) -> bool:
+        """Admit one call (a probe when half-open). Every admitted call must be recorded or abandoned."""
+        with self._lock:
+            if self.state == OPEN and self._due():
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing >= self.probes:
+                    self.rejected += 1
+                    return False
+                self._probing += 1
+                return True
+            if self.state == OPEN:
+                self.rejected += 1
+                return False
+            return True
+
+    def record(self, ok: bool, seconds: float = 0.0, error: BaseException | None = None) -> None:
+        failed = not ok or (self.slow_call_s is not None and seconds > self.slow_call_s)
+        with self._lock:
+            if failed:
+                self.last_error = str(error) if error is not None else f"slow call ({seconds:.1f}s)"
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+                if failed:
+                    self._current_open_s = min(self.max_open_s, self._current_open_s * 2)
+                    self._transition(OPEN)
+                else:
+                    self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                return  # a call admitted before the breaker opened; already counted
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls and self.failure_ratio >= self.failure_rate:
+                self._transition(OPEN)
+
+    def abandon(self) -> None:
+        """An admitted call was cancelled (e.g. lost a hedge race): no outcome."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+
+    @contextmanager
+    def guard(self):
+        """Run the enclosed call through the breaker (raises CircuitOpenError while open)."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(False, time.perf_counter() - start, e)
+            raise
+        except BaseException:
+            self.abandon()
+            raise
+        self.record(True, time.perf_counter() - start)
+
+    # ----- metrics -----
+    @property
+    def failure_ratio(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self._current_open_s - (self.clock() - self._opened_at)) if self.state == OPEN else None
+            return {
+                "state": self.state,
+                "failure_rate": round(self.failure_ratio, 3),
+                "window_calls": len(self._outcomes),
+                "opens": self.opens,
+                "rejected": self.rejected,
+                "retry_in_s": round(retry_in, 1) if retry_in is not None else None,
+                "last_error": self.last_error,
+            }
+
+def breaker_from_env(name: str) -> CircuitBreaker:
+    slow = os.getenv("BREAKER_SLOW_CALL_S")
+    return CircuitBreaker(
+        name,
+        failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+        min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+        window=int(os.getenv("BREAKER_WINDOW", "20")),
+        open_s=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+        slow_call_s=float(slow) if slow else None,
+    )
@@ -0,0 +1,235 @@
+"""context_cache.py
+Gemini context caching for the coach, per session
+-------------------------------------------------
+Every coach call used to resend the scenario system prompt plus the
+conversation so far. Gemini billed those input tokens again and spent
+time re-reading them. ConversationContext kept the block bounded, but the
+block slid every turn, so no prefix was ever reused.
+
+With caching, each session gets a Gemini cached content: the coach system
+instruction plus its earlier turns as real user/model contents. A coach
+call then sends only the turns after the cached prefix and the new
+utterance. So the uncached input stays roughly constant (at most about
+`extend_tokens` plus one turn) however long the session runs.
+
+  create   Once the system prompt plus the turns reach `min_tokens`, a cache
+           is built in the background. Gemini refuses caches below a
+           model-specific minimum (1024 tokens for 2.5 Flash); until then
+           the prefix is cheap to resend.
+  extend   A cached content can't be appended to. Once the uncached suffix
+           reaches `extend_tokens`, a new cache covering every turn so far is
+           built and the old one deleted, again off the request path.
+  expire   Caches live `ttl_s`, and each use refreshes the TTL once half of
+           it is gone. Idle sessions expire server-side. The manager keeps
+           at most `max_sessions` (LRU, evicted caches are deleted) and
+           deletes all of them on close().
+
+Past `max_tokens` a session stops being cached and the coach falls back to
+the rolling summary prompt.
+
+The manager is SDK-agnostic: `create_fn(system_prompt, turns, ttl_s) -> handle`,
+`delete_fn(handle)` and `touch_fn(handle, ttl_s)` do the Gemini calls
+(model_service wires them to google.generativeai.caching).
+
+Env vars:
+  CONTEXT_CACHE (1)                  CONTEXT_CACHE_MIN_TOKENS (1024)
+  CONTEXT_CACHE_EXTEND_TOKENS (1024) CONTEXT_CACHE_MAX_TOKENS (32768)
+  CONTEXT_CACHE_TTL (900 s)          CONTEXT_CACHE_SESSIONS (256)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from conversation_context import estimate_tokens
+
+ENABLED = os.getenv("CONTEXT_CACHE", "1") != "0"
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="context-cache")
+
+def turns_tokens(turns) -> int:
+    return sum(estimate_tokens(user) + estimate_tokens(coach) for user, coach in turns)
+
+@dataclass
+class CachedPrefix:
+    """What a coach call should send: `handle` (None = nothing cached yet) covers the first `turns` turns."""
+    handle: object = None
+    turns: int = 0
+
+@dataclass
+class _Entry:
+    system_prompt: str
+    handle: object = None
+    turns: int = 0
+    tokens: int = 0
+    expires_at: float = 0.0
+    building: bool = False
+    retry_at_tokens: int = 0     # after a failed build, wait for the prefix to grow this far
+
+class ContextCacheManager:
+    """Per-session cached prefixes (thread-safe); builds/extensions run on a background executor."""
+
+    def __init__(self, create_fn, delete_fn, touch_fn=None, min_tokens: int = 1024,
+                 extend_tokens: int = 1024, max_tokens: int = 32768, ttl_s: float = 900,
+                 max_sessions: int = 256, run=None, clock=time.monotonic):
+        self.create_fn = create_fn
+        self.delete_fn = delete_fn
+        self.touch_fn = touch_fn
+        self.min_tokens = min_tokens
+        self.extend_tokens = extend_tokens
+        self.max_tokens = max_tokens
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.run = run or _executor.submit
+        self.clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0            # calls served from a cached prefix
+        self.misses = 0          # calls with nothing cached yet
+        self.creates = 0
+        self.failures = 0
+        self.deletes = 0
+        self.cached_tokens = 0   # estimated input tokens served from caches
+
+    # ----- lookup (request path: no network calls) -----
+    def lookup(self, session_id: str, system_prompt: str, turns: list) -> CachedPrefix | None:
+        """Cached prefix for this call, or None when the session is too long to cache
+        (the caller then uses the rolling-summary prompt). May schedule a build."""
+        total = estimate_tokens(system_prompt) + turns_tokens(turns)
+        jobs = []    # started once the lock is released
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and (entry.system_prompt != system_prompt or entry.turns > len(turns)):
+                jobs += self._drop(session_id)   # different scenario prompt / reset conversation
+                entry = None
+            if total > self.max_tokens:
+                jobs += self._drop(session_id)
+                prefix = None
+            else:
+                if entry is None:
+                    entry = self._entries[session_id] = _Entry(system_prompt)
+                    jobs += self._evict()
+                self._entries.move_to_end(session_id)
+                prefix = self._use(session_id, entry, turns, total, jobs)
+        for job in jobs:
+            self.run(*job)
+        return prefix
+
+    def _use(self, session_id: str, entry: _Entry, turns: list, total: int, jobs: list) -> CachedPrefix:
+        now = self.clock()
+        if entry.handle is not None and now >= entry.expires_at:
+            entry.handle, entry.turns, entry.tokens = None, 0, 0   # expired server-side
+        if entry.handle is not None and entry.expires_at - now < self.ttl_s / 2 and self.touch_fn:
+            entry.expires_at = now + self.ttl_s
+            jobs.append((self._touch, entry.handle))
+
+        prefix = CachedPrefix(entry.handle, entry.turns)
+        if entry.handle is not None:
+            self.hits += 1
+            self.cached_tokens += entry.tokens
+        else:
+            self.misses += 1
+
+        uncached = total - entry.tokens
+        due = uncached >= self.extend_tokens if entry.handle is not None else total >= self.min_tokens
+        if due and not entry.building and total >= entry.retry_at_tokens and turns:
+            entry.building = True
+            jobs.append((self._build, session_id, entry, list(turns), total))
+        return prefix
+
+    # ----- background work -----
+    def _build(self, session_id: str, entry: _Entry, turns: list, tokens: int) -> None:
+        try:
+            handle = self.create_fn(entry.system_prompt, turns, self.ttl_s)
+        except Exception as e:
+            print(f"Context cache build failed for {session_id} ({tokens} tokens): {e}")
+            with self._lock:
+                self.failures += 1
+                entry.building = False
+                entry.retry_at_tokens = tokens + self.extend_tokens
+            return
+        with self._lock:
+            self.creates += 1
+            entry.building = False
+            if self._entries.get(session_id) is not entry:   # released/evicted meanwhile
+                stale = handle
+            else:
+                stale, entry.handle = entry.handle, handle
+                entry.turns, entry.tokens = len(turns), tokens
+                entry.expires_at = self.clock() + self.ttl_s
+        if stale is not None:
+            self._delete(stale)
+
+    def _touch(self, handle) -> None:
+        try:
+            self.touch_fn(handle, self.ttl_s)
+        except Exception as e:
+            print(f"Context cache TTL refresh failed: {e}")
+
+    def _delete(self, handle) -> None:
+        try:
+            self.delete_fn(handle)
+            self.deletes += 1
+        except Exception as e:  # caches expire server-side anyway
+            print(f"Context cache delete failed: {e}")
+
+    # ----- removal (call with the lock held; returns the delete jobs to run after it) -----
+    def _drop(self, session_id: str) -> list:
+        entry = self._entries.pop(session_id, None)
+        return [(self._delete, entry.handle)] if entry is not None and entry.handle is not None else []
+
+    def _evict(self) -> list:
+        jobs = []
+        while len(self._entries) > self.max_sessions:
+            jobs += self._drop(next(iter(self._entries)))
+        return jobs
+
+    def invalidate(self, session_id: str, handle) -> None:
+        """`handle` is gone server-side (e.g. 404): forget it, unless a newer cache already replaced it."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.handle is handle:
+                entry.handle, entry.turns, entry.tokens = None, 0, 0
+
+    def release(self, session_id: str) -> None:
+        """Session finished: delete its cache now instead of waiting for the TTL."""
+        with self._lock:
+            jobs = self._drop(session_id)
+        for job in jobs:
+            self.run(*job)
+
+    def close(self) -> None:
+        """Delete every cache (call on shutdown)."""
+        with self._lock:
+            handles = [e.handle for e in self._entries.values() if e.handle is not None]
+            self._entries.clear()
+        for handle in handles:
+            self._delete(handle)
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self.hits + self.misses
+            return {
+                "sessions": len(self._entries),
+                "cached_sessions": sum(e.handle is not None for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / calls, 3) if calls else None,
+                "creates": self.creates,
+                "failures": self.failures,
+                "deletes": self.deletes,
+                "cached_tokens": self.cached_tokens,
+            }
+
+def manager_from_env(create_fn, delete_fn, touch_fn=None) -> ContextCacheManager:
+    return ContextCacheManager(
+        create_fn, delete_fn, touch_fn,
+        min_tokens=int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024")),
+        extend_tokens=int(os.getenv("CONTEXT_CACHE_EXTEND_TOKENS", "1024")),
+        max_tokens=int(os.getenv("CONTEXT_CACHE_MAX_TOKENS", "32768")),
+        ttl_s=float(os.getenv("CONTEXT_CACHE_TTL", "900")),
+        max_sessions=int(os.getenv("CONTEXT_CACHE_SESSIONS", "256")),
+    )
@@ -0,0 +1,133 @@
+"""conversation_context.py
+Incremental conversation context for the coach prompt
+-----------------------------------------------------
+ConversationContext keeps the last N turns verbatim and folds older turns
+into a rolling, extractive summary capped at a token budget, so the
+"Previous conversation" block stays roughly constant in size no matter how
+long the session runs. Turns are appended one at a time; nothing is
+re-concatenated from the full history on each call.
+
+The full verbatim transcript is kept as well (`transcript()`). When Gemini
+context caching is on, that transcript is what goes into the session's
+cached prefix (context_cache.py).
+
+Usage:
+    ctx = ConversationContext()
+    ctx.append(user_text, coach_text)
+    prompt = ctx.render() + "User now says: ..."
+"""
+
+import os
+import re
+from collections import deque
+
+MAX_VERBATIM_TURNS   = int(os.getenv("CONTEXT_VERBATIM_TURNS", "6"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "400"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English)."""
+    return max(1, len(text) // 4)
+
+def _gist(text: str, max_words: int) -> str:
+    """First sentence of `text`, capped at `max_words` words."""
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + "…"
+    return first
+
+def summarize_turn(number: int, user: str, coach: str) -> str:
+    """One-line extractive summary of a folded turn."""
+    return f"Turn {number}: learner said \"{_gist(user, 25)}\"; you replied \"{_gist(coach, 15)}\""
+
+class ConversationContext:
+    """Append-only conversation context with a bounded prompt footprint."""
+
+    def __init__(self, max_verbatim: int = MAX_VERBATIM_TURNS,
+                 summary_token_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.max_verbatim = max_verbatim
+        self.summary_token_budget = summary_token_budget
+        self.recent = deque()          # (number, user, coach) kept verbatim
+        self.summary = deque()         # (line, tokens) for folded turns
+        self.summary_tokens = 0
+        self.dropped = 0               # folded turns trimmed out of the summary
+        self.user_turns = []           # every learner utterance, for the judge
+        self.coach_turns = []          # every coach reply, for the cached prefix
+        self._rendered = None
+
+    def __len__(self) -> int:
+        return len(self.user_turns)
+
+    def append(self, user: str, coach: str) -> None:
+        self.user_turns.append(user)
+        self.coach_turns.append(coach)
+        self.recent.append((len(self.user_turns), user, coach))
+        while len(self.recent) > self.max_verbatim:
+            self._fold(*self.recent.popleft())
+        self._rendered = None
+
+    def _fold(self, number: int, user: str, coach: str) -> None:
+        line = summarize_turn(number, user, coach)
+        tokens = estimate_tokens(line)
+        self.summary.append((line, tokens))
+        self.summary_tokens += tokens
+        while self.summary_tokens > self.summary_token_budget and len(self.summary) > 1:
+            _, old = self.summary.popleft()
+            self.summary_tokens -= old
+            self.dropped += 1
+
+    def transcript(self) -> list | None:
+        """Every (user, coach) turn verbatim; None for contexts saved before coach replies were kept."""
+        if len(self.coach_turns) != len(self.user_turns):
+            return None
+        return list(zip(self.user_turns, self.coach_turns))
+
+    def render(self) -> str:
+        """Context block for the coach prompt (cached until the next append)."""
+        if self._rendered is None:
+            parts = []
+            if self.summary:
+                parts.append("Summary of earlier conversation:\n")
+                if self.dropped:
+                    parts.append(f"- ({self.dropped} earlier turns omitted)\n")
+                parts.extend(f"- {line}\n" for line, _ in self.summary)
+                parts.append("\n")
+            parts.append("Previous conversation:\n")
+            parts.extend(f"User: {user}\nYou: {coach}\n\n" for _, user, coach in self.recent)
+            self._rendered = "".join(parts)
+        return self._rendered
+
+    # ----- (de)serialisation -----
+    @classmethod
+    def from_history(cls, conversation_history: list, **kwargs) -> "ConversationContext":
+        """Build from the legacy list of {'user', 'coach'} dicts."""
+        ctx = cls(**kwargs)
+        for entry in conversation_history or []:
+            ctx.append(entry["user"], entry["coach"])
+        return ctx
+
+    def to_dict(self) -> dict:
+        return {
+            "max_verbatim": self.max_verbatim,
+            "summary_token_budget": self.summary_token_budget,
+            "recent": [list(turn) for turn in self.recent],
+            "summary": [line for line, _ in self.summary],
+            "dropped": self.dropped,
+            "user_turns": self.user_turns,
+            "coach_turns": self.coach_turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConversationContext":
+        ctx = cls(data["max_verbatim"], data["summary_token_budget"])
+        ctx.recent = deque(tuple(turn) for turn in data["recent"])
+        for line in data["summary"]:
+            tokens = estimate_tokens(line)
+            ctx.summary.append((line, tokens))
+            ctx.summary_tokens += tokens
+        ctx.dropped = data["dropped"]
+        ctx.user_turns = list(data["user_turns"])
+        ctx.coach_turns = list(data.get("coach_turns", []))
+        return ctx
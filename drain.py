@@ -0,0 +1,94 @@
+"""drain.py
+Graceful shutdown for in-flight turns
+-------------------------------------
+A deploy or restart sends the backend SIGTERM. Uvicorn alone stops
+listening and waits for open HTTP requests, but it closes live WebSockets
+at once (code 1012) and drops background tasks such as a final evaluation
+that was precomputing. Either way a learner loses a turn they already
+spoke.
+
+Every turn runs inside `turns.turn()` (or between `begin()`/`end()` for a
+live recording), and background work that must reach the session store
+is registered with `turns.track(task)`. On shutdown `await
+turns.drain(timeout)` refuses new turns with `Draining` (HTTP 503 +
+Retry-After, so the client retries on a worker that is still up), then
+waits for the active turns and tracked tasks.
+
+serve.py drains before uvicorn closes any connection. The backend's
+shutdown hook drains again, which covers a plain `uvicorn main:app`.
+
+Env vars:
+  DRAIN_TIMEOUT=30   (seconds to wait for in-flight turns on shutdown)
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "30"))
+
+class Draining(RuntimeError):
+    """Raised for a turn that arrives after shutdown started."""
+
+class TurnTracker:
+    """In-flight turns and background tasks of one worker. Used from its event loop only."""
+
+    def __init__(self):
+        self.active = 0
+        self.draining = False
+        self.refused = 0
+        self._tasks: set = set()
+        self._idle: asyncio.Event | None = None
+
+    def admit(self) -> None:
+        """Raise Draining once shutdown started (for a request that begin()s its turn later)."""
+        if self.draining:
+            self.refused += 1
+            raise Draining("Server is restarting; retry the turn")
+
+    def begin(self) -> None:
+        self.admit()
+        self.active += 1
+
+    def end(self) -> None:
+        self.active -= 1
+        if self.active == 0 and self._idle is not None:
+            self._idle.set()
+
+    @contextmanager
+    def turn(self):
+        self.begin()
+        try:
+            yield
+        finally:
+            self.end()
+
+    def track(self, task: asyncio.Future) -> None:
+        """Shutdown waits for `task` too (after the turns, within the same timeout)."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def pending(self) -> int:
+        return sum(not task.done() for task in self._tasks)
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT) -> bool:
+        """Refuse new turns and wait for the running ones; True if everything finished in time."""
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        if self.active:
+            self._idle = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        tasks = [task for task in self._tasks if not task.done()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+        return self.active == 0 and self.pending() == 0
+
+    def stats(self) -> dict:
+        return {"active_turns": self.active, "background_tasks": self.pending(),
+                "draining": self.draining, "refused": self.refused}
+
+turns = TurnTracker()   # this worker's tracker
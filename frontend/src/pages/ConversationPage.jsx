@@ -3,11 +3,24 @@ import { useLocation } from 'react-router-dom';
 import axios from 'axios';
 import { Mic, Square, Send, Loader, CheckCircle, XCircle, RotateCcw, Volume2, Info } from 'lucide-react';
 
+// AudioWorklet that hands raw microphone samples to the main thread
+const PCM_TAP_WORKLET = `
+class PcmTap extends AudioWorkletProcessor {
+  process(inputs) {
+    const channel = inputs[0][0];
+    if (channel) this.port.postMessage(channel.slice(0));
+    return true;
+  }
+}
+registerProcessor('pcm-tap', PcmTap);
+`;
+
 export default function ConversationPage() {
   const location = useLocation();
   const [scenarios, setScenarios] = useState([]);
   const [selectedScenario, setSelectedScenario] = useState(location.state?.selectedScenario || 'free');
   const [conversationStarted, setConversationStarted] = useState(false);
+  const [sessionId, setSessionId] = useState(null);
   const [coachOpening, setCoachOpening] = useState('');
   const [conversationHistory, setConversationHistory] = useState([]);
   const [isRecording, setIsRecording] = useState(false);
@@ -17,8 +30,10 @@ export default function ConversationPage() {
   const [finalEvaluation, setFinalEvaluation] = useState('');
   const [recordingTime, setRecordingTime] = useState(0);
   const [error, setError] = useState('');
+  const [liveTranscript, setLiveTranscript] = useState('');
   
   const mediaRecorderRef = useRef(null);
+  const liveRef = useRef(null);
   const audioChunksRef = useRef([]);
   const messagesEndRef = useRef(null);
   const recordingIntervalRef = useRef(null);
@@ -67,11 +82,12 @@ export default function ConversationPage() {
         scenario_id: selectedScenario
       });
       setCoachOpening(response.data.opening_message);
+      setSessionId(response.data.session_id);
       setConversationStarted(true);
       
       // Save to localStorage
       const session = {
-        id: Date.now().toString(),
+        id: response.data.session_id,
         scenario_id: selectedScenario,
         created_at: new Date().toISOString(),
         turns: 0,
@@ -87,9 +103,59 @@ export default function ConversationPage() {
     setIsProcessing(false);
   };
 
+  // Live mode: stream 16 kHz PCM over a WebSocket while the learner speaks;
+  // the server cuts utterances and sends back partial transcripts
+  const startLiveRecording = async (stream) => {
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${protocol}://${window.location.host}/api/conversation/live`);
+    ws.binaryType = 'arraybuffer';
+    await new Promise((resolve, reject) => {
+      ws.onopen = resolve;
+      ws.onerror = reject;
+    });
+
+    let context, tap;
+    try {
+      context = new AudioContext({ sampleRate: 16000 });
+      const tapUrl = URL.createObjectURL(new Blob([PCM_TAP_WORKLET], { type: 'application/javascript' }));
+      await context.audioWorklet.addModule(tapUrl);
+      tap = new AudioWorkletNode(context, 'pcm-tap');
+      context.createMediaStreamSource(stream).connect(tap);
+    } catch (e) {
+      ws.close();
+      context?.close();
+      throw e;
+    }
+
+    ws.send(JSON.stringify({ type: 'start', session_id: sessionId, sample_rate: context.sampleRate }));
+    let pending = [];
+    let pendingLength = 0;
+    tap.port.onmessage = ({ data }) => {
+      pending.push(data);
+      pendingLength += data.length;
+      if (pendingLength < context.sampleRate / 10) return;  // ~100 ms per frame
+      const pcm = new Int16Array(pendingLength);
+      let offset = 0;
+      for (const block of pending) {
+        for (let i = 0; i < block.length; i++) {
+          pcm[offset++] = Math.max(-1, Math.min(1, block[i])) * 0x7fff;
+        }
+      }
+      pending = [];
+      pendingLength = 0;
+      if (ws.readyState === WebSocket.OPEN) ws.send(pcm.buffer);
+    };
+    ws.onmessage = ({ data }) => {
+      const message = JSON.parse(data);
+      if (message.type === 'partial') setLiveTranscript(message.transcript);
+    };
+    liveRef.current = { ws, context, stream };
+  };
+
   // Start recording
   const startRecording = async () => {
     setError('');
+    setLiveTranscript('');
     try {
       const stream = await navigator.mediaDevices.getUserMedia({ 
         audio: {
@@ -98,6 +164,16 @@ export default function ConversationPage() {
           sampleRate: 44100
         } 
       });
+
+      try {
+        await startLiveRecording(stream);
+        setIsRecording(true);
+        return;
+      } catch (liveError) {
+        console.warn('Live transcription unavailable, recording the whole answer instead:', liveError);
+        liveRef.current = null;
+      }
+
       mediaRecorderRef.current = new MediaRecorder(stream);
       audioChunksRef.current = [];
 
@@ -121,12 +197,123 @@ export default function ConversationPage() {
 
   // Stop recording
   const stopRecording = () => {
-    if (mediaRecorderRef.current && isRecording) {
+    if (!isRecording) return;
+    setIsRecording(false);
+    if (liveRef.current) {
+      finishLiveTurn();
+    } else if (mediaRecorderRef.current) {
       mediaRecorderRef.current.stop();
-      setIsRecording(false);
     }
   };
 
+  // POST a form and dispatch Server-Sent Events as they arrive
+  const streamEvents = async (url, body, onEvent) => {
+    const response = await fetch(url, { method: 'POST', body });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+      for (const message of messages) {
+        const event = message.match(/^event: (.*)$/m)?.[1];
+        const data = message.match(/^data: (.*)$/m)?.[1];
+        if (event && data) onEvent(event, JSON.parse(data));
+      }
+    }
+  };
+
+  // Collects transcript/token/done events (SSE or WebSocket) into the live turn
+  const turnCollector = () => {
+    let liveTurn = { user: '', coach: '', timestamp: new Date().toISOString() };
+    let result = null;
+    const onEvent = (event, data) => {
+      if (event === 'transcript') {
+        liveTurn = { ...liveTurn, user: data.transcript };
+      } else if (event === 'token') {
+        liveTurn = { ...liveTurn, coach: liveTurn.coach + data.text };
+      } else if (event === 'done') {
+        liveTurn = { ...liveTurn, coach: data.coach_response };
+        result = data;
+      } else if (event === 'error') {
+        throw new Error(data.detail);
+      } else {
+        return;
+      }
+      setConversationHistory([...conversationHistory, liveTurn]);
+    };
+    return { onEvent, turn: () => liveTurn, result: () => result };
+  };
+
+  const finishTurn = async (liveTurn, result) => {
+    if (!result) throw new Error('Stream ended early');
+
+    const updatedHistory = [...conversationHistory, liveTurn];
+    setAudioBlob(null);
+    setLiveTranscript('');
+
+    // Check if complete
+    if (result.is_complete) {
+      setConversationComplete(true);
+      // Get final evaluation
+      const evalResponse = await axios.post('/api/evaluation/final', {
+        session_id: sessionId
+      });
+      setFinalEvaluation(evalResponse.data.evaluation);
+      
+      // Update session
+      updateSession({ 
+        completed: true, 
+        turns: updatedHistory.length,
+        conversation: updatedHistory,
+        finalEvaluation: evalResponse.data.evaluation
+      });
+    } else {
+      updateSession({ 
+        turns: updatedHistory.length,
+        conversation: updatedHistory
+      });
+    }
+  };
+
+  // Live mode: most segments are already transcribed, only the tail is waited on
+  const finishLiveTurn = async () => {
+    const { ws, context, stream } = liveRef.current;
+    liveRef.current = null;
+    stream.getTracks().forEach(track => track.stop());
+    await context.close();
+
+    setIsProcessing(true);
+    setError('');
+    try {
+      const collector = turnCollector();
+      await new Promise((resolve, reject) => {
+        ws.onmessage = ({ data }) => {
+          const { type, ...payload } = JSON.parse(data);
+          if (type === 'partial') return setLiveTranscript(payload.transcript);
+          try {
+            collector.onEvent(type, payload);
+          } catch (e) {
+            return reject(e);
+          }
+          if (type === 'done') resolve();
+        };
+        ws.onclose = () => resolve();
+        ws.send(JSON.stringify({ type: 'stop' }));
+      });
+      ws.close();
+      await finishTurn(collector.turn(), collector.result());
+    } catch (error) {
+      console.error('Error processing audio:', error);
+      setError('Failed to process audio. Please make sure the backend server is running and try again.');
+    }
+    setIsProcessing(false);
+  };
+
   // Send audio
   const sendAudio = async () => {
     if (!audioBlob) return;
@@ -135,46 +322,13 @@ export default function ConversationPage() {
     setError('');
     const formData = new FormData();
     formData.append('file', audioBlob, 'audio.wav');
-    formData.append('scenario_id', selectedScenario);
-    formData.append('history', JSON.stringify(conversationHistory));
+    formData.append('session_id', sessionId);
 
     try {
-      const response = await axios.post('/api/conversation/process', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
-      });
-
-      const newTurn = {
-        user: response.data.transcript,
-        coach: response.data.coach_response,
-        timestamp: new Date().toISOString()
-      };
-
-      const updatedHistory = [...conversationHistory, newTurn];
-      setConversationHistory(updatedHistory);
-      setAudioBlob(null);
-
-      // Check if complete
-      if (response.data.is_complete) {
-        setConversationComplete(true);
-        // Get final evaluation
-        const evalResponse = await axios.post('/api/evaluation/final', {
-          conversation_history: updatedHistory
-        });
-        setFinalEvaluation(evalResponse.data.evaluation);
-        
-        // Update session
-        updateSession({ 
-          completed: true, 
-          turns: updatedHistory.length,
-          conversation: updatedHistory,
-          finalEvaluation: evalResponse.data.evaluation
-        });
-      } else {
-        updateSession({ 
-          turns: updatedHistory.length,
-          conversation: updatedHistory
-        });
-      }
+      // Transcript arrives as soon as ASR finishes, then the coach reply streams in
+      const collector = turnCollector();
+      await streamEvents('/api/conversation/stream', formData, collector.onEvent);
+      await finishTurn(collector.turn(), collector.result());
     } catch (error) {
       console.error('Error processing audio:', error);
       setError('Failed to process audio. Please make sure the backend server is running and try again.');
@@ -185,6 +339,7 @@ export default function ConversationPage() {
   // Reset conversation
   const resetConversation = () => {
     setConversationStarted(false);
+    setSessionId(null);
     setCoachOpening('');
     setConversationHistory([]);
     setConversationComplete(false);
@@ -398,6 +553,9 @@ export default function ConversationPage() {
                           <span className="text-red-600 font-mono text-lg">{formatTime(recordingTime)}</span>
                         </div>
                         <p className="text-sm text-gray-600">Speak clearly into your microphone</p>
+                        {liveTranscript && (
+                          <p className="text-sm text-gray-800 mt-3 italic">{liveTranscript}</p>
+                        )}
                       </div>
                       <button 
                         onClick={stopRecording} 
@@ -0,0 +1,114 @@
+"""incremental_judge.py
+Per-turn judge work in the background
+-------------------------------------
+The final IELTS evaluation used to be one large LLM call over the whole
+conversation, started only after the coach said the conversation was
+complete. Now each turn's transcript is assessed as soon as it exists,
+in parallel with the coach reply. The work is local feature extraction
+(linguistic_analysis.analyze) plus a short provisional-scoring call. At the end the final evaluation
+only has to aggregate the per-turn notes.
+
+Usage:
+    judge = IncrementalJudge(judge_turn, ajudge_turn)
+    judge.submit(turn, transcript)               # or: judge.asubmit(...) inside an event loop
+    ...
+    assessments = judge.assessments(n_turns)     # or: await judge.aassessments(n_turns)
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from linguistic_analysis import analyze
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="turn-judge")
+
+def turn_features(text: str) -> dict:
+    """Cheap, deterministic features of one transcript (see linguistic_analysis)."""
+    return analyze([text])
+
+@dataclass
+class TurnAssessment:
+    turn: int
+    transcript: str
+    features: dict = field(default_factory=dict)
+    notes: str | None = None      # provisional scores from the per-turn judge call
+    error: str | None = None
+
+class IncrementalJudge:
+    """Background per-turn assessments for one conversation.
+
+    `judge_turn(text, turn) -> str` and `ajudge_turn(text, turn)` produce the
+    provisional notes. A failed call is kept as an assessment with `error`
+    set, and the aggregator treats that turn from its transcript alone.
+    """
+
+    def __init__(self, judge_turn, ajudge_turn=None):
+        self.judge_turn = judge_turn
+        self.ajudge_turn = ajudge_turn
+        self._pending: dict[int, object] = {}   # turn -> Future | Task
+        self._transcripts: dict[int, str] = {}  # turn -> transcript being assessed
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _assess(self, turn: int, transcript: str) -> TurnAssessment:
+        assessment = TurnAssessment(turn, transcript, turn_features(transcript))
+        try:
+            assessment.notes = self.judge_turn(transcript, turn)
+        except Exception as e:
+            assessment.error = str(e)
+        return assessment
+
+    async def _aassess(self, turn: int, transcript: str) -> TurnAssessment:
+        if self.ajudge_turn is None:
+            return await asyncio.to_thread(self._assess, turn, transcript)
+        assessment = TurnAssessment(turn, transcript, turn_features(transcript))
+        try:
+            assessment.notes = await self.ajudge_turn(transcript, turn)
+        except Exception as e:
+            assessment.error = str(e)
+        return assessment
+
+    def _claim(self, turn: int, transcript: str) -> bool:
+        """True if `turn` needs assessing. A turn that failed before it was saved and is then
+        re-recorded arrives with a new transcript: the stale assessment, and any after it,
+        are dropped."""
+        if turn in self._pending and self._transcripts.get(turn) == transcript:
+            return False
+        for stale in [t for t in self._pending if t >= turn]:
+            self._pending.pop(stale).cancel()
+            self._transcripts.pop(stale, None)
+        self._transcripts[turn] = transcript
+        return True
+
+    def submit(self, turn: int, transcript: str) -> None:
+        """Start assessing `turn` on a worker thread (no-op if already submitted with this transcript)."""
+        if self._claim(turn, transcript):
+            self._pending[turn] = _executor.submit(self._assess, turn, transcript)
+
+    def asubmit(self, turn: int, transcript: str) -> None:
+        """Start assessing `turn` as a task on the running event loop."""
+        if self._claim(turn, transcript):
+            self._pending[turn] = asyncio.ensure_future(self._aassess(turn, transcript))
+
+    def covers(self, n_turns: int, transcripts: list | None = None) -> bool:
+        """Turns 1..n_turns are all submitted (and, given the saved `transcripts`, with those texts)."""
+        if transcripts is not None and [self._transcripts.get(t) for t in range(1, n_turns + 1)] != list(transcripts):
+            return False
+        return all(t in self._pending for t in range(1, n_turns + 1))
+
+    def assessments(self, n_turns: int | None = None, timeout: float | None = None) -> list[TurnAssessment]:
+        """Block until turns 1..n_turns are assessed (thread-pool submissions)."""
+        turns = range(1, (n_turns or len(self._pending)) + 1)
+        return [self._pending[t].result(timeout=timeout) for t in turns]
+
+    async def aassessments(self, n_turns: int | None = None) -> list[TurnAssessment]:
+        """Await turns 1..n_turns, whichever way they were submitted."""
+        turns = range(1, (n_turns or len(self._pending)) + 1)
+        pending = [self._pending[t] for t in turns]
+        return [await (p if isinstance(p, asyncio.Future) else asyncio.wrap_future(p)) for p in pending]
+
+    def cancel(self) -> None:
+        for pending in self._pending.values():
+            pending.cancel()
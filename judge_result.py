@@ -0,0 +1,159 @@
+"""judge_result.py
+Typed IELTS judge results
+-------------------------
+The judge now answers with JSON that matches RESPONSE_SCHEMA (Gemini
+structured output). parse_judge_result() validates it into a JudgeResult.
+The result can be stored, aggregated and compared without another LLM
+call, and it still renders as markdown for the UIs.
+
+Validation rules:
+- all four criteria present, each 0-9, snapped to the nearest half band
+- overall = IELTS-rounded mean of the criteria (a model value that
+  disagrees is corrected, not rejected)
+- strengths / weaknesses: non-empty lists of strings
+"""
+
+import json
+import math
+import re
+from dataclasses import asdict, dataclass, field
+
+CRITERIA = ("pronunciation", "vocabulary", "grammar", "fluency_coherence")
+CRITERION_LABELS = {
+    "pronunciation": "Pronunciation",
+    "vocabulary": "Vocabulary",
+    "grammar": "Grammar",
+    "fluency_coherence": "Fluency & Coherence",
+}
+
+# Gemini response_schema (OpenAPI subset)
+_CRITERION_SCHEMA = {
+    "type": "object",
+    "properties": {"score": {"type": "number"}, "justification": {"type": "string"}},
+    "required": ["score", "justification"],
+}
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{name: _CRITERION_SCHEMA for name in CRITERIA},
+        "overall_band": {"type": "number"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "weaknesses": {"type": "array", "items": {"type": "string"}},
+        "examples": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "sentence": {"type": "string"},
+                    "comment": {"type": "string"},
+                    "strong": {"type": "boolean"},
+                },
+                "required": ["sentence", "comment", "strong"],
+            },
+        },
+    },
+    "required": [*CRITERIA, "overall_band", "strengths", "weaknesses", "examples"],
+}
+
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+class JudgeResultError(ValueError):
+    """The judge output is not valid JSON or breaks the schema rules."""
+
+def ielts_round(value: float) -> float:
+    """IELTS overall-band rounding: .25 rounds up to .5, .75 up to the next band."""
+    return math.floor(value * 2 + 0.5) / 2
+
+@dataclass
+class Criterion:
+    score: float
+    justification: str = ""
+
+@dataclass
+class JudgeResult:
+    pronunciation: Criterion
+    vocabulary: Criterion
+    grammar: Criterion
+    fluency_coherence: Criterion
+    overall_band: float
+    strengths: list = field(default_factory=list)
+    weaknesses: list = field(default_factory=list)
+    examples: list = field(default_factory=list)   # [{'sentence', 'comment', 'strong'}]
+
+    @property
+    def scores(self) -> dict:
+        """Compact form for storage and analytics: criterion -> band, plus 'overall'."""
+        return {**{name: getattr(self, name).score for name in CRITERIA}, "overall": self.overall_band}
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "JudgeResult":
+        return validate(data)
+
+    def to_markdown(self) -> str:
+        lines = [f"**Overall band: {self.overall_band:g}**", ""]
+        for name in CRITERIA:
+            c = getattr(self, name)
+            lines.append(f"- **{CRITERION_LABELS[name]}: {c.score:g}** - {c.justification}")
+        lines += ["", "**Strengths**", *[f"- {s}" for s in self.strengths]]
+        lines += ["", "**Areas for improvement**", *[f"- {w}" for w in self.weaknesses]]
+        if self.examples:
+            lines += ["", "**Examples**"]
+            for ex in self.examples:
+                lines.append(f"- {'✅' if ex['strong'] else '⚠️'} \"{ex['sentence']}\" - {ex['comment']}")
+        return "\n".join(lines)
+
+def _score(value, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise JudgeResultError(f"{where}: score must be a number, got {value!r}")
+    if not 0 <= value <= 9:
+        raise JudgeResultError(f"{where}: score {value} is outside 0-9")
+    return round(value * 2) / 2
+
+def _strings(data: dict, key: str) -> list:
+    items = data.get(key)
+    if not isinstance(items, list) or not items or not all(isinstance(s, str) and s.strip() for s in items):
+        raise JudgeResultError(f"{key}: expected a non-empty list of strings")
+    return [s.strip() for s in items]
+
+def validate(data: dict) -> JudgeResult:
+    """Check a decoded judge payload and build a JudgeResult (raises JudgeResultError)."""
+    if not isinstance(data, dict):
+        raise JudgeResultError("expected a JSON object")
+    criteria = {}
+    for name in CRITERIA:
+        raw = data.get(name)
+        if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+            raw = {"score": raw}
+        if not isinstance(raw, dict) or "score" not in raw:
+            raise JudgeResultError(f"{name}: missing")
+        criteria[name] = Criterion(_score(raw["score"], name), str(raw.get("justification", "")).strip())
+
+    examples = []
+    for i, ex in enumerate(data.get("examples") or []):
+        if not isinstance(ex, dict) or not isinstance(ex.get("sentence"), str):
+            raise JudgeResultError(f"examples[{i}]: expected an object with a sentence")
+        examples.append({"sentence": ex["sentence"].strip(), "comment": str(ex.get("comment", "")).strip(),
+                         "strong": bool(ex.get("strong", False))})
+
+    overall = ielts_round(sum(c.score for c in criteria.values()) / len(CRITERIA))
+    return JudgeResult(**criteria, overall_band=overall, strengths=_strings(data, "strengths"),
+                       weaknesses=_strings(data, "weaknesses"), examples=examples)
+
+def parse_judge_result(text: str) -> JudgeResult:
+    """Decode the model's JSON (tolerating a ```json fence) and validate it."""
+    body = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", text.strip())
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise JudgeResultError(f"invalid JSON: {e}") from None
+    return validate(data)
+
+def repair_prompt(previous: str, error: JudgeResultError) -> str:
+    """User prompt for the single repair retry."""
+    return (f"Your previous answer could not be used: {error}.\n"
+            f"Previous answer:\n{previous[:4000]}\n\n"
+            "Return ONLY the corrected JSON object, following the required schema exactly. "
+            "Scores are numbers from 0 to 9; strengths and weaknesses are non-empty lists.")
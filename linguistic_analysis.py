@@ -0,0 +1,220 @@
+"""linguistic_analysis.py
+Local linguistic pre-analysis for the judge
+-------------------------------------------
+Before this, the judge got the raw transcript and had to count everything
+itself: word variety, hesitations, sentence length. Those numbers are
+deterministic, so they are now measured locally in a few milliseconds and
+handed to the judge as one compact line. The judge call gets shorter and
+its scores vary less from run to run. The same numbers drive an
+instant_score() preview that needs no LLM call.
+
+Measured:
+- lexical diversity: type-token ratio and MTLD (McCarthy & Jarvis 2010)
+- words per turn, fillers/hesitations per 100 words, self-repetitions
+- sentence length distribution (mean, median, p90, share of 15+ word sentences)
+  and the share of sentences with a subordinate clause
+- vocabulary band coverage (K1 / K2 / AWL / off-list) from word_bands.txt
+
+Usage:
+    features = analyze(["I usually go to work by bus.", "Um, it's quite convenient."])
+    render(features)          # compact one-line summary for prompts
+    instant_score(features)   # heuristic bands, pronunciation = None
+"""
+
+import os
+import re
+import statistics
+from functools import lru_cache
+
+from judge_result import ielts_round
+
+WORD_BANDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "word_bands.txt")
+BANDS = ("K1", "K2", "AWL")
+
+HESITATIONS = {"um", "uh", "erm", "er", "hmm"}
+FILLER_PHRASES = HESITATIONS | {"basically", "you know", "i mean"}
+DISCOURSE_MARKERS = {"like", "actually"}   # fillers only when set off from the clause, not "I would like tea"
+FILLERS = FILLER_PHRASES | DISCOURSE_MARKERS
+_PUNCT = set(",.!?;:")
+_VERB_SLOT = {"i", "you", "we", "they", "he", "she", "it", "who", "people", "to", "would", "could", "should",
+              "will", "might", "may", "must", "can", "do", "does", "did", "don't", "didn't", "i'd", "we'd",
+              "you'd", "they'd", "really", "also", "just"}   # "like" after these is the verb
+SUBORDINATORS = {"because", "although", "though", "which", "who", "whom", "whose", "when", "while",
+                 "if", "unless", "since", "whereas", "that", "where", "so that", "even though"}
+MTLD_THRESHOLD = 0.72
+LONG_SENTENCE = 15
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_WORD_OR_PUNCT = re.compile(r"[a-z]+(?:'[a-z]+)?|[,.!?;:]")
+
+@lru_cache(maxsize=1)
+def word_bands(path: str = WORD_BANDS_PATH) -> dict:
+    """headword -> band, first band wins ('K1' < 'K2' < 'AWL')."""
+    bands, current = {}, None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line.startswith("["):
+                current = line.strip("[]")
+            elif line and current:
+                for word in line.split():
+                    bands.setdefault(word.lower(), current)
+    return bands
+
+def _candidates(word: str):
+    """The word, then plausible headwords for a regular inflection."""
+    yield word
+    if word.endswith("'s"):
+        word = word[:-2]
+        yield word
+    if "'" in word:
+        yield word.split("'", 1)[0]
+    for suffix, repl in (("ies", "y"), ("ied", "y"), ("ier", "y"), ("iest", "y"), ("ily", "y"),
+                         ("ing", ""), ("ing", "e"), ("ed", ""), ("ed", "e"), ("es", ""), ("s", ""),
+                         ("er", ""), ("er", "e"), ("est", ""), ("est", "e"), ("ly", ""), ("ally", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            stem = word[:-len(suffix)] + repl
+            yield stem
+            if not repl and len(stem) > 2 and stem[-1] == stem[-2]:  # stopped -> stop
+                yield stem[:-1]
+
+def band_of(word: str) -> str | None:
+    bands = word_bands()
+    for candidate in _candidates(word.lower()):
+        if candidate in bands:
+            return bands[candidate]
+    return None
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+def sentences(text: str) -> list[list[str]]:
+    return [words for words in (tokenize(s) for s in re.split(r"[.!?]+", text)) if words]
+
+def _is_marker(word: str, before: str | None, after: str | None, previous_word: str | None) -> bool:
+    """"like"/"actually" as a discourse marker. `before`/`after` are the neighbouring tokens
+    (punctuation included, None at the edges)."""
+    if word == "actually":   # "Actually, ..." / "It was, actually, fine" - not "I actually finished"
+        return before is None or before in _PUNCT or after in _PUNCT
+    # "I read, like, every day" / "It was like, huge" - not "I like it", "would like a coffee",
+    # "fruit, like apples"
+    return after in _PUNCT and previous_word not in _VERB_SLOT
+
+def count_fillers(text: str) -> int:
+    """Hesitations and filler phrases, plus "like"/"actually" where they are discourse markers."""
+    tokens = _WORD_OR_PUNCT.findall(text.lower())
+    words = [t for t in tokens if t not in _PUNCT]
+    joined = " ".join(words)
+    count = sum(len(re.findall(rf"\b{re.escape(f)}\b", joined)) for f in FILLER_PHRASES)
+    previous_word = None
+    for i, token in enumerate(tokens):
+        if token in _PUNCT:
+            continue
+        if token in DISCOURSE_MARKERS:
+            before = tokens[i - 1] if i else None
+            after = tokens[i + 1] if i + 1 < len(tokens) else None
+            count += _is_marker(token, before, after, previous_word)
+        previous_word = token
+    return count
+
+def _mtld_pass(words: list[str]) -> float:
+    factors, types, count = 0.0, set(), 0
+    for word in words:
+        types.add(word)
+        count += 1
+        if len(types) / count <= MTLD_THRESHOLD:
+            factors += 1
+            types, count = set(), 0
+    if count:
+        factors += (1 - len(types) / count) / (1 - MTLD_THRESHOLD)
+    return len(words) / factors if factors else float(len(words))
+
+def mtld(words: list[str]) -> float:
+    """Mean of the forward and backward MTLD passes (length-robust lexical diversity)."""
+    if not words:
+        return 0.0
+    return (_mtld_pass(words) + _mtld_pass(words[::-1])) / 2
+
+def _percentile(values: list[int], q: float) -> float:
+    ordered = sorted(values)
+    return float(ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+
+def analyze(turns: list[str]) -> dict:
+    """Features of the learner's turns (one string per turn), all plain numbers."""
+    turn_words = [tokenize(t) for t in turns]
+    words = [w for ws in turn_words for w in ws]
+    sents = [s for t in turns for s in sentences(t)]
+    lengths = [len(s) for s in sents]
+    fillers = sum(count_fillers(t) for t in turns)
+    hesitations = sum(w in HESITATIONS for w in words)
+    repetitions = sum(a == b and a not in HESITATIONS for ws in sents for a, b in zip(ws, ws[1:]))
+    content = [w for w in words if w not in HESITATIONS]
+    coverage = dict.fromkeys(BANDS, 0)
+    off_list = 0
+    for word in content:
+        band = band_of(word)
+        if band is None:
+            off_list += 1
+        else:
+            coverage[band] += 1
+    n = len(words)
+    per_100 = 100 / n if n else 0.0
+    return {
+        "turns": len(turns),
+        "words": n,
+        "unique_words": len(set(words)),
+        "words_per_turn": round(n / len(turns), 1) if turns else 0.0,
+        "max_turn_words": max((len(ws) for ws in turn_words), default=0),
+        "ttr": round(len(set(content)) / len(content), 3) if content else 0.0,
+        "mtld": round(mtld(content), 1),
+        "fillers": fillers,
+        "fillers_per_100": round(fillers * per_100, 1),
+        "hesitations": hesitations,
+        "repetitions": repetitions,
+        "sentences": len(sents),
+        "mean_sentence_words": round(sum(lengths) / len(lengths), 1) if lengths else 0.0,
+        "median_sentence_words": float(statistics.median(lengths)) if lengths else 0.0,
+        "p90_sentence_words": _percentile(lengths, 0.9) if lengths else 0.0,
+        "long_sentence_share": round(sum(l >= LONG_SENTENCE for l in lengths) / len(lengths), 2) if lengths else 0.0,
+        "complex_sentence_share": round(sum(bool(SUBORDINATORS & set(s) or
+                                                 SUBORDINATORS & {f"{a} {b}" for a, b in zip(s, s[1:])})
+                                            for s in sents) / len(sents), 2) if sents else 0.0,
+        "bands": {**{b: round(c / len(content), 3) for b, c in coverage.items()},
+                  "off_list": round(off_list / len(content), 3)} if content else
+                 {**dict.fromkeys(BANDS, 0.0), "off_list": 0.0},
+    }
+
+def render(features: dict) -> str:
+    """One compact line for a judge prompt."""
+    f, b = features, features["bands"]
+    return (f"{f['words']} words / {f['turns']} turns ({f['words_per_turn']} per turn, max {f['max_turn_words']}); "
+            f"TTR {f['ttr']}, MTLD {f['mtld']}; fillers {f['fillers']} ({f['fillers_per_100']}/100w), "
+            f"hesitations {f['hesitations']}, repetitions {f['repetitions']}; "
+            f"sentence words mean {f['mean_sentence_words']}, median {f['median_sentence_words']:g}, "
+            f"p90 {f['p90_sentence_words']:g}, 15+ {f['long_sentence_share']:.0%}, "
+            f"with subordinate clause {f['complex_sentence_share']:.0%}; "
+            f"vocabulary K1 {b['K1']:.0%}, K2 {b['K2']:.0%}, AWL {b['AWL']:.0%}, off-list {b['off_list']:.0%}")
+
+def _clip(value: float, low: float = 2.0, high: float = 8.5) -> float:
+    return min(high, max(low, value))
+
+def instant_score(features: dict) -> dict:
+    """Heuristic preview bands from the features alone (no LLM call).
+
+    Same shape as JudgeResult.scores. Pronunciation can't be measured from
+    a transcript, so it is None and left out of the overall. This is a
+    preview for the UI, not a replacement for the judge.
+    """
+    f, b = features, features["bands"]
+    if not f["words"]:
+        return {"pronunciation": None, "vocabulary": None, "grammar": None,
+                "fluency_coherence": None, "overall": None}
+    diversity = min(f["mtld"], 100) if f["words"] >= 50 else f["ttr"] * 60
+    vocabulary = _clip(3.5 + (diversity - 20) / 12 + _clip((b["K2"] + b["AWL"] - 0.08) * 12, -0.5, 1.5))
+    grammar = _clip(3.5 + 2.5 * f["complex_sentence_share"] + min(f["mean_sentence_words"], 20) / 8
+                    + 1.5 * f["long_sentence_share"])
+    fluency = _clip(3.5 + min(f["words_per_turn"], 40) / 10
+                    - 0.15 * f["fillers_per_100"] - 0.3 * min(f["repetitions"], 5))
+    scores = {"vocabulary": round(vocabulary * 2) / 2, "grammar": round(grammar * 2) / 2,
+              "fluency_coherence": round(fluency * 2) / 2}
+    return {"pronunciation": None, **scores, "overall": ielts_round(sum(scores.values()) / len(scores))}
@@ -0,0 +1,268 @@
+"""loadtest.py
+Load-test the backend with N concurrent sessions
+------------------------------------------------
+Each session starts a conversation, sends `--turns` recorded turns through
+/api/conversation/process (or /stream) and can finish with the final
+evaluation. The report covers throughput, latency percentiles per
+endpoint, error counts and the server's own stage breakdown (timings_ms).
+
+By default backend/main.py runs in-process on the httpx ASGI transport.
+Typhoon and Gemini are replaced by the stubs in providers.py, so the run
+needs no keys or network and measures only our own overhead on top of
+the stubbed provider latency. `--url` targets a running server instead,
+for example one started with STUB_PROVIDERS=all.
+
+In-process, a streamed response arrives all at once. For streams the
+client-side transcript and first-token times are only meaningful with
+--url; the server-side first_token_ms is reported either way.
+
+Usage:
+    python loadtest.py [--sessions 50] [--turns 5] [--mode process|stream] [--evaluate]
+                       [--gemini-latency lognormal:0.6:0.4] [--typhoon-latency lognormal:0.4:0.3]
+                       [--error-rate 0] [--seed 1] [--ramp 0] [--json report.json]
+    STUB_PROVIDERS=all SESSION_STORE=sqlite python serve.py --workers 4
+    python loadtest.py --url http://127.0.0.1:8000 --sessions 200
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+import time
+import wave
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def _percentile(values: list, q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def wav_bytes(seconds: float, freq: float, sample_rate: int = 16000) -> bytes:
+    """A mono 16-bit tone. Vary `freq` per turn so the transcript cache doesn't answer repeats."""
+    n = int(seconds * sample_rate)
+    frames = bytearray()
+    for i in range(n):
+        frames += int(8000 * math.sin(2 * math.pi * freq * i / sample_rate)).to_bytes(2, "little", signed=True)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(frames))
+    return buf.getvalue()
+
+def parse_sse(text: str) -> list:
+    """[(event, data)] from a complete Server-Sent Events body."""
+    events = []
+    for block in text.split("\n\n"):
+        event = data = None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+        if event:
+            events.append((event, data))
+    return events
+
+class LoadTest:
+    """Runs `sessions` concurrent sessions against an httpx.AsyncClient and collects latencies."""
+
+    def __init__(self, sessions: int = 50, turns: int = 5, mode: str = "process", evaluate: bool = False,
+                 scenario: str | None = None, audio_seconds: float = 2.0, ramp_s: float = 0.0):
+        self.sessions = sessions
+        self.turns = turns
+        self.mode = mode
+        self.evaluate = evaluate
+        self.scenario = scenario
+        self.audio_seconds = audio_seconds
+        self.ramp_s = ramp_s
+        self.latencies = defaultdict(list)   # op -> [seconds]
+        self.errors = defaultdict(int)       # op -> count
+        self.stages = defaultdict(list)      # server stage -> [ms]
+        self.turns_done = 0
+        self._audio = {}
+
+    def _record(self, op: str, seconds: float, ok: bool = True) -> None:
+        self.latencies[op].append(seconds)
+        if not ok:
+            self.errors[op] += 1
+
+    def _timings(self, timings: dict | None) -> None:
+        for name, ms in (timings or {}).items():
+            self.stages[name].append(ms)
+
+    def _turn_audio(self, turn: int, index: int) -> bytes:
+        freq = 220 + 10 * turn + (index % 97) * 0.5
+        if freq not in self._audio:
+            self._audio[freq] = wav_bytes(self.audio_seconds, freq)
+        return self._audio[freq]
+
+    async def _post(self, client, op: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = await client.post(path, **kwargs)
+        except Exception:
+            self._record(op, time.perf_counter() - start, ok=False)
+            return None
+        self._record(op, time.perf_counter() - start, ok=resp.status_code == 200)
+        return resp.json() if resp.status_code == 200 else None
+
+    async def _stream_turn(self, client, session_id: str, audio: bytes) -> dict | None:
+        start = time.perf_counter()
+        done, marks = None, {}
+        try:
+            async with client.stream("POST", "/api/conversation/stream", data={"session_id": session_id},
+                                     files={"file": ("turn.wav", audio, "audio/wav")}) as resp:
+                if resp.status_code != 200:
+                    self._record("stream", time.perf_counter() - start, ok=False)
+                    return None
+                body = ""
+                async for text in resp.aiter_text():
+                    body += text
+                    for event, _ in parse_sse(body):
+                        marks.setdefault(event, time.perf_counter() - start)
+                for event, data in parse_sse(body):
+                    if event == "done":
+                        done = data
+        except Exception:
+            self._record("stream", time.perf_counter() - start, ok=False)
+            return None
+        self._record("stream", time.perf_counter() - start, ok=done is not None)
+        if "transcript" in marks:
+            self._record("stream.transcript", marks["transcript"])
+        if "token" in marks:
+            self._record("stream.first_token", marks["token"])
+        if done is not None and done.get("first_token_ms") is not None:
+            self.stages["first_token"].append(done["first_token_ms"])
+        return done
+
+    async def _session(self, client, index: int, scenarios: list) -> None:
+        await asyncio.sleep(self.ramp_s * index / max(1, self.sessions))
+        scenario = self.scenario or (scenarios[index % len(scenarios)] if scenarios else "free")
+        started = await self._post(client, "start", "/api/conversation/start", json={"scenario_id": scenario})
+        if started is None:
+            return
+        session_id = started["session_id"]
+        for turn in range(self.turns):
+            audio = self._turn_audio(turn, index)
+            if self.mode == "stream":
+                result = await self._stream_turn(client, session_id, audio)
+            else:
+                result = await self._post(client, "process", "/api/conversation/process", data={"session_id": session_id},
+                                          files={"file": ("turn.wav", audio, "audio/wav")})
+            if result is None:
+                continue
+            self.turns_done += 1
+            self._timings(result.get("timings_ms"))
+            if result.get("is_complete"):
+                break
+        if self.evaluate:
+            await self._post(client, "evaluate", "/api/evaluation/final", json={"session_id": session_id})
+
+    async def run(self, client) -> dict:
+        resp = await client.get("/api/scenarios")
+        scenarios = [s["id"] for s in resp.json()["scenarios"]] if resp.status_code == 200 else []
+        start = time.perf_counter()
+        await asyncio.gather(*(self._session(client, i, scenarios) for i in range(self.sessions)))
+        return self.report(time.perf_counter() - start)
+
+    def report(self, wall_s: float) -> dict:
+        requests = sum(len(v) for op, v in self.latencies.items() if "." not in op)
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        return {
+            "sessions": self.sessions, "turns_per_session": self.turns, "turns": self.turns_done, "mode": self.mode,
+            "wall_s": round(wall_s, 2),
+            "turns_per_s": round(self.turns_done / wall_s, 2) if wall_s else None,
+            "requests_per_s": round(requests / wall_s, 2) if wall_s else None,
+            "errors": sum(self.errors.values()),
+            "endpoints": {op: {"count": len(v), "errors": self.errors.get(op, 0),
+                               **{f"p{int(q * 100)}_ms": ms(_percentile(v, q)) for q in (0.5, 0.9, 0.95, 0.99)},
+                               "max_ms": ms(max(v))}
+                          for op, v in self.latencies.items()},
+            "server_stages_ms": {name: {"p50": _percentile(v, 0.5), "p95": _percentile(v, 0.95)}
+                                 for name, v in self.stages.items()},
+        }
+
+def print_report(report: dict, setup: str) -> None:
+    print("=" * 78)
+    print(f"{report['sessions']} sessions x {report['turns_per_session']} turns ({report['mode']}), {setup}")
+    print("=" * 78)
+    print(f"wall {report['wall_s']} s   turns {report['turns']} ({report['turns_per_s']}/s)   "
+          f"requests/s {report['requests_per_s']}   errors {report['errors']}")
+    print(f"\n{'endpoint':20s} {'count':>6} {'err':>5} {'p50 ms':>9} {'p90 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for op, s in report["endpoints"].items():
+        print(f"{op:20s} {s['count']:6d} {s['errors']:5d} {s['p50_ms']:9.1f} {s['p90_ms']:9.1f} "
+              f"{s['p95_ms']:9.1f} {s['p99_ms']:9.1f} {s['max_ms']:9.1f}")
+    if report["server_stages_ms"]:
+        print(f"\n{'server stage':20s} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, s in report["server_stages_ms"].items():
+            print(f"{name:20s} {s['p50']:9.1f} {s['p95']:9.1f}")
+    print("=" * 78)
+
+def local_app(args):
+    """backend/main.py in-process with stubbed providers (`args` gives their latency/error settings)."""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, "backend"))
+    import model_service
+    from providers import StubGemini
+    from stub_typhoon_server import start_stub_typhoon
+
+    model_service.use_stubs(
+        StubGemini(latency=args.gemini_latency, error_rate=args.error_rate, prefill_s_per_1k=args.prefill_ms / 1000,
+                   seed=args.seed),
+        start_stub_typhoon(latency=args.typhoon_latency, error_rate=args.error_rate, seed=args.seed),
+    )
+    model_service.warm_model_registry()   # what the startup hook does
+    model_service.warm_opening_pool()
+    from main import app
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--mode", choices=("process", "stream"), default="process")
+    parser.add_argument("--evaluate", action="store_true", help="request the final evaluation after the last turn")
+    parser.add_argument("--scenario", help="scenario id for every session (default: round-robin over /api/scenarios)")
+    parser.add_argument("--audio-seconds", type=float, default=2.0)
+    parser.add_argument("--ramp", type=float, default=0.0, help="spread session starts over this many seconds")
+    parser.add_argument("--url", help="load a running server instead of the in-process app")
+    parser.add_argument("--gemini-latency", default="lognormal:0.6:0.4")
+    parser.add_argument("--typhoon-latency", default="lognormal:0.4:0.3")
+    parser.add_argument("--prefill-ms", type=float, default=0.0, help="stub Gemini ms per 1k uncached prompt tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub failure rate for both providers")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    import httpx
+    test = LoadTest(args.sessions, args.turns, args.mode, args.evaluate, args.scenario, args.audio_seconds, args.ramp)
+    if args.url:
+        setup = f"server {args.url}"
+        client = httpx.AsyncClient(base_url=args.url, timeout=300,
+                                   limits=httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions))
+    else:
+        setup = (f"in-process, stub Gemini {args.gemini_latency} / Typhoon {args.typhoon_latency}, "
+                 f"error rate {args.error_rate:g}")
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=local_app(args)), base_url="http://loadtest",
+                                   timeout=300)
+
+    async def run():
+        async with client:
+            return await test.run(client)
+
+    report = asyncio.run(run())
+    print_report(report, setup)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,924 @@
-
 """model_service.py
 Core backend for Dual-LLM demo
 --------------------------------
 Functions:
-- transcribe()  : Typhoon ASR -> text
+- transcribe()  : Typhoon ASR -> text (pooled TyphoonClient, hedged with Gemini)
 - coach_feedback(): Gemini coach feedback
-- judge_feedback(): Gemini judge/scoring
+- judge_feedback(): Gemini judge/scoring (judge_scores() / judge_final_scores() return a
+  typed JudgeResult parsed from schema-constrained JSON)
+- new_incremental_judge() / judge_turn(): per-turn judge work in the background,
+  so judge_final_evaluation() only aggregates
 - process()     : end‑to‑end helper
+- live_transcriber(): streaming ASR with server-side endpointing (partial transcripts)
+- atranscribe() / acoach_feedback() / ajudge_final_evaluation() /
+  astart_conversation() / aprocess() : non-blocking asyncio versions
 Set env vars:
   export TYPHOON_API_KEY=...
-  export GOOGLE_API_KEY=...
+  export GEMINI_API_KEY=...
+Importing this module is cheap and needs no keys or network: .env is loaded, keys are
+validated and the Gemini SDK / HTTP clients are imported on first use. Call init() at
+startup to fail fast on a missing key instead.
+Optional Typhoon client tuning:
+  TYPHOON_POOL_SIZE (10), TYPHOON_CONNECT_TIMEOUT (5s),
+  TYPHOON_READ_TIMEOUT (60s), TYPHOON_MAX_RETRIES (2)
+Gemini model handle cache: GEMINI_MODEL_CACHE_SIZE (64)
+Coach context caching (per-session Gemini cached contents, context_cache.py): CONTEXT_CACHE (1),
+  CONTEXT_CACHE_MIN_TOKENS (1024), CONTEXT_CACHE_EXTEND_TOKENS (1024), CONTEXT_CACHE_MAX_TOKENS (32768),
+  CONTEXT_CACHE_TTL (900s), CONTEXT_CACHE_SESSIONS (256)
+Gemini ASR: GEMINI_INLINE_AUDIO_BYTES (15 MB; larger clips use the File API)
+Audio preprocessing (decode, mono, 16 kHz, VAD trim): AUDIO_PREPROCESS (1),
+  AUDIO_ENCODE (wav|flac|opus)
+Transcript cache: TRANSCRIPT_CACHE_SIZE (1024), TRANSCRIPT_CACHE_DB (unset = memory only),
+  TRANSCRIPT_CACHE_TTL (7 days)
+Long audio: ASR_CHUNK_MIN_SECONDS (30; 0 disables), ASR_CHUNK_SECONDS (20),
+  ASR_CHUNK_OVERLAP (1s), ASR_CHUNK_WORKERS (8)
+Live ASR endpointing: LIVE_END_SILENCE_MS (600), LIVE_MAX_SEGMENT_S (20), LIVE_MAX_INFLIGHT (4)
+ASR hedging: ASR_HEDGE (1), ASR_HEDGE_DELAY (fixed seconds; default = Typhoon p95),
+  ASR_HEDGE_DEFAULT_DELAY (3s, used until enough samples), ASR_ATTEMPT_TIMEOUT (30s per Typhoon
+  call, retries included; 0 = only TYPHOON_READ_TIMEOUT per attempt)
+Per-turn background judge model: TURN_JUDGE_MODEL (gemini-2.5-flash)
+Provider limits: RATE_LIMITS="typhoon=10/5,gemini-2.5-flash=16/8" (concurrency/rps[/burst] per
+  provider or model; defaults: Typhoon concurrency = TYPHOON_POOL_SIZE, Gemini 16, no rps cap).
+  Live turns are admitted before interactive, then batch/evaluation work (rate_governor.py).
+  RATE_LIMITS covers the whole deployment; each of WEB_CONCURRENCY workers enforces its share
+Conversation openings: OPENING_POOL_SIZE (0 = off) pre-generated per scenario, refilled below
+  OPENING_POOL_REFILL_AT; concurrent identical starts share one call (opening_pool.py)
+Circuit breakers (per ASR backend / Gemini model): BREAKER_FAILURE_RATE (0.5), BREAKER_MIN_CALLS (5),
+  BREAKER_WINDOW (20), BREAKER_OPEN_SECONDS (30), BREAKER_SLOW_CALL_S (unset)
+Telemetry: per-stage / per-backend / per-prompt-kind histograms, exported in Prometheus format
+  by the backend's /metrics (telemetry.py); TRACE_SLOW_MS logs slow request breakdowns
 Install deps:
-  pip install openai google-generativeai requests
+  pip install google-generativeai requests httpx numpy python-dotenv
 """
 
-import os, requests
-from google.generativeai import configure, GenerativeModel
-import openai
-from dotenv import load_dotenv
-load_dotenv()  # take environment variables from .env.
+import os, asyncio, random, threading, time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from conversation_context import ConversationContext, estimate_tokens
+from asr_router import ASRBackend, HedgedASRRouter
+import audio_preprocess
+from audio_preprocess import PreparedAudio
+from transcript_cache import audio_key, make_transcript_cache
+from chunked_asr import atranscribe_chunked, transcribe_chunked
+from streaming_asr import StreamingTranscriber
+from incremental_judge import IncrementalJudge
+from linguistic_analysis import analyze, instant_score, render
+from circuit_breaker import CircuitOpenError, breaker_from_env
+import context_cache
+from opening_pool import SingleFlight, pool_from_env
+from providers import StubGemini, gemini_from_env, stub_gemini_from_env, stubbed, typhoon_stub_from_env
+from rate_governor import BATCH, GovernorRegistry, Limits, parse_limits, per_worker, priority
+from shared_state import worker_count
+from judge_result import (JSON_GENERATION_CONFIG, JudgeResult, JudgeResultError,
+                          parse_judge_result, repair_prompt)
+import telemetry
+from telemetry import (ASR_SECONDS, LLM_CACHED_TOKENS, LLM_PROMPT_TOKENS, LLM_RESPONSE_TOKENS, LLM_SECONDS,
+                       observe_stage, stage)
+
+# ---------- Lazy initialisation ----------
+# google.generativeai alone takes ~0.6 s to import; requests/httpx/dotenv add more.
+# None of it is needed to import this module (tests, the Streamlit app, workers).
+KEY_ENV = {"typhoon": "TYPHOON_API_KEY", "gemini": "GEMINI_API_KEY"}
+STUBS = stubbed()           # STUB_PROVIDERS: these run offline against providers.py stubs
+gemini = gemini_from_env()  # GeminiProvider (SDK) or StubGemini
+typhoon_stub = None         # local Typhoon server when Typhoon is stubbed
+_ready: set = set()
+_init_lock = threading.Lock()
+
+def init(providers=("typhoon", "gemini")) -> None:
+    """Load .env, validate the providers' API keys and configure their clients (idempotent).
+
+    Every provider is initialised on its first call anyway; call this at startup to
+    fail fast on a missing key.
+    """
+    with _init_lock:
+        todo = [p for p in providers if p not in _ready]
+        if not todo:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()  # take environment variables from .env.
+        missing = [KEY_ENV[p] for p in todo if p not in STUBS and not os.getenv(KEY_ENV[p])]
+        if missing:
+            raise RuntimeError(f"❌ Please set {' and '.join(missing)} environment variable(s).")
+        if "typhoon" in todo:
+            if "typhoon" in STUBS:
+                _use_typhoon_stub(typhoon_stub_from_env())
+            else:
+                typhoon.set_api_key(os.environ["TYPHOON_API_KEY"])
+        if "gemini" in todo:
+            gemini.configure(os.getenv("GEMINI_API_KEY"))
+        _ready.update(todo)
+
+def use_stubs(gemini_stub: StubGemini = None, typhoon_server=None) -> None:
+    """Run offline (load tests, benchmarks): Gemini calls go to `gemini_stub` and Typhoon
+    requests to `typhoon_server` (stub_typhoon_server), by default both configured from
+    the STUB_* env vars. Call before any traffic; no keys are needed."""
+    global gemini
+    with _init_lock:
+        gemini = gemini_stub or stub_gemini_from_env()
+        _use_typhoon_stub(typhoon_server or typhoon_stub_from_env())
+        models.clear()
+        STUBS.update(KEY_ENV)
+        _ready.update(KEY_ENV)
+
+def _use_typhoon_stub(server) -> None:
+    global typhoon_stub
+    typhoon_stub = server
+    typhoon.base_url = server.base_url
+    typhoon.set_api_key("stub")
+
+def _require(provider: str) -> None:
+    if provider not in _ready:
+        init((provider,))
 
-# ---------- Keys ----------
-TYPHOON_KEY = os.getenv("TYPHOON_API_KEY")
-GEMINI_KEY  = os.getenv("GEMINI_API_KEY")
-if not TYPHOON_KEY or not GEMINI_KEY:
-    raise RuntimeError("❌ Please set TYPHOON_API_KEY and GEMINI_API_KEY environment variables.")
+def _gemini():
+    """The Gemini provider, configured on first use."""
+    _require("gemini")
+    return gemini
+
+def _not_found(error: BaseException) -> bool:
+    from google.api_core.exceptions import NotFound
+    return isinstance(error, NotFound)
 
 # ---------- Typhoon ASR ----------
-TYPHOON_BASE   = "https://api.opentyphoon.ai/v1"
+TYPHOON_BASE   = os.getenv("TYPHOON_BASE_URL", "https://api.opentyphoon.ai/v1")
 TYPHOON_ASR_MD = "typhoon-asr-large-v1"
-HEADERS        = { "Authorization": f"Bearer {TYPHOON_KEY}" }
+AUDIO_FILENAMES = { "audio/wav": "audio.wav", "audio/flac": "audio.flac", "audio/ogg": "audio.ogg" }
+GEMINI_ASR_PROMPT = "Please transcribe this audio accurately. Only provide the transcription text, nothing else."
 
-def transcribe(audio_bytes: bytes, language_code: str = "auto") -> str:
-    """Send raw WAV/MP3 bytes to Typhoon ASR → return transcript."""
+class LatencyWindow:
+    """Rolling window of recent latencies (seconds) with cheap percentiles."""
+
+    def __init__(self, size: int = 500):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        p50, p95 = self.percentile(0.50), self.percentile(0.95)
+        return {
+            "count": self.count,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+class TyphoonClient:
+    """Pooled, keep-alive client for Typhoon ASR (sync + async).
+
+    One requests.Session (sync) and one httpx.AsyncClient (async) are reused
+    for every utterance, so TCP+TLS handshakes are only paid when the pool
+    has no idle connection. 429/5xx responses and connect errors are retried
+    with full-jitter exponential backoff (Retry-After is honoured). Both
+    clients (and their libraries) are created on first use.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url: str = TYPHOON_BASE, api_key: str | None = None,
+                 model: str = TYPHOON_ASR_MD, pool_size: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.headers = { "Authorization": f"Bearer {api_key}" } if api_key else {}
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._session = None
+        self._adapter = None
+        self._async = None
+
+        self._lock = threading.Lock()
+        self._async_connections = 0
+        self.requests = 0      # logical transcribe() calls
+        self.attempts = 0      # HTTP requests sent, including retries
+        self.retries = 0
+        self.failures = 0
+        self.latency = LatencyWindow()          # end-to-end, including retries
+        self.fresh_latency = LatencyWindow()    # attempts that opened a new connection
+        self.reused_latency = LatencyWindow()   # attempts served on a pooled connection
+
+    # ----- helpers -----
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/audio/transcriptions"
+
+    def set_api_key(self, api_key: str) -> None:
+        """Before the first request (clients copy the headers when they are created)."""
+        self.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    session.headers.update(self.headers)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._adapter, self._session = adapter, session
+        return self._session
+
+    def _sync_connections(self) -> int:
+        if self._adapter is None:
+            return 0
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+    def _backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _pause(self, attempt: int, deadline: float | None, retry_after: str | None = None) -> float | None:
+        """Backoff before the next retry, or None when it wouldn't start before `deadline`."""
+        pause = self._backoff(attempt, retry_after)
+        if deadline is not None and time.perf_counter() + pause >= deadline:
+            return None
+        return pause
+
+    def _read_timeout(self, deadline: float | None) -> float:
+        if deadline is None:
+            return self.read_timeout
+        return max(0.01, min(self.read_timeout, deadline - time.perf_counter()))
+
+    def _record(self, seconds: float, new_connection: bool) -> None:
+        with self._lock:
+            self.attempts += 1
+            (self.fresh_latency if new_connection else self.reused_latency).add(seconds)
+
+    def _count(self, **deltas: int) -> None:
+        """Bump counters under the lock: the pooled sync client is shared by many threads."""
+        with self._lock:
+            for name, n in deltas.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def _succeeded(self, start: float) -> None:
+        with self._lock:
+            self.latency.add(time.perf_counter() - start)
+
+    def _payload(self, audio_bytes: bytes, language_code: str, filename: str | None, mime_type: str):
+        filename = filename or AUDIO_FILENAMES.get(mime_type, "audio.wav")
+        files = { "file": (filename, audio_bytes, mime_type) }
+        data  = { "model": self.model, "language_code": language_code }
+        return files, data
+
+    # ----- sync -----
+    def transcribe(self, audio_bytes: bytes, language_code: str = "auto",
+                   filename: str | None = None, mime_type: str = "audio/wav",
+                   timeout: float | None = None) -> str:
+        """`timeout` bounds the whole call, retries included (read_timeout bounds each attempt)."""
+        import requests
+        session = self._get_session()
+        files, data = self._payload(audio_bytes, language_code, filename, mime_type)
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        self._count(requests=1)
+        for attempt in range(self.max_retries + 1):
+            before = self._sync_connections()
+            t0 = time.perf_counter()
+            try:
+                resp = session.post(self.url, data=data, files=files,
+                                          timeout=(self.connect_timeout, self._read_timeout(deadline)))
+            except requests.ConnectionError:   # includes connect timeouts
+                self._record(time.perf_counter() - t0, True)
+                pause = None if attempt == self.max_retries else self._pause(attempt, deadline)
+                if pause is None:
+                    self._count(failures=1)
+                    raise
+                self._count(retries=1)
+                time.sleep(pause)
+                continue
+            self._record(time.perf_counter() - t0, self._sync_connections() > before)
+            if resp.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                pause = self._pause(attempt, deadline, resp.headers.get("Retry-After"))
+                if pause is not None:
+                    self._count(retries=1)
+                    time.sleep(pause)
+                    continue
+            try:
+                resp.raise_for_status()
+            except requests.HTTPError:
+                self._count(failures=1)
+                raise
+            self._succeeded(start)
+            return resp.json()["text"].strip()
+
+    # ----- async -----
+    def _get_async(self):
+        if self._async is None or self._async.is_closed:
+            import httpx
+            self._async = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+            )
+        return self._async
+
+    async def atranscribe(self, audio_bytes: bytes, language_code: str = "auto",
+                          filename: str | None = None, mime_type: str = "audio/wav",
+                          timeout: float | None = None) -> str:
+        import httpx
+        files, data = self._payload(audio_bytes, language_code, filename, mime_type)
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        self._count(requests=1)
+        for attempt in range(self.max_retries + 1):
+            opened = []
+
+            async def trace(event_name, info):
+                if event_name == "connection.connect_tcp.complete":
+                    opened.append(event_name)
+
+            t0 = time.perf_counter()
+            try:
+                resp = await self._get_async().post(
+                    self.url, data=data, files=files, extensions={"trace": trace},
+                    timeout=httpx.Timeout(self._read_timeout(deadline), connect=self.connect_timeout))
+            except (httpx.ConnectError, httpx.ConnectTimeout):   # as requests.ConnectionError in transcribe()
+                self._record(time.perf_counter() - t0, True)
+                pause = None if attempt == self.max_retries else self._pause(attempt, deadline)
+                if pause is None:
+                    self._count(failures=1)
+                    raise
+                self._count(retries=1)
+                await asyncio.sleep(pause)
+                continue
+            self._count(_async_connections=len(opened))
+            self._record(time.perf_counter() - t0, bool(opened))
+            if resp.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                pause = self._pause(attempt, deadline, resp.headers.get("Retry-After"))
+                if pause is not None:
+                    self._count(retries=1)
+                    await asyncio.sleep(pause)
+                    continue
+            try:
+                resp.raise_for_status()
+            except httpx.HTTPStatusError:
+                self._count(failures=1)
+                raise
+            self._succeeded(start)
+            return resp.json()["text"].strip()
+
+    # ----- lifecycle / metrics -----
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+
+    async def aclose(self) -> None:
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+
+    def metrics(self) -> dict:
+        """Request/connection counters plus latency split by fresh vs reused connection."""
+        connections = self._sync_connections() + self._async_connections
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "connections_opened": connections,
+            "handshakes_saved": max(0, self.attempts - connections),
+            "latency": self.latency.summary(),
+            "fresh_connection_latency": self.fresh_latency.summary(),
+            "reused_connection_latency": self.reused_latency.summary(),
+        }
+
+typhoon = TyphoonClient(
+    pool_size=int(os.getenv("TYPHOON_POOL_SIZE", "10")),
+    connect_timeout=float(os.getenv("TYPHOON_CONNECT_TIMEOUT", "5")),
+    read_timeout=float(os.getenv("TYPHOON_READ_TIMEOUT", "60")),
+    max_retries=int(os.getenv("TYPHOON_MAX_RETRIES", "2")),
+)
+
+# Every Typhoon/Gemini call waits for a slot from its provider/model governor
+governors = GovernorRegistry(per_worker(parse_limits(os.getenv("RATE_LIMITS", "")), worker_count()),
+                             defaults={"typhoon": Limits(concurrency=typhoon.pool_size),
+                                       "gemini": Limits(concurrency=16)})
+
+def _gemini_governor(model_name: str):
+    return governors.get("gemini", model_name)
+
+# An open breaker fails calls at once instead of waiting out timeouts (circuit_breaker.py)
+typhoon_breaker = breaker_from_env("Typhoon")
+gemini_breakers: dict = {}
+_breakers_lock = threading.Lock()
+
+def _gemini_breaker(model_name: str):
+    with _breakers_lock:
+        if model_name not in gemini_breakers:
+            gemini_breakers[model_name] = breaker_from_env(f"Gemini {model_name}")
+        return gemini_breakers[model_name]
+
+def _outcome(error: BaseException | None) -> str:
+    if error is None:
+        return "ok"
+    if isinstance(error, CircuitOpenError):
+        return "rejected"
+    return "error" if isinstance(error, Exception) else "cancelled"  # e.g. lost a hedge race
+
+@contextmanager
+def _asr_timer(backend: str):
+    """asr_backend_seconds{backend,outcome} + an `asr.<backend>` stage in the current trace."""
+    start, error = time.perf_counter(), None
     try:
-        # Try Typhoon ASR first
-        files = { "file": ("audio.wav", audio_bytes, "audio/wav") }
-        data  = { "model": TYPHOON_ASR_MD, "language_code": language_code }
-        resp  = requests.post(f"{TYPHOON_BASE}/audio/transcriptions",
-                              headers=HEADERS, data=data, files=files, timeout=90)
-        resp.raise_for_status()
-        return resp.json()["text"].strip()
-    except Exception as e:
-        # Fallback to Gemini for transcription
-        print(f"Typhoon ASR failed: {e}")
-        print("Falling back to Gemini for transcription...")
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        ASR_SECONDS.observe(seconds, backend=backend, outcome=_outcome(error))
+        observe_stage(f"asr.{backend}", seconds)
+
+def _typhoon_transcribe(audio_bytes: bytes, language_code: str = "auto", mime_type: str = "audio/wav",
+                        timeout: float | None = None) -> str:
+    _require("typhoon")
+    with _asr_timer("Typhoon"), governors.get("typhoon", typhoon.model).slot():
+        return typhoon.transcribe(audio_bytes, language_code, mime_type=mime_type, timeout=timeout)
+
+async def _atyphoon_transcribe(audio_bytes: bytes, language_code: str = "auto", mime_type: str = "audio/wav",
+                               timeout: float | None = None) -> str:
+    _require("typhoon")
+    with _asr_timer("Typhoon"):
+        async with governors.get("typhoon", typhoon.model).aslot():
+            return await typhoon.atranscribe(audio_bytes, language_code, mime_type=mime_type, timeout=timeout)
+
+# Gemini accepts inline audio up to ~20 MB per request; bigger clips go via the File API
+GEMINI_INLINE_AUDIO_BYTES = int(os.getenv("GEMINI_INLINE_AUDIO_BYTES", str(15 * 1024 * 1024)))
+
+def _gemini_audio_part(audio_bytes: bytes, mime_type: str = "audio/wav"):
+    """Return (content part, uploaded file or None). Small clips are sent inline as bytes."""
+    if len(audio_bytes) <= GEMINI_INLINE_AUDIO_BYTES:
+        return {"mime_type": mime_type, "data": audio_bytes}, None
+    uploaded = _gemini().upload_file(audio_bytes, mime_type)
+    return uploaded, uploaded
+
+def _delete_uploaded(uploaded) -> None:
+    try:
+        _gemini().delete_file(uploaded.name)
+    except Exception as e:  # uploads expire server-side anyway (48 h)
+        print(f"Could not delete Gemini upload {uploaded.name}: {e}")
+
+def _gemini_transcribe(audio_bytes: bytes, language_code: str = "auto", mime_type: str = "audio/wav") -> str:
+    """Transcribe with Gemini (hedge/fallback backend). No temp files are written."""
+    with _asr_timer("Gemini"):
+        part, uploaded = _gemini_audio_part(audio_bytes, mime_type)
         try:
-            import google.generativeai as genai
-            from pathlib import Path
-            import tempfile
-            
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
-            
-            # Upload to Gemini
-            audio_file = genai.upload_file(path=tmp_path)
-            
-            # Transcribe using Gemini
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            prompt = "Please transcribe this audio accurately. Only provide the transcription text, nothing else."
-            response = model.generate_content([prompt, audio_file])
-            
-            # Cleanup
-            Path(tmp_path).unlink()
-            
+            model = models.get("gemini-2.5-flash")
+            with _gemini_governor("gemini-2.5-flash").slot():
+                response = model.generate_content([GEMINI_ASR_PROMPT, part])
             return response.text.strip()
-        except Exception as gemini_error:
-            error_msg = f"Both Typhoon ASR and Gemini transcription failed.\nTyphoon: {e}\nGemini: {gemini_error}"
-            print(error_msg)
-            raise RuntimeError(error_msg)
+        finally:
+            if uploaded is not None:
+                _delete_uploaded(uploaded)
+
+async def _agemini_transcribe(audio_bytes: bytes, language_code: str = "auto", mime_type: str = "audio/wav") -> str:
+    # upload/delete have no async variant in the SDK -> run them off-loop
+    with _asr_timer("Gemini"):
+        part, uploaded = await asyncio.to_thread(_gemini_audio_part, audio_bytes, mime_type)
+        try:
+            model = models.get("gemini-2.5-flash")
+            async with _gemini_governor("gemini-2.5-flash").aslot():
+                response = await model.generate_content_async([GEMINI_ASR_PROMPT, part])
+            return response.text.strip()
+        finally:
+            if uploaded is not None:
+                await asyncio.to_thread(_delete_uploaded, uploaded)
+
+# Typhoon first; Gemini is launched as a hedge once Typhoon exceeds its p95.
+# A Typhoon call that loses the race can't be stopped, so ASR_ATTEMPT_TIMEOUT caps it (retries included)
+asr_router = HedgedASRRouter(
+    [ASRBackend("Typhoon", _typhoon_transcribe, _atyphoon_transcribe, breaker=typhoon_breaker,
+                attempt_timeout=float(os.getenv("ASR_ATTEMPT_TIMEOUT", "30")) or None),
+     ASRBackend("Gemini", _gemini_transcribe, _agemini_transcribe, breaker=_gemini_breaker("gemini-2.5-flash"))],
+    hedge_delay=float(os.environ["ASR_HEDGE_DELAY"]) if os.getenv("ASR_HEDGE_DELAY") else None,
+    default_delay=float(os.getenv("ASR_HEDGE_DEFAULT_DELAY", "3")),
+    hedge=os.getenv("ASR_HEDGE", "1") != "0",
+)
+
+def prepare_audio(audio_bytes: bytes) -> PreparedAudio:
+    """16 kHz mono, silence-trimmed upload (raw bytes when AUDIO_PREPROCESS=0 or undecodable)."""
+    if not audio_preprocess.ENABLED:
+        return PreparedAudio(audio_bytes, "audio/wav", None, 0, len(audio_bytes))
+    return audio_preprocess.preprocess(audio_bytes)
+
+# Same speech (after normalisation) + language + ASR models -> same transcript
+transcripts = make_transcript_cache()
+ASR_CACHE_MODEL = f"{typhoon.model}|gemini-2.5-flash"
+
+def _prepare_cached(audio_bytes: bytes, language_code: str) -> tuple[PreparedAudio | None, list, str | None]:
+    """Look up the transcript cache → (prepared audio or None on hit, cache keys, cached text).
+
+    Byte-identical re-uploads hit on the raw-bytes key without decoding; otherwise the
+    audio is preprocessed and looked up by its normalised PCM.
+    """
+    keys = [audio_key(audio_bytes, language_code, ASR_CACHE_MODEL)]
+    text = transcripts.get(keys[0], final=False)
+    if text is not None:
+        return None, keys, text
+    audio = prepare_audio(audio_bytes)
+    if audio.pcm is None:
+        transcripts.get(keys[0])  # undecodable: the raw bytes are the only key; count the miss
+    else:
+        keys.append(audio_key(audio.pcm, language_code, ASR_CACHE_MODEL))
+        text = transcripts.get(keys[1])
+        if text is not None:
+            transcripts.put(keys[0], text)
+    return audio, keys, text
+
+def _remember(keys: list, text: str) -> None:
+    for key in keys:
+        transcripts.put(key, text)
+
+# Long answers are split at pauses and the segments transcribed in parallel
+ASR_CHUNK_MIN_SECONDS = float(os.getenv("ASR_CHUNK_MIN_SECONDS", "30"))
+ASR_CHUNK_SECONDS     = float(os.getenv("ASR_CHUNK_SECONDS", "20"))
+ASR_CHUNK_OVERLAP     = float(os.getenv("ASR_CHUNK_OVERLAP", "1.0"))
+ASR_CHUNK_WORKERS     = int(os.getenv("ASR_CHUNK_WORKERS", "8"))  # <= TYPHOON_POOL_SIZE
+
+def _chunked(audio: PreparedAudio) -> bool:
+    return audio.pcm is not None and ASR_CHUNK_MIN_SECONDS > 0 and audio.duration_s > ASR_CHUNK_MIN_SECONDS
+
+def _chunk_options() -> dict:
+    return {"max_workers": ASR_CHUNK_WORKERS, "fmt": audio_preprocess.ENCODE,
+            "chunk_s": ASR_CHUNK_SECONDS, "overlap_s": ASR_CHUNK_OVERLAP}
+
+def transcribe(audio_bytes: bytes, language_code: str = "auto") -> str:
+    """Send raw WAV/MP3 bytes to ASR (Typhoon, hedged with Gemini) → return transcript."""
+    with stage("asr.prepare"):
+        audio, keys, text = _prepare_cached(audio_bytes, language_code)
+    if text is None:
+        with stage("asr.route"):
+            if _chunked(audio):
+                text = transcribe_chunked(audio.pcm, audio.sample_rate, asr_router.transcribe,
+                                          language_code, **_chunk_options())
+            else:
+                text = asr_router.transcribe(audio.data, language_code, mime_type=audio.mime_type)
+        _remember(keys, text)
+    return text
+
+async def aclose() -> None:
+    """Close the pooled async HTTP client and delete coach context caches (call on app shutdown)."""
+    openings.close()
+    await typhoon.aclose()
+    await asyncio.to_thread(context_caches.close)
+
+async def atranscribe(audio_bytes: bytes, language_code: str = "auto") -> str:
+    """Async transcribe(): awaits ASR without blocking the event loop."""
+    # NumPy work + cache lookup (possibly SQLite) off-loop
+    with stage("asr.prepare"):
+        audio, keys, text = await asyncio.to_thread(_prepare_cached, audio_bytes, language_code)
+    if text is None:
+        with stage("asr.route"):
+            if _chunked(audio):
+                text = await atranscribe_chunked(audio.pcm, audio.sample_rate, asr_router.atranscribe,
+                                                 language_code, **_chunk_options())
+            else:
+                text = await asr_router.atranscribe(audio.data, language_code, mime_type=audio.mime_type)
+        await asyncio.to_thread(_remember, keys, text)
+    return text
+
+def live_transcriber(sample_rate: int = 16000, language_code: str = "auto", on_partial=None) -> StreamingTranscriber:
+    """Streaming ASR for one live utterance: feed PCM frames, segments go to ASR as they end."""
+    return StreamingTranscriber(asr_router.atranscribe, sample_rate, language_code, on_partial,
+                                fmt=audio_preprocess.ENCODE)
+
+def asr_metrics() -> dict:
+    """Router ranking/hedges, Typhoon pool stats and transcript cache hit rate."""
+    return {"router": asr_router.stats(), "typhoon": typhoon.metrics(), "cache": transcripts.stats()}
+
+def health() -> dict:
+    """Circuit state per backend. "down" = every ASR backend is open; "degraded" = any breaker not closed."""
+    asr = {b.name: b.breaker.snapshot() for b in asr_router.backends}
+    gemini = {name: breaker.snapshot() for name, breaker in list(gemini_breakers.items())}
+    states = [c["state"] for c in [*asr.values(), *gemini.values()]]
+    if all(c["state"] == "open" for c in asr.values()):
+        status = "down"
+    elif any(state != "closed" for state in states):
+        status = "degraded"
+    else:
+        status = "ok"
+    return {"status": status, "asr": asr, "gemini": gemini, "stubs": sorted(STUBS)}
+
+def limit_metrics() -> dict:
+    """Per provider/model: limits, in-flight calls, queue depth and queue wait times."""
+    return governors.metrics()
 
 # ---------- Gemini ----------
-configure(api_key=GEMINI_KEY)
-
-def _gemini_chat(system_prompt: str, user_prompt: str,
-                 model_name: str = "gemini-2.5-flash") -> str:
-    model = GenerativeModel(model_name,
-                            system_instruction=system_prompt)
-    resp  = model.generate_content(user_prompt)
-    return resp.text.strip()
-
-def coach_feedback(text: str, conversation_history: list = None, scenario: dict = None) -> str:
-    """Coach corrects errors and continues the conversation naturally."""
-    
-    # Default free conversation
-    if not scenario:
-        sys = """You are a friendly English conversation partner helping someone practice English.
+TURN_JUDGE_MODEL = os.getenv("TURN_JUDGE_MODEL", "gemini-2.5-flash")
+
+def _freeze(value):
+    """Hashable view of a (possibly nested) generation config."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class ModelRegistry:
+    """Bounded LRU of GenerativeModel handles.
+
+    Keyed by (model_name, system_prompt, generation_config) so the fixed
+    coach/scenario/judge prompts reuse one handle instead of building a new
+    GenerativeModel on every call.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, system_prompt: str | None = None,
+            generation_config: dict | None = None):
+        key = (model_name, system_prompt, _freeze(generation_config))
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+            self.misses += 1
+            model = _gemini().model(model_name, system_prompt, generation_config)
+            self._models[key] = model
+            if len(self._models) > self.maxsize:
+                self._models.popitem(last=False)
+                self.evictions += 1
+            return model
+
+    def warm(self, system_prompts, model_name: str = "gemini-2.5-flash",
+             generation_config: dict | None = None) -> int:
+        """Pre-build handles for the given prompts; returns how many were new."""
+        before = self.misses
+        for prompt in system_prompts:
+            self.get(model_name, prompt, generation_config)
+        return self.misses - before
+
+    def clear(self) -> None:
+        """Drop every handle (after switching providers)."""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._models),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+models = ModelRegistry(maxsize=int(os.getenv("GEMINI_MODEL_CACHE_SIZE", "64")))
+
+class _LLMCall:
+    """Filled in by the caller inside _llm_timer(): the response's usage metadata and text."""
+    usage = None
+    text = ""
+
+@contextmanager
+def _llm_timer(kind: str, model_name: str, system_prompt: str | None, user_prompt: str):
+    """llm_seconds{kind,model,outcome}, prompt/response token sizes and an `llm.<kind>` stage.
+
+    Token counts come from the response's usage metadata; the ~4 chars/token estimate
+    is used when the SDK doesn't report them (e.g. streamed replies).
+    """
+    call, start, error = _LLMCall(), time.perf_counter(), None
+    try:
+        yield call
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        LLM_SECONDS.observe(seconds, kind=kind, model=model_name, outcome=_outcome(error))
+        observe_stage(f"llm.{kind}", seconds)
+        if error is None:
+            usage = call.usage
+            LLM_PROMPT_TOKENS.observe(getattr(usage, "prompt_token_count", 0)
+                                      or estimate_tokens(f"{system_prompt or ''}{_prompt_text(user_prompt)}"), kind=kind)
+            LLM_RESPONSE_TOKENS.observe(getattr(usage, "candidates_token_count", 0)
+                                        or estimate_tokens(call.text), kind=kind)
+            if usage is not None:
+                LLM_CACHED_TOKENS.observe(getattr(usage, "cached_content_token_count", 0) or 0, kind=kind)
+
+def _prompt_text(user_prompt) -> str:
+    """A prompt string, or multi-turn contents ([{"role", "parts"}]) flattened for size estimates."""
+    if isinstance(user_prompt, str):
+        return user_prompt
+    return "".join(part for content in user_prompt for part in content["parts"])
+
+def _finish_call(call: _LLMCall, resp) -> str:
+    call.usage = getattr(resp, "usage_metadata", None)
+    call.text = resp.text.strip()
+    return call.text
+
+def _gemini_chat(system_prompt: str, user_prompt,
+                 model_name: str = "gemini-2.5-flash",
+                 generation_config: dict = None, kind: str = "chat", model=None) -> str:
+    """`user_prompt` is a string or multi-turn contents; `model` overrides the registry (cached content)."""
+    model = model or models.get(model_name, system_prompt, generation_config)
+    with _llm_timer(kind, model_name, system_prompt, user_prompt) as call:
+        with _gemini_breaker(model_name).guard(), _gemini_governor(model_name).slot():
+            resp = model.generate_content(user_prompt)
+        return _finish_call(call, resp)
+
+async def _agemini_chat(system_prompt: str, user_prompt,
+                        model_name: str = "gemini-2.5-flash",
+                        generation_config: dict = None, kind: str = "chat", model=None) -> str:
+    model = model or models.get(model_name, system_prompt, generation_config)
+    with _llm_timer(kind, model_name, system_prompt, user_prompt) as call:
+        with _gemini_breaker(model_name).guard():
+            async with _gemini_governor(model_name).aslot():
+                resp = await model.generate_content_async(user_prompt)
+        return _finish_call(call, resp)
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text
+    except ValueError:  # chunk without text parts (e.g. final finish_reason chunk)
+        return ""
+
+def _gemini_stream(system_prompt: str, user_prompt,
+                   model_name: str = "gemini-2.5-flash", kind: str = "chat", model=None):
+    model = model or models.get(model_name, system_prompt)
+    with _llm_timer(kind, model_name, system_prompt, user_prompt) as call:
+        with _gemini_breaker(model_name).guard(), _gemini_governor(model_name).slot():  # held until the stream ends
+            for chunk in model.generate_content(user_prompt, stream=True):
+                text = _chunk_text(chunk)
+                call.text += text
+                yield text
+
+async def _agemini_stream(system_prompt: str, user_prompt,
+                          model_name: str = "gemini-2.5-flash", kind: str = "chat", model=None):
+    model = model or models.get(model_name, system_prompt)
+    with _llm_timer(kind, model_name, system_prompt, user_prompt) as call:
+        with _gemini_breaker(model_name).guard():
+            async with _gemini_governor(model_name).aslot():  # held until the stream ends
+                resp = await model.generate_content_async(user_prompt, stream=True)
+                async for chunk in resp:
+                    text = _chunk_text(chunk)
+                    call.text += text
+                    yield text
+
+# ---------- Coach context caching (context_cache.py) ----------
+COACH_MODEL = "gemini-2.5-flash"
+
+@dataclass
+class CoachCache:
+    """A session's Gemini cached content and the model handle bound to it."""
+    content: object
+    model: object       # GenerativeModel bound to `content`
+
+def _turn_contents(turns) -> list:
+    contents = []
+    for user, coach in turns:
+        contents += [{"role": "user", "parts": [user]}, {"role": "model", "parts": [coach]}]
+    return contents
+
+def _create_coach_cache(system_prompt: str, turns: list, ttl_s: float) -> CoachCache:
+    provider = _gemini()
+    with priority(BATCH), _gemini_governor(COACH_MODEL).slot():  # background: behind live calls
+        content = provider.create_cache(COACH_MODEL, system_prompt, _turn_contents(turns), ttl_s)
+    return CoachCache(content, provider.cached_model(content))
+
+context_caches = context_cache.manager_from_env(
+    _create_coach_cache,
+    delete_fn=lambda cache: cache.content.delete(),
+    touch_fn=lambda cache, ttl_s: _gemini().touch_cache(cache.content, ttl_s),
+)
+
+def _coach_request(text: str, conversation_history=None, scenario: dict = None,
+                   session_id: str = None) -> tuple[dict, context_cache.CachedPrefix | None]:
+    """Arguments for the coach's Gemini call, and the cached prefix they rely on.
+
+    With a session id (and caching on) the transcript is sent as user/model contents,
+    minus the prefix already in the session's cached content. That happens only once a
+    cache exists, or while the transcript is still below CONTEXT_CACHE_MIN_TOKENS.
+    Otherwise (no cache yet, or past CONTEXT_CACHE_MAX_TOKENS) the rolling-summary
+    prompt is used, so uncached prompts stay bounded.
+    """
+    system_prompt = coach_system_prompt(scenario)
+    if session_id and context_cache.ENABLED and conversation_history:
+        turns = _as_context(conversation_history).transcript()
+        prefix = context_caches.lookup(session_id, system_prompt, turns) if turns else None
+        if prefix is not None and prefix.handle is None and (
+                estimate_tokens(system_prompt) + context_cache.turns_tokens(turns) >= context_caches.min_tokens):
+            prefix = None   # long enough to cache, but not cached (yet): don't send it all verbatim
+        if prefix is not None:
+            contents = _turn_contents(turns[prefix.turns:]) + [{"role": "user", "parts": [text]}]
+            return ({"system_prompt": system_prompt, "user_prompt": contents, "model_name": COACH_MODEL,
+                     "model": prefix.handle.model if prefix.handle is not None else None, "kind": "coach"}, prefix)
+    return ({"system_prompt": system_prompt, "user_prompt": _coach_user_prompt(text, conversation_history, scenario),
+             "model_name": COACH_MODEL, "kind": "coach"}, None)
+
+def _stale_cache(prefix, error: Exception, session_id: str) -> bool:
+    """The cached content expired/was deleted server-side: forget it so the retry goes without it."""
+    if prefix is None or prefix.handle is None or not _not_found(error):
+        return False
+    context_caches.invalidate(session_id, prefix.handle)
+    return True
+
+def release_context_cache(session_id: str) -> None:
+    """Conversation over: delete its coach context cache now rather than at TTL expiry."""
+    context_caches.release(session_id)
+
+def context_cache_metrics() -> dict:
+    return context_caches.stats()
+
+def warm_model_registry() -> int:
+    """Build model handles for every fixed prompt (call once at startup)."""
+    prompts = [FREE_COACH_PROMPT, FREE_OPENING_PROMPT, None]
+    for scenario in SCENARIOS.values():
+        prompts += [coach_system_prompt(scenario), opening_system_prompt(scenario)]
+    return (models.warm(dict.fromkeys(prompts))
+            + models.warm([TURN_JUDGE_PROMPT], model_name=TURN_JUDGE_MODEL)
+            + models.warm([JUDGE_PROMPT, FINAL_EVAL_PROMPT, AGGREGATE_EVAL_PROMPT],
+                          generation_config=JSON_GENERATION_CONFIG))
+
+# ---------- Prompts ----------
+FREE_COACH_PROMPT = """You are a friendly English conversation partner helping someone practice English.
 When the user speaks:
 1. Acknowledge what they said
 2. Gently correct any grammar or vocabulary errors in a natural way (briefly, don't over-correct)
 3. Continue the conversation by asking a follow-up question or adding to the topic
 Keep your response conversational, natural and encouraging. Remember the conversation context."""
-    else:
-        # Scenario-based conversation
-        sys = f"""You are role-playing as: {scenario['role']}
+
+FREE_OPENING_PROMPT = """You are a friendly English conversation partner helping someone practice English.
+Start a natural, friendly conversation. Introduce yourself and ask an engaging question to get the conversation going."""
+
+JUDGE_PROMPT = """You are an IELTS Speaking examiner. Evaluate the speaker's performance based on these criteria:
+1. Pronunciation (0-9): clarity, accent, intonation (inferred from the transcript)
+2. Vocabulary (0-9): range, accuracy, appropriateness
+3. Grammar (0-9): accuracy, range, complexity
+4. Fluency & Coherence (0-9): smoothness, hesitation, logical flow
+
+Measured features (word counts, lexical diversity, fillers, sentence lengths, vocabulary
+band coverage) are computed for you; use them as evidence instead of recounting.
+
+Give a score and a brief justification for each criterion, the overall band, strengths,
+weaknesses and example sentences from the speech. Be objective and based only on what was actually said.
+Answer in the JSON format you are given."""
+
+FINAL_EVAL_PROMPT = """You are an IELTS Speaking examiner. Provide a COMPREHENSIVE evaluation based on the ENTIRE conversation.
+
+Evaluate these criteria (0-9 scale):
+1. Pronunciation (0-9): inferred from the transcript and natural language flow
+2. Vocabulary (0-9): Range, accuracy, appropriateness across the entire conversation
+3. Grammar (0-9): Accuracy, range, complexity throughout all responses
+4. Fluency & Coherence (0-9): Overall smoothness, logical progression, ability to sustain conversation
+
+Measured features (MTLD/TTR lexical diversity, fillers, sentence lengths, K1/K2/AWL vocabulary
+coverage) are computed for you; use them as evidence instead of recounting.
+
+Answer in the JSON format you are given:
+- a score and detailed justification for each criterion
+- overall_band: average of the 4 criteria, rounded to the nearest half band
+- specific strengths and weaknesses (areas for improvement)
+- examples: sentences the learner actually said that show strong or weak points"""
+
+TURN_JUDGE_PROMPT = """You are an IELTS Speaking examiner assessing ONE turn of an ongoing conversation.
+Give provisional scores (0-9) for Pronunciation (inferred from the transcript), Vocabulary,
+Grammar and Fluency & Coherence, each with a few words of justification. Quote at most
+two short phrases from the turn that show a strength or an error. Keep it under 120 words."""
+
+AGGREGATE_EVAL_PROMPT = FINAL_EVAL_PROMPT + """
+
+You are given per-turn provisional assessments made during the conversation, plus simple
+measured features for each turn and for the whole conversation. Weigh the turns together (later, longer turns count more
+than one-word replies), reconcile inconsistent provisional scores, and write the final
+evaluation. Do not re-evaluate from scratch."""
+
+def coach_system_prompt(scenario: dict = None) -> str:
+    """System instruction for the coach (free talk or scenario role-play)."""
+    if not scenario:
+        return FREE_COACH_PROMPT
+    return f"""You are role-playing as: {scenario['role']}
 Scenario: {scenario['description']}
 Goal: {scenario['goal']}
 
@@ -106,57 +929,165 @@ Your responsibilities:
 4. When the goal is achieved, naturally conclude the conversation
 
 IMPORTANT: When you think the conversation goal has been completed, end your response with the marker: [CONVERSATION_COMPLETE]"""
-    
-    # Build conversation context
-    if conversation_history:
-        context = "Previous conversation:\n"
-        for entry in conversation_history:
-            context += f"User: {entry['user']}\nYou: {entry['coach']}\n\n"
-        usr = f"{context}User now says:\n'''\n{text}\n'''\n\nPlease respond as their conversation partner."
-    else:
-        if scenario:
-            usr = f"The learner said:\n'''\n{text}\n'''\n\nThis is the first message. Start the {scenario['title']} scenario naturally."
-        else:
-            usr = f"The learner said:\n'''\n{text}\n'''\n\nPlease respond as their conversation partner and start a natural conversation."
-    
-    return _gemini_chat(sys, usr)
 
-def judge_feedback(text: str) -> str:
-    """Judge evaluates the ORIGINAL user speech based on IELTS criteria."""
-    sys = """You are an IELTS Speaking examiner. Evaluate the speaker's performance based on these criteria:
-1. Pronunciation (0-9): clarity, accent, intonation (analyze based on transcript patterns, word choices, and complexity)
-2. Vocabulary (0-9): range, accuracy, appropriateness
-3. Grammar (0-9): accuracy, range, complexity
-4. Fluency & Coherence (0-9): smoothness, hesitation, logical flow
+def opening_system_prompt(scenario: dict = None) -> str:
+    """System instruction used when the coach speaks first."""
+    if not scenario:
+        return FREE_OPENING_PROMPT
+    return f"""You are role-playing as: {scenario['role']}
+Scenario: {scenario['description']}
+Goal: {scenario['goal']}
+
+Start the {scenario['title']} scenario naturally. Greet the customer/guest/candidate and begin the interaction according to your role."""
 
-Provide scores and brief justification for each criterion. Be objective and based only on what was actually said."""
-    usr = f"Original speech transcript:\n'''\n{text}\n'''\n\nPlease provide IELTS-style evaluation with scores (0-9) for each criterion."
-    return _gemini_chat(sys, usr)
+def _as_context(conversation_history) -> ConversationContext:
+    """Accept either a ConversationContext or the legacy list of turn dicts."""
+    if isinstance(conversation_history, ConversationContext):
+        return conversation_history
+    return ConversationContext.from_history(conversation_history)
 
-def judge_final_evaluation(conversation_history: list) -> str:
-    """Judge provides FINAL comprehensive IELTS evaluation after full conversation."""
-    sys = """You are an IELTS Speaking examiner. Provide a COMPREHENSIVE evaluation based on the ENTIRE conversation.
+def _coach_user_prompt(text: str, conversation_history=None, scenario: dict = None) -> str:
+    # Recent turns verbatim, older turns as a rolling summary
+    if conversation_history:
+        context = _as_context(conversation_history).render()
+        return f"{context}User now says:\n'''\n{text}\n'''\n\nPlease respond as their conversation partner."
+    if scenario:
+        return f"The learner said:\n'''\n{text}\n'''\n\nThis is the first message. Start the {scenario['title']} scenario naturally."
+    return f"The learner said:\n'''\n{text}\n'''\n\nPlease respond as their conversation partner and start a natural conversation."
 
-Evaluate these criteria (0-9 scale):
-1. Pronunciation (0-9): Based on transcript patterns, complexity of words used, and natural language flow
-2. Vocabulary (0-9): Range, accuracy, appropriateness across the entire conversation
-3. Grammar (0-9): Accuracy, range, complexity throughout all responses
-4. Fluency & Coherence (0-9): Overall smoothness, logical progression, ability to sustain conversation
+def _judge_user_prompt(text: str) -> str:
+    return (f"Original speech transcript:\n'''\n{text}\n'''\nMeasured: {render(analyze([text]))}\n\n"
+            "Please provide IELTS-style evaluation with scores (0-9) for each criterion.")
 
-Provide:
-- Individual scores for each criterion
-- Detailed justification for each score
-- Overall band score (average of 4 criteria)
-- Specific strengths and areas for improvement
-- Example sentences that demonstrate strong/weak points"""
+def _user_turns(conversation_history) -> list:
+    if isinstance(conversation_history, ConversationContext):
+        return conversation_history.user_turns
+    return [entry['user'] for entry in conversation_history]
 
+def _final_eval_user_prompt(conversation_history) -> str:
     # Build full conversation transcript
+    user_turns = _user_turns(conversation_history)
     full_transcript = "Full Conversation Transcript:\n\n"
-    for i, entry in enumerate(conversation_history, 1):
-        full_transcript += f"Turn {i} - User: {entry['user']}\n"
-    
-    usr = f"{full_transcript}\n\nPlease provide a COMPREHENSIVE IELTS evaluation based on this complete conversation."
-    return _gemini_chat(sys, usr)
+    for i, user in enumerate(user_turns, 1):
+        full_transcript += f"Turn {i} - User: {user}\n"
+    full_transcript += f"\nMeasured: {render(analyze(user_turns))}\n"
+    return f"{full_transcript}\n\nPlease provide a COMPREHENSIVE IELTS evaluation based on this complete conversation."
+
+def _turn_judge_user_prompt(text: str, turn: int) -> str:
+    return f"Turn {turn} - learner said:\n'''\n{text}\n'''\n\nGive the provisional assessment for this turn."
+
+def _aggregate_user_prompt(assessments: list, transcripts: list) -> str:
+    """`transcripts` are the session's saved utterances; the assessments only add features and notes."""
+    parts = ["Per-turn assessments:\n"]
+    for a, transcript in zip(assessments, transcripts):
+        f = a.features
+        parts.append(f"Turn {a.turn} - User: {transcript}\n"
+                     f"Features: {f['words']} words, MTLD {f['mtld']}, {f['sentences']} sentences, "
+                     f"{f['fillers']} fillers\n"
+                     f"Provisional: {a.notes if a.notes else '(not available - judge from the transcript)'}\n")
+    parts.append(f"Whole conversation, measured: {render(analyze(list(transcripts)))}\n")
+    return "\n".join(parts) + "\nPlease provide the COMPREHENSIVE final IELTS evaluation."
+
+def _opening_user_prompt(scenario: dict = None) -> str:
+    if not scenario:
+        return "Please start a conversation with the learner."
+    return f"Start the {scenario['title']} scenario. You speak first."
+
+def _opening_key(scenario: dict = None) -> tuple[str, str]:
+    """Identical openings have identical prompts: (system prompt, user prompt)."""
+    return opening_system_prompt(scenario), _opening_user_prompt(scenario)
+
+def _generate_opening(key: tuple[str, str]) -> str:
+    """Pool refill (background thread): queued behind every interactive call."""
+    with priority(BATCH):
+        return _gemini_chat(*key, kind="opening")
+
+# Conversation starts: pre-generated openings per scenario, else one call per burst of identical starts
+openings = pool_from_env(_generate_opening)
+opening_flights = SingleFlight()
+
+def warm_opening_pool() -> int:
+    """Start filling the opening pool for every scenario and free talk (no-op unless OPENING_POOL_SIZE)."""
+    return sum(openings.fill(_opening_key(scenario)) for scenario in [None, *SCENARIOS.values()])
+
+def opening_metrics() -> dict:
+    return {"pool": openings.stats(), "single_flight": opening_flights.stats()}
+
+def _turn_note(conversation_history: list = None) -> str:
+    # Don't evaluate every turn - just return empty or brief note
+    return f"Turn {len(conversation_history) + 1 if conversation_history else 1} recorded. Evaluation will be provided at the end of conversation."
+
+# ---------- Coach / Judge ----------
+def coach_feedback(text: str, conversation_history: list = None, scenario: dict = None,
+                   session_id: str = None) -> str:
+    """Coach corrects errors and continues the conversation naturally.
+    conversation_history may be a list of {'user', 'coach'} dicts or a ConversationContext.
+    With `session_id`, earlier turns are served from the session's Gemini context cache."""
+    request, prefix = _coach_request(text, conversation_history, scenario, session_id)
+    try:
+        return _gemini_chat(**request)
+    except Exception as e:
+        if not _stale_cache(prefix, e, session_id):
+            raise
+        return _gemini_chat(**_coach_request(text, conversation_history, scenario, session_id)[0])
+
+def _judge_json(system_prompt: str, user_prompt: str, kind: str = "judge") -> JudgeResult:
+    """Structured judge call: JSON against RESPONSE_SCHEMA, one repair retry if it doesn't validate."""
+    text = _gemini_chat(system_prompt, user_prompt, generation_config=JSON_GENERATION_CONFIG, kind=kind)
+    try:
+        return parse_judge_result(text)
+    except JudgeResultError as e:
+        print(f"Judge output invalid ({e}); retrying once")
+        retry = f"{user_prompt}\n\n{repair_prompt(text, e)}"
+        return parse_judge_result(_gemini_chat(system_prompt, retry, generation_config=JSON_GENERATION_CONFIG,
+                                               kind=f"{kind}_repair"))
+
+async def _ajudge_json(system_prompt: str, user_prompt: str, kind: str = "judge") -> JudgeResult:
+    text = await _agemini_chat(system_prompt, user_prompt, generation_config=JSON_GENERATION_CONFIG, kind=kind)
+    try:
+        return parse_judge_result(text)
+    except JudgeResultError as e:
+        print(f"Judge output invalid ({e}); retrying once")
+        retry = f"{user_prompt}\n\n{repair_prompt(text, e)}"
+        return parse_judge_result(await _agemini_chat(system_prompt, retry, generation_config=JSON_GENERATION_CONFIG,
+                                                      kind=f"{kind}_repair"))
+
+def judge_scores(text: str) -> JudgeResult:
+    """Judge evaluates the ORIGINAL user speech → typed IELTS scores."""
+    return _judge_json(JUDGE_PROMPT, _judge_user_prompt(text))
+
+def judge_feedback(text: str) -> str:
+    """Judge evaluates the ORIGINAL user speech based on IELTS criteria (rendered as markdown)."""
+    return judge_scores(text).to_markdown()
+
+def judge_turn(text: str, turn: int) -> str:
+    """Provisional per-turn scores; run in the background by IncrementalJudge."""
+    with priority(BATCH):  # background work: never ahead of a live turn
+        return _gemini_chat(TURN_JUDGE_PROMPT, _turn_judge_user_prompt(text, turn), model_name=TURN_JUDGE_MODEL,
+                            kind="turn_judge")
+
+def new_incremental_judge() -> IncrementalJudge:
+    """One per conversation: submit each turn's transcript as soon as it is known."""
+    return IncrementalJudge(judge_turn, ajudge_turn)
+
+def instant_scores(conversation_history) -> dict:
+    """Preview without any LLM call: measured features + heuristic bands (pronunciation = None)."""
+    features = analyze(_user_turns(conversation_history))
+    return {"features": features, "scores": instant_score(features)}
+
+def judge_final_scores(conversation_history: list, judge: IncrementalJudge = None) -> JudgeResult:
+    """FINAL IELTS evaluation as a typed result.
+    With an IncrementalJudge that has seen every saved turn, only the aggregation call is left."""
+    transcripts = _user_turns(conversation_history)
+    n = len(transcripts)
+    if judge is not None and n and judge.covers(n, transcripts):
+        return _judge_json(AGGREGATE_EVAL_PROMPT, _aggregate_user_prompt(judge.assessments(n), transcripts),
+                           kind="aggregate")
+    return _judge_json(FINAL_EVAL_PROMPT, _final_eval_user_prompt(conversation_history), kind="final_eval")
+
+def judge_final_evaluation(conversation_history: list, judge: IncrementalJudge = None) -> str:
+    """Judge provides FINAL comprehensive IELTS evaluation after full conversation (markdown)."""
+    return judge_final_scores(conversation_history, judge).to_markdown()
 
 # ---------- Convenience wrapper ----------
 def process(audio_bytes: bytes, conversation_history: list = None, scenario: dict = None) -> tuple[str, str, str]:
@@ -164,29 +1095,210 @@ def process(audio_bytes: bytes, conversation_history: list = None, scenario: dic
     Note: judge_feedback is now just per-turn notes, not full evaluation."""
     transcript = transcribe(audio_bytes)
     coach = coach_feedback(transcript, conversation_history, scenario)
-    
-    # Don't evaluate every turn - just return empty or brief note
-    judge_note = f"Turn {len(conversation_history) + 1 if conversation_history else 1} recorded. Evaluation will be provided at the end of conversation."
-    
-    return transcript, coach, judge_note
+    return transcript, coach, _turn_note(conversation_history)
 
 def start_conversation(scenario: dict = None) -> str:
-    """Start a conversation - Coach speaks first."""
-    if not scenario:
-        # Free conversation
-        sys = """You are a friendly English conversation partner helping someone practice English.
-Start a natural, friendly conversation. Introduce yourself and ask an engaging question to get the conversation going."""
-        usr = "Please start a conversation with the learner."
-    else:
-        # Scenario-based conversation
-        sys = f"""You are role-playing as: {scenario['role']}
-Scenario: {scenario['description']}
-Goal: {scenario['goal']}
+    """Start a conversation - Coach speaks first (from the opening pool, or one call shared by concurrent starts)."""
+    key = _opening_key(scenario)
+    return openings.pop(key) or opening_flights.do(key, lambda: _gemini_chat(*key, kind="opening"))
 
-Start the {scenario['title']} scenario naturally. Greet the customer/guest/candidate and begin the interaction according to your role."""
-        usr = f"Start the {scenario['title']} scenario. You speak first."
-    
-    return _gemini_chat(sys, usr)
+# ---------- Async API ----------
+async def acoach_feedback(text: str, conversation_history: list = None, scenario: dict = None,
+                          session_id: str = None) -> str:
+    """Async coach_feedback()."""
+    request, prefix = _coach_request(text, conversation_history, scenario, session_id)
+    try:
+        return await _agemini_chat(**request)
+    except Exception as e:
+        if not _stale_cache(prefix, e, session_id):
+            raise
+        return await _agemini_chat(**_coach_request(text, conversation_history, scenario, session_id)[0])
+
+async def ajudge_turn(text: str, turn: int) -> str:
+    """Async judge_turn()."""
+    with priority(BATCH):
+        return await _agemini_chat(TURN_JUDGE_PROMPT, _turn_judge_user_prompt(text, turn), model_name=TURN_JUDGE_MODEL,
+                                   kind="turn_judge")
+
+async def ajudge_final_scores(conversation_history: list, judge: IncrementalJudge = None) -> JudgeResult:
+    """Async judge_final_scores()."""
+    transcripts = _user_turns(conversation_history)
+    n = len(transcripts)
+    if judge is not None and n and judge.covers(n, transcripts):
+        return await _ajudge_json(AGGREGATE_EVAL_PROMPT,
+                                  _aggregate_user_prompt(await judge.aassessments(n), transcripts), kind="aggregate")
+    return await _ajudge_json(FINAL_EVAL_PROMPT, _final_eval_user_prompt(conversation_history), kind="final_eval")
+
+async def ajudge_final_evaluation(conversation_history: list, judge: IncrementalJudge = None) -> str:
+    """Async judge_final_evaluation()."""
+    return (await ajudge_final_scores(conversation_history, judge)).to_markdown()
+
+async def astart_conversation(scenario: dict = None) -> str:
+    """Async start_conversation()."""
+    key = _opening_key(scenario)
+    return openings.pop(key) or await opening_flights.ado(key, lambda: _agemini_chat(*key, kind="opening"))
+
+async def aprocess(audio_bytes: bytes, conversation_history: list = None, scenario: dict = None) -> tuple[str, str, str]:
+    """Async process()."""
+    transcript = await atranscribe(audio_bytes)
+    coach = await acoach_feedback(transcript, conversation_history, scenario)
+    return transcript, coach, _turn_note(conversation_history)
+
+# ---------- Streaming coach ----------
+COMPLETE_MARKER = "[CONVERSATION_COMPLETE]"
+
+# Time-to-first-token and total generation time of streamed coach replies
+stream_latency = {"ttft": LatencyWindow(), "total": LatencyWindow()}
+COACH_TTFT = telemetry.histogram("coach_ttft_seconds", "Time to the first streamed coach token")
+
+class CoachStream:
+    """Coach reply streamed chunk by chunk, with the completion marker stripped on the fly.
+
+    Iterate it (sync or async, matching the source) to receive display text.
+    Once exhausted, `text`, `is_complete`, `ttft` and `total` are set.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = ""
+        self._parts = []
+        self._start = time.perf_counter()
+        self.is_complete = False
+        self.ttft = None
+        self.total = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts).strip()
+
+    def _feed(self, raw: str) -> str:
+        buf = self._pending + raw
+        if COMPLETE_MARKER in buf:
+            buf = buf.replace(COMPLETE_MARKER, "")
+            self.is_complete = True
+        # Hold back a tail that could be the start of a split marker
+        hold = 0
+        for n in range(min(len(buf), len(COMPLETE_MARKER) - 1), 0, -1):
+            if COMPLETE_MARKER.startswith(buf[-n:]):
+                hold = n
+                break
+        self._pending = buf[len(buf) - hold:] if hold else ""
+        return self._emit(buf[:len(buf) - hold])
+
+    def _emit(self, out: str) -> str:
+        if out:
+            if self.ttft is None and out.strip():
+                self.ttft = time.perf_counter() - self._start
+                stream_latency["ttft"].add(self.ttft)
+                COACH_TTFT.observe(self.ttft)
+            self._parts.append(out)
+        return out
+
+    def _finish(self) -> str:
+        out, self._pending = self._emit(self._pending), ""
+        self.total = time.perf_counter() - self._start
+        stream_latency["total"].add(self.total)
+        return out
+
+    def __iter__(self):
+        for raw in self._chunks:
+            out = self._feed(raw)
+            if out:
+                yield out
+        out = self._finish()
+        if out:
+            yield out
+
+    async def __aiter__(self):
+        async for raw in self._chunks:
+            out = self._feed(raw)
+            if out:
+                yield out
+        out = self._finish()
+        if out:
+            yield out
+
+def _coach_chunks(text: str, conversation_history, scenario: dict, session_id: str):
+    request, prefix = _coach_request(text, conversation_history, scenario, session_id)
+    started = False
+    try:
+        for chunk in _gemini_stream(**request):
+            started = True
+            yield chunk
+    except Exception as e:
+        if started or not _stale_cache(prefix, e, session_id):
+            raise
+        yield from _gemini_stream(**_coach_request(text, conversation_history, scenario, session_id)[0])
+
+async def _acoach_chunks(text: str, conversation_history, scenario: dict, session_id: str):
+    request, prefix = _coach_request(text, conversation_history, scenario, session_id)
+    started = False
+    try:
+        async for chunk in _agemini_stream(**request):
+            started = True
+            yield chunk
+    except Exception as e:
+        if started or not _stale_cache(prefix, e, session_id):
+            raise
+        async for chunk in _agemini_stream(**_coach_request(text, conversation_history, scenario, session_id)[0]):
+            yield chunk
+
+def stream_coach_feedback(text: str, conversation_history=None, scenario: dict = None,
+                          session_id: str = None) -> CoachStream:
+    """Streaming coach_feedback(): iterate the result for text chunks."""
+    return CoachStream(_coach_chunks(text, conversation_history, scenario, session_id))
+
+def astream_coach_feedback(text: str, conversation_history=None, scenario: dict = None,
+                           session_id: str = None) -> CoachStream:
+    """Async streaming coach_feedback(): `async for` over the result."""
+    return CoachStream(_acoach_chunks(text, conversation_history, scenario, session_id))
+
+def process_stream(audio_bytes: bytes, conversation_history=None, scenario: dict = None) -> tuple[str, CoachStream, str]:
+    """Like process(), but the coach reply is returned as a CoachStream."""
+    transcript = transcribe(audio_bytes)
+    return transcript, stream_coach_feedback(transcript, conversation_history, scenario), _turn_note(conversation_history)
+
+def streaming_metrics() -> dict:
+    return {name: window.summary() for name, window in stream_latency.items()}
+
+# ---------- Prometheus gauges/counters read at scrape time ----------
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _breakers() -> dict:
+    """Every breaker once, by its own name (Gemini ASR shares the gemini-2.5-flash breaker)."""
+    return {b.name: b for b in [*(backend.breaker for backend in asr_router.backends), *list(gemini_breakers.values())]}
+
+def _asr_cache_lookups() -> dict:
+    s = transcripts.stats()
+    return {("hit",): s["hits"], ("disk_hit",): s["disk_hits"], ("miss",): s["misses"]}
+
+def _asr_fallbacks() -> dict:
+    """Transcripts returned by a backend other than the primary (hedge wins + failovers)."""
+    primary = asr_router.backends[0].name
+    return {(): sum(n for name, n in asr_router.wins.items() if name != primary)}
+
+telemetry.callback("asr_cache_lookups", "Transcript cache lookups", _asr_cache_lookups, ("result",), "counter")
+telemetry.callback("gemini_model_cache_lookups", "GenerativeModel handle cache lookups",
+                   lambda: {("hit",): models.hits, ("miss",): models.misses}, ("result",), "counter")
+telemetry.callback("asr_wins", "Transcripts returned per ASR backend",
+                   lambda: {(name,): n for name, n in asr_router.wins.items()}, ("backend",), "counter")
+telemetry.callback("asr_fallbacks", "Transcripts not returned by the primary ASR backend", _asr_fallbacks,
+                   type="counter")
+telemetry.callback("context_cache_calls", "Coach calls with / without a cached prefix",
+                   lambda: {("hit",): context_caches.hits, ("miss",): context_caches.misses}, ("result",), "counter")
+telemetry.callback("opening_pool_lookups", "Conversation starts served from / missing the opening pool",
+                   lambda: {("hit",): openings.hits, ("miss",): openings.misses}, ("result",), "counter")
+telemetry.callback("opening_calls_shared", "Conversation starts that joined another start's opening call",
+                   lambda: {(): opening_flights.shared}, type="counter")
+telemetry.callback("asr_hedges", "Hedge requests launched", lambda: {(): asr_router.hedges}, type="counter")
+telemetry.callback("rate_inflight", "In-flight calls per provider/model",
+                   lambda: {(k,): m["inflight"] for k, m in governors.metrics().items()}, ("governor",))
+telemetry.callback("rate_queue_depth", "Callers waiting per provider/model",
+                   lambda: {(k,): m["queue_depth"] for k, m in governors.metrics().items()}, ("governor",))
+telemetry.callback("circuit_state", "Breaker state (0 closed, 1 half-open, 2 open)",
+                   lambda: {(n,): CIRCUIT_STATES[b.state] for n, b in _breakers().items()}, ("name",))
+telemetry.callback("circuit_rejected", "Calls refused by an open breaker",
+                   lambda: {(n,): b.rejected for n, b in _breakers().items()}, ("name",), "counter")
 
 # ---------- Predefined Scenarios ----------
 SCENARIOS = {
@@ -0,0 +1,202 @@
+"""opening_pool.py
+Scenario openings without waiting on Gemini
+-------------------------------------------
+Every "Start Conversation" used to make a fresh Gemini call for the
+coach's greeting (1-3 s). In a class, dozens of learners start the same
+scenario within seconds, and each of them waited on an identical prompt.
+
+  single-flight  Concurrent requests for the same opening prompt share one
+                 call (SingleFlight). A caller that gives up (client
+                 disconnect) doesn't cancel it for the others.
+  pool           Optionally, OPENING_POOL_SIZE openings per scenario are
+                 generated ahead of time (OpeningPool). Starting a
+                 conversation pops one locally. Once a scenario's pool drops
+                 below OPENING_POOL_REFILL_AT it is topped up in the
+                 background at batch priority. An empty pool falls back to
+                 the single-flight call and schedules a refill.
+
+Pooled openings are distinct generations, so learners in the same class
+still get different greetings until the pool runs dry. Each worker
+process keeps its own pool.
+
+The pool is SDK-agnostic: `generate_fn(key) -> str` makes the call
+(model_service wires it to the opening prompt of the scenario in `key`).
+
+Env vars:
+  OPENING_POOL_SIZE (0 = off)   OPENING_POOL_REFILL_AT (= size)
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="opening-pool")
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = self.error = None
+
+class SingleFlight:
+    """Merges concurrent calls with the same key into one (threads via do(), event loops via ado())."""
+
+    def __init__(self):
+        self._calls: dict = {}    # key -> _Call (threads)
+        self._tasks: dict = {}    # (loop, key) -> Task
+        self._lock = threading.Lock()
+        self.calls = 0            # executions
+        self.shared = 0           # callers served by another caller's execution
+
+    def do(self, key, fn):
+        """fn() once for all threads asking for `key` at the same time; they all get its result or error."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """await fn() once for all coroutines on this loop asking for `key` at the same time."""
+        task_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._forget(task_key))
+                self.calls += 1
+            else:
+                self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key) -> None:
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared,
+                    "in_flight": len(self._calls) + len(self._tasks)}
+
+class OpeningPool:
+    """Pre-generated openings per key (thread-safe); refills run on a background executor."""
+
+    def __init__(self, generate_fn, size: int = 0, refill_at: int | None = None, run=None):
+        self.generate_fn = generate_fn
+        self.size = size
+        self.refill_at = size if refill_at is None else refill_at
+        self.run = run or _executor.submit
+        self._pools: dict = {}    # key -> deque of openings
+        self._refilling: set = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def pop(self, key) -> str | None:
+        """A pooled opening for `key`, or None (pool off or empty). Schedules a refill when running low."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            text = pool.popleft() if pool else None
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            refill = self._claim(key, pool)
+        if refill:
+            self.run(self._refill, key)
+        return text
+
+    def fill(self, key) -> bool:
+        """Top up `key`'s pool in the background (warm-up); False if it's full or already filling."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            refill = self._claim(key, self._pools.setdefault(key, deque()), threshold=self.size)
+        if refill:
+            self.run(self._refill, key)
+        return refill
+
+    def _claim(self, key, pool: deque, threshold: int | None = None) -> bool:
+        threshold = self.refill_at if threshold is None else threshold
+        if self._closed or key in self._refilling or len(pool) >= threshold:
+            return False
+        self._refilling.add(key)
+        return True
+
+    def _refill(self, key) -> None:
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._pools[key]) >= self.size:
+                        return
+                try:
+                    text = self.generate_fn(key)
+                except Exception:
+                    text = None
+                with self._lock:
+                    if not text:
+                        self.failures += 1
+                        return   # the next pop() tries again
+                    if self._closed:
+                        return
+                    self._pools[key].append(text)
+                    self.generated += 1
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def close(self) -> None:
+        """Stop refilling and drop the pooled openings (call on shutdown)."""
+        with self._lock:
+            self._closed = True
+            self._pools.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self.size,
+                "pooled": sum(len(pool) for pool in self._pools.values()),
+                "keys": len(self._pools),
+                "refilling": len(self._refilling),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "generated": self.generated,
+                "failures": self.failures,
+            }
+
+def pool_from_env(generate_fn) -> OpeningPool:
+    size = int(os.getenv("OPENING_POOL_SIZE", "0"))
+    refill_at = os.getenv("OPENING_POOL_REFILL_AT")
+    return OpeningPool(generate_fn, size=size, refill_at=int(refill_at) if refill_at else None)
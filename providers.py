@@ -0,0 +1,355 @@
+"""providers.py
+Gemini provider interface and offline stubs
+-------------------------------------------
+model_service never touches google.generativeai directly. It asks a
+provider for model handles, file uploads and cached contents:
+
+  configure(api_key)
+  model(model_name, system_instruction, generation_config) -> model
+  upload_file(data, mime_type) -> file (has .name)   delete_file(name)
+  create_cache(model_name, system_instruction, contents, ttl_s) -> content
+  touch_cache(content, ttl_s)                         (extends the TTL; content.delete() removes it)
+  cached_model(content) -> model
+
+A model implements `generate_content(contents, stream=False)` and
+`generate_content_async(...)` the way google.generativeai's
+GenerativeModel does. Responses have `.text` and `.usage_metadata`, and
+streams yield chunks with `.text`. Everything above the provider still runs
+for real: the model registry, rate governor, circuit breaker, telemetry
+and context cache.
+
+GeminiProvider wraps the SDK. StubGemini answers locally with sampled
+latency, an error rate and canned outputs. The Typhoon side needs no
+interface, because its stub is an HTTP server (stub_typhoon_server.py)
+and the real client talks to it unchanged.
+
+Latency specs:
+  "0.4"                     fixed 0.4 s
+  "uniform:0.2:0.6"         uniform between 0.2 s and 0.6 s
+  "lognormal:0.4:0.5"       median 0.4 s, sigma 0.5 (long right tail)
+
+Env vars (read by model_service):
+  STUB_PROVIDERS (unset)    comma list: typhoon,gemini (or "all")
+  STUB_GEMINI_LATENCY (lognormal:0.6:0.4)   STUB_GEMINI_ERROR_RATE (0)
+  STUB_GEMINI_PREFILL_MS_PER_1K (0)         uncached prompt tokens add this
+  STUB_TYPHOON_LATENCY (lognormal:0.4:0.3)  STUB_TYPHOON_ERROR_RATE (0)
+  STUB_SEED (unset)         seed the stubs' random draws
+"""
+
+import asyncio
+import datetime
+import io
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+from conversation_context import estimate_tokens
+
+PROVIDERS = ("typhoon", "gemini")
+
+def stubbed() -> set:
+    """Providers replaced by stubs according to STUB_PROVIDERS."""
+    names = {n.strip().lower() for n in os.getenv("STUB_PROVIDERS", "").split(",") if n.strip()}
+    if names & {"all", "1", "true"}:
+        return set(PROVIDERS)
+    unknown = names - set(PROVIDERS)
+    if unknown:
+        raise ValueError(f"STUB_PROVIDERS: unknown provider(s) {', '.join(sorted(unknown))}")
+    return names
+
+# ---------- Latency distributions ----------
+@dataclass(frozen=True)
+class Latency:
+    kind: str = "fixed"      # fixed | uniform | lognormal
+    a: float = 0.0           # fixed: seconds; uniform: low; lognormal: median
+    b: float = 0.0           # uniform: high; lognormal: sigma
+
+    @classmethod
+    def parse(cls, spec) -> "Latency":
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", float(spec))
+        kind, *args = str(spec).strip().split(":")
+        try:
+            if not args:
+                return cls("fixed", float(kind))
+            if kind in ("uniform", "lognormal") and len(args) == 2:
+                return cls(kind, float(args[0]), float(args[1]))
+        except ValueError:
+            pass
+        raise ValueError(f"bad latency spec {spec!r} (use '0.4', 'uniform:LOW:HIGH' or 'lognormal:MEDIAN:SIGMA')")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return self.a
+
+    def __str__(self) -> str:
+        return f"{self.a:g}" if self.kind == "fixed" else f"{self.kind}:{self.a:g}:{self.b:g}"
+
+def cache_ttl(ttl_s: float) -> datetime.timedelta:
+    """A cached content's TTL as the SDK takes it (int seconds or timedelta; a float is rejected)."""
+    return datetime.timedelta(seconds=ttl_s)
+
+# ---------- Real SDK ----------
+class GeminiProvider:
+    """google.generativeai (imported on first use)."""
+    stub = False
+
+    def configure(self, api_key: str | None) -> None:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+
+    def model(self, model_name: str, system_instruction: str | None = None, generation_config: dict | None = None):
+        import google.generativeai as genai
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction,
+                                     generation_config=generation_config)
+
+    def upload_file(self, data: bytes, mime_type: str):
+        import google.generativeai as genai
+        return genai.upload_file(io.BytesIO(data), mime_type=mime_type)
+
+    def delete_file(self, name: str) -> None:
+        import google.generativeai as genai
+        genai.delete_file(name)
+
+    def create_cache(self, model_name: str, system_instruction: str, contents: list, ttl_s: float):
+        from google.generativeai import caching
+        return caching.CachedContent.create(model=model_name, system_instruction=system_instruction,
+                                            contents=contents, ttl=cache_ttl(ttl_s))
+
+    def touch_cache(self, content, ttl_s: float) -> None:
+        content.update(ttl=cache_ttl(ttl_s))
+
+    def cached_model(self, content):
+        import google.generativeai as genai
+        return genai.GenerativeModel.from_cached_content(content)
+
+# ---------- Stubs ----------
+class StubProviderError(RuntimeError):
+    """Injected failure (counts as an error for breakers and metrics, like a 503)."""
+
+COACH_REPLIES = (
+    "That sounds great! By the way, we say 'I would like a coffee'. What size would you like?",
+    "Good choice. Would you like anything to eat with that?",
+    "Nice! Small note: it's 'two coffees', not 'two coffee'. Anything else for you today?",
+)
+TRANSCRIPT = "I would like to order a coffee please"
+JUDGE_JSON = json.dumps({
+    **{name: {"score": score, "justification": "Stub assessment."}
+       for name, score in (("pronunciation", 6.5), ("vocabulary", 6.0), ("grammar", 5.5), ("fluency_coherence", 6.0))},
+    "overall_band": 6.0,
+    "strengths": ["Polite requests"],
+    "weaknesses": ["Plural nouns"],
+    "examples": [{"sentence": TRANSCRIPT, "comment": "Clear and polite.", "strong": True}],
+})
+
+def _contents_text(contents) -> str:
+    """Text of a prompt string or contents list (audio parts count as nothing)."""
+    if isinstance(contents, str):
+        return contents
+    text = []
+    for item in contents:
+        if isinstance(item, str):
+            text.append(item)
+        elif isinstance(item, dict) and "parts" in item:
+            text.append(_contents_text(item["parts"]))
+    return "".join(text)
+
+def _has_audio(contents) -> bool:
+    return not isinstance(contents, str) and any(
+        (isinstance(p, dict) and str(p.get("mime_type", "")).startswith("audio/")) or hasattr(p, "uri")
+        for p in contents)
+
+class _StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class _StubResponse:
+    def __init__(self, text: str, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+class _StubAsyncStream:
+    def __init__(self, model: "StubModel", chunks: list):
+        self._model, self._chunks = model, chunks
+
+    def __aiter__(self):
+        return self._agen()
+
+    async def _agen(self):
+        for i, chunk in enumerate(self._chunks):
+            if i:
+                await asyncio.sleep(self._model.provider.chunk_interval)
+            yield _StubChunk(chunk)
+
+class StubModel:
+    """Stand-in for a GenerativeModel: sleeps a sampled latency, then answers from the provider's canned outputs."""
+
+    def __init__(self, provider: "StubGemini", model_name: str, system_instruction: str | None = None,
+                 generation_config: dict | None = None, cached_tokens: int = 0):
+        self.provider = provider
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.cached_tokens = cached_tokens
+
+    def _plan(self, contents) -> tuple[float, str, object]:
+        """(delay, reply, usage) for one call; raises StubProviderError on an injected failure."""
+        p = self.provider
+        prompt_tokens = self.cached_tokens + estimate_tokens(self.system_instruction or "") + estimate_tokens(
+            _contents_text(contents))
+        with p._lock:
+            p.calls += 1
+            delay = p.latency.sample(p.rng)
+            failed = p.rng.random() < p.error_rate
+            p.failures += failed
+            reply = p.reply(self, contents)
+        delay += (prompt_tokens - self.cached_tokens) / 1000 * p.prefill_s_per_1k
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=estimate_tokens(reply),
+                                cached_content_token_count=self.cached_tokens)
+        return delay, (None if failed else reply), usage
+
+    def _chunks(self, reply: str) -> list:
+        words = reply.split(" ")
+        size = self.provider.chunk_words
+        return [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "")
+                for i in range(0, len(words), size)]
+
+    def generate_content(self, contents, stream: bool = False, **_):
+        delay, reply, usage = self._plan(contents)
+        time.sleep(delay)
+        if reply is None:
+            raise StubProviderError(f"503 stub {self.model_name} failure")
+        if not stream:
+            return _StubResponse(reply, usage)
+
+        def chunks():
+            for i, chunk in enumerate(self._chunks(reply)):
+                if i:
+                    time.sleep(self.provider.chunk_interval)
+                yield _StubChunk(chunk)
+        return chunks()
+
+    async def generate_content_async(self, contents, stream: bool = False, **_):
+        delay, reply, usage = self._plan(contents)
+        await asyncio.sleep(delay)
+        if reply is None:
+            raise StubProviderError(f"503 stub {self.model_name} failure")
+        return _StubAsyncStream(self, self._chunks(reply)) if stream else _StubResponse(reply, usage)
+
+class _StubCache:
+    def __init__(self, provider: "StubGemini", model_name: str, system_instruction: str, contents: list, ttl_s: float):
+        self.provider = provider
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.tokens = estimate_tokens(system_instruction) + estimate_tokens(_contents_text(contents))
+        self.ttl_s = ttl_s
+        self.name = f"cachedContents/stub-{next(provider._ids)}"
+
+    def update(self, ttl: datetime.timedelta | None = None) -> None:
+        self.ttl_s = ttl.total_seconds()
+
+    def delete(self) -> None:
+        self.provider.caches.pop(self.name, None)
+
+class StubGemini:
+    """Offline Gemini: latency from `latency`, failures at `error_rate`, replies from `reply()`.
+
+    Replies by default: the ASR transcript for prompts with an audio part, a
+    valid judge JSON when the model was built with a JSON response type, and
+    the coach replies in turn otherwise. Pass `replies=` to override (a
+    callable `(model, contents) -> str`). `prefill_s_per_1k` makes uncached
+    prompt tokens cost time, so context caching shows up in benchmarks.
+    """
+    stub = True
+
+    def __init__(self, latency="lognormal:0.6:0.4", error_rate: float = 0.0, prefill_s_per_1k: float = 0.0,
+                 replies=None, transcript: str = TRANSCRIPT, coach_replies=COACH_REPLIES, judge_json: str = JUDGE_JSON,
+                 chunk_words: int = 4, chunk_interval: float = 0.02, seed: int | None = None):
+        self.latency = Latency.parse(latency)
+        self.error_rate = error_rate
+        self.prefill_s_per_1k = prefill_s_per_1k
+        self.replies = replies
+        self.transcript = transcript
+        self.judge_json = judge_json
+        self.chunk_words = chunk_words
+        self.chunk_interval = chunk_interval
+        self.rng = random.Random(seed)
+        self._coach = itertools.cycle(coach_replies)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.caches: dict = {}
+        self.uploads = 0
+
+    def reply(self, model: StubModel, contents) -> str:
+        if self.replies is not None:
+            return self.replies(model, contents)
+        if _has_audio(contents):
+            return self.transcript
+        if model.generation_config.get("response_mime_type") == "application/json":
+            return self.judge_json
+        return next(self._coach)
+
+    # ----- provider interface -----
+    def configure(self, api_key: str | None) -> None:
+        pass
+
+    def model(self, model_name: str, system_instruction: str | None = None, generation_config: dict | None = None):
+        return StubModel(self, model_name, system_instruction, generation_config)
+
+    def upload_file(self, data: bytes, mime_type: str):
+        self.uploads += 1
+        return SimpleNamespace(name=f"files/stub-{next(self._ids)}", uri="stub://file", mime_type=mime_type)
+
+    def delete_file(self, name: str) -> None:
+        pass
+
+    def create_cache(self, model_name: str, system_instruction: str, contents: list, ttl_s: float):
+        with self._lock:
+            delay = self.latency.sample(self.rng)
+        time.sleep(delay)
+        content = _StubCache(self, model_name, system_instruction, contents, ttl_s)
+        self.caches[content.name] = content
+        return content
+
+    def touch_cache(self, content, ttl_s: float) -> None:
+        content.update(ttl=cache_ttl(ttl_s))
+
+    def cached_model(self, content):
+        return StubModel(self, content.model_name, content.system_instruction, cached_tokens=content.tokens)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "failures": self.failures, "caches": len(self.caches),
+                "uploads": self.uploads, "latency": str(self.latency), "error_rate": self.error_rate}
+
+def _seed() -> int | None:
+    seed = os.getenv("STUB_SEED")
+    return int(seed) if seed else None
+
+def stub_gemini_from_env() -> StubGemini:
+    return StubGemini(latency=os.getenv("STUB_GEMINI_LATENCY", "lognormal:0.6:0.4"),
+                      error_rate=float(os.getenv("STUB_GEMINI_ERROR_RATE", "0")),
+                      prefill_s_per_1k=float(os.getenv("STUB_GEMINI_PREFILL_MS_PER_1K", "0")) / 1000,
+                      seed=_seed())
+
+def gemini_from_env():
+    """StubGemini when STUB_PROVIDERS includes gemini, else the real SDK."""
+    return stub_gemini_from_env() if "gemini" in stubbed() else GeminiProvider()
+
+def typhoon_stub_from_env():
+    """Start the stub Typhoon server configured by STUB_TYPHOON_* (call when STUB_PROVIDERS includes typhoon)."""
+    from stub_typhoon_server import start_stub_typhoon
+    return start_stub_typhoon(latency=os.getenv("STUB_TYPHOON_LATENCY", "lognormal:0.4:0.3"),
+                              error_rate=float(os.getenv("STUB_TYPHOON_ERROR_RATE", "0")), seed=_seed())
@@ -0,0 +1,276 @@
+"""rate_governor.py
+Per-provider rate limiting and concurrency control
+--------------------------------------------------
+Every Typhoon and Gemini call passes through a Governor for its provider
+and model. A governor combines a token bucket (requests per second plus a
+burst) with a cap on in-flight calls. Callers that can't be admitted wait
+in a priority queue: live turns go first, then interactive requests, then
+batch and final-evaluation work. Queue depth and wait time are kept for
+the metrics endpoint.
+
+Priority travels with the caller's context (a ContextVar). asyncio tasks
+and asyncio.to_thread() inherit it, and so do the ASR router's and chunked
+ASR's worker threads, which run each call in a copy of the caller's context:
+
+    with priority(BATCH):
+        await ajudge_final_scores(history)
+
+A governor works from threads and from event loops at the same time.
+Admission happens under one lock. A timer wakes the queue when the next
+token is due, so waiters never poll.
+
+Limits come from RATE_LIMITS, a comma list of key=CONCURRENCY/RPS[/BURST].
+A key is "provider:model", a model, or a provider, and 0 means unlimited:
+    RATE_LIMITS="typhoon=10/5,gemini-2.5-flash=16/8/8"
+They are provider quotas for the whole deployment. With N worker processes
+each one enforces its 1/N share (per_worker).
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+LIVE, INTERACTIVE, BATCH = 0, 1, 2
+PRIORITY_NAMES = {LIVE: "live", INTERACTIVE: "interactive", BATCH: "batch"}
+
+_priority: ContextVar[int] = ContextVar("rate_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed calls (and tasks/threads started from them) at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+@dataclass(frozen=True)
+class Limits:
+    concurrency: int = 0     # max in-flight calls (0 = unlimited)
+    rps: float = 0.0         # sustained requests per second (0 = unlimited)
+    burst: int = 0           # bucket size (0 = max(1, rps))
+
+def parse_limits(spec: str) -> dict[str, Limits]:
+    """'typhoon=10/5,gemini-2.5-flash=16/8/8' -> {key: Limits}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        key, _, value = item.partition("=")
+        fields = [float(v) for v in value.split("/") if v.strip()]
+        if not key.strip() or not fields or len(fields) > 3:
+            raise ValueError(f"Bad RATE_LIMITS entry {item!r}; expected key=CONCURRENCY/RPS[/BURST]")
+        fields += [0] * (3 - len(fields))
+        limits[key.strip()] = Limits(int(fields[0]), fields[1], int(fields[2]))
+    return limits
+
+def per_worker(limits: dict[str, Limits], workers: int) -> dict[str, Limits]:
+    """Each of `workers` processes' share of deployment-wide limits (at least 1 slot/token each)."""
+    if workers <= 1:
+        return limits
+    share = lambda n: max(1, math.ceil(n / workers)) if n else 0
+    return {key: Limits(share(l.concurrency), l.rps / workers, share(l.burst)) for key, l in limits.items()}
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "enqueued", "granted", "cancelled", "event", "loop", "future")
+
+    def __init__(self, priority: int, seq: int, event=None, loop=None, future=None):
+        self.priority, self.seq = priority, seq
+        self.enqueued = time.perf_counter()
+        self.granted = self.cancelled = False
+        self.event, self.loop, self.future = event, loop, future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        elif self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+class Governor:
+    """Token bucket + concurrency cap with a priority wait queue, for one provider/model."""
+
+    def __init__(self, name: str, limits: Limits = Limits()):
+        self.name = name
+        self.limits = limits
+        self.burst = limits.burst or max(1, int(limits.rps))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._inflight = 0
+        self._heap: list[_Waiter] = []
+        self._waiting = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self.granted = 0
+        self.queued = 0                          # grants that had to wait
+        self.max_depth = 0
+        self.by_priority = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.waits = deque(maxlen=1000)          # seconds spent queued
+
+    # ----- admission (call with the lock held) -----
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.limits.rps:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.limits.rps)
+        self._last = now
+
+    def _dispatch(self) -> None:
+        self._refill()
+        while self._heap:
+            waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self.limits.concurrency and self._inflight >= self.limits.concurrency:
+                return  # a release() will dispatch again
+            if self.limits.rps and self._tokens < 1:
+                self._wake_in((1 - self._tokens) / self.limits.rps)
+                return
+            heapq.heappop(self._heap)
+            if self.limits.rps:
+                self._tokens -= 1
+            self._inflight += 1
+            self._waiting -= 1
+            wait = time.perf_counter() - waiter.enqueued
+            self.granted += 1
+            self.by_priority[PRIORITY_NAMES.get(waiter.priority, "batch")] += 1
+            if wait > 0.001:
+                self.queued += 1
+            self.waits.append(wait)
+            waiter.grant()
+
+    def _wake_in(self, delay: float) -> None:
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        with self._lock:
+            heapq.heappush(self._heap, waiter)
+            self._waiting += 1
+            self._dispatch()
+            self.max_depth = max(self.max_depth, self._waiting)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.granted:
+                self._inflight -= 1
+                self._dispatch()
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._waiting -= 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+            self._dispatch()
+
+    # ----- sync -----
+    def acquire(self, level: int | None = None) -> None:
+        waiter = _Waiter(current_priority() if level is None else level, next(self._seq),
+                         event=threading.Event())
+        self._enqueue(waiter)
+        if waiter.granted:
+            return
+        try:
+            waiter.event.wait()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    @contextmanager
+    def slot(self, level: int | None = None):
+        self.acquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # ----- async -----
+    async def aacquire(self, level: int | None = None) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(current_priority() if level is None else level, next(self._seq),
+                         loop=loop, future=loop.create_future())
+        self._enqueue(waiter)
+        if waiter.granted:
+            return
+        try:
+            await waiter.future
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    @asynccontextmanager
+    async def aslot(self, level: int | None = None):
+        await self.aacquire(level)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # ----- metrics -----
+    def metrics(self) -> dict:
+        waits = sorted(self.waits)
+        pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else None
+        return {
+            "concurrency": self.limits.concurrency or None,
+            "rps": self.limits.rps or None,
+            "burst": self.burst if self.limits.rps else None,
+            "inflight": self._inflight,
+            "queue_depth": self._waiting,
+            "max_queue_depth": self.max_depth,
+            "granted": self.granted,
+            "queued": self.queued,
+            "granted_by_priority": dict(self.by_priority),
+            "wait_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": pct(1.0)},
+        }
+
+class GovernorRegistry:
+    """One Governor per "provider:model", created on first use.
+
+    Limits are looked up by the full key, then the model, then the
+    provider, then `defaults` (per provider).
+    """
+
+    def __init__(self, limits: dict[str, Limits] | None = None, defaults: dict[str, Limits] | None = None):
+        self.limits = limits or {}
+        self.defaults = defaults or {}
+        self._governors: dict[str, Governor] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str) -> Governor:
+        key = f"{provider}:{model}"
+        governor = self._governors.get(key)
+        if governor is None:
+            with self._lock:
+                governor = self._governors.get(key)
+                if governor is None:
+                    limits = (self.limits.get(key) or self.limits.get(model) or self.limits.get(provider)
+                              or self.defaults.get(provider, Limits()))
+                    governor = self._governors[key] = Governor(key, limits)
+        return governor
+
+    def metrics(self) -> dict:
+        return {key: governor.metrics() for key, governor in list(self._governors.items())}
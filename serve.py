@@ -0,0 +1,86 @@
+"""serve.py
+Production launch: N uvicorn workers with graceful drain
+--------------------------------------------------------
+Runs backend/main.py under uvicorn with `--workers` processes sharing one
+listening socket, so turns/s grows with the cores on the box. Each worker
+has its own event loop, Typhoon/Gemini clients and caches. Sessions and
+the transcript cache must therefore live in shared state (shared_state.py).
+With more than one worker, SESSION_STORE=memory is refused.
+
+On SIGTERM/SIGINT each worker stops accepting connections, lets its
+in-flight turns finish (HTTP, SSE and live WebSocket turns, plus final
+evaluations being precomputed) for up to --drain-timeout seconds, and only
+then closes connections and exits (drain.py).
+
+Usage:
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000] [--drain-timeout 30]
+    WEB_CONCURRENCY=4 SESSION_STORE=sqlite python serve.py
+    SESSION_STORE=redis REDIS_URL=redis://cache:6379/0 TRANSCRIPT_CACHE_DB=redis://cache:6379/0 python serve.py
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from drain import DRAIN_TIMEOUT, turns
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(ROOT, "backend")
+logger = logging.getLogger("uvicorn.error")
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server that waits for this worker's in-flight turns before closing any connection."""
+
+    async def shutdown(self, sockets=None) -> None:
+        for server in self.servers:
+            server.close()   # stop accepting; open connections stay up while turns finish
+        if turns.active or turns.pending():
+            logger.info("Draining %d in-flight turn(s), %d background task(s)", turns.active, turns.pending())
+        if not await turns.drain(self.config.timeout_graceful_shutdown or DRAIN_TIMEOUT):
+            logger.error("Drain timed out with %d turn(s) still running", turns.active)
+        await super().shutdown(sockets)
+
+def check_shared_state(workers: int) -> str | None:
+    """Why `workers` processes can't run on the configured state, or None."""
+    if workers > 1 and os.getenv("SESSION_STORE", "memory").lower() == "memory":
+        return (f"{workers} workers would each keep their own sessions; set SESSION_STORE=sqlite "
+                "(one box) or SESSION_STORE=redis")
+    return None
+
+def main(argv=None):
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(ROOT, ".env"))
+        load_dotenv(os.path.join(BACKEND, ".env"))
+    except ImportError:
+        pass
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1") or 1),
+                        help="worker processes (default WEB_CONCURRENCY or 1; try the number of cores)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT,
+                        help="seconds to let in-flight turns finish on shutdown")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    problem = check_shared_state(args.workers)
+    if problem:
+        sys.exit(f"❌ {problem}")
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)   # workers size their RATE_LIMITS share from it
+    sys.path.insert(0, BACKEND)                          # inherited by the spawned workers
+
+    config = uvicorn.Config("main:app", host=args.host, port=args.port, workers=args.workers,
+                            timeout_graceful_shutdown=args.drain_timeout, log_level=args.log_level)
+    server = DrainingServer(config)
+    if args.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    main()
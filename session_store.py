@@ -0,0 +1,216 @@
+"""session_store.py
+Server-side conversation sessions
+---------------------------------
+Holds each learner's scenario, turns, transcripts and completion state so
+clients only send a session id with each new recording instead of the
+whole history.
+
+Backends:
+- InMemorySessionStore : dict with idle-TTL eviction (default)
+- SQLiteSessionStore   : survives restarts, shared by workers on one box (SESSION_STORE=sqlite)
+- RedisSessionStore    : shared by workers on any number of boxes (SESSION_STORE=redis)
+
+Env vars:
+  SESSION_STORE=memory|sqlite|redis   SESSION_DB=sessions.db   SESSION_TTL=7200
+  SESSION_REDIS_URL= (default REDIS_URL)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from conversation_context import ConversationContext
+from shared_state import redis_client
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "7200"))
+
+@dataclass
+class Session:
+    id: str
+    scenario_id: str = "free"
+    opening: str = ""
+    turns: list = field(default_factory=list)          # [{'user', 'coach'}]
+    transcripts: list = field(default_factory=list)    # raw ASR output per turn
+    context: ConversationContext = field(default_factory=ConversationContext)
+    complete: bool = False
+    evaluation: str | None = None
+    scores: dict | None = None                         # JudgeResult.to_dict() of the evaluation
+    evaluating: float | None = None                    # when a worker started the final evaluation
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def add_turn(self, transcript: str, coach: str) -> None:
+        self.turns.append({"user": transcript, "coach": coach})
+        self.transcripts.append(transcript)
+        self.context.append(transcript, coach)
+        self.evaluation = None
+        self.scores = None
+        self.updated_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "scenario_id": self.scenario_id,
+            "opening": self.opening,
+            "turns": self.turns,
+            "transcripts": self.transcripts,
+            "context": self.context.to_dict(),
+            "complete": self.complete,
+            "evaluation": self.evaluation,
+            "scores": self.scores,
+            "evaluating": self.evaluating,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Session":
+        data = dict(data)
+        data["context"] = ConversationContext.from_dict(data["context"])
+        return cls(**data)
+
+class SessionStore:
+    """Interface shared by all backends."""
+
+    shared = False   # visible to every worker process (see shared_state.py)
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+
+    def create(self, scenario_id: str = "free", opening: str = "") -> Session:
+        session = Session(id=uuid.uuid4().hex, scenario_id=scenario_id, opening=opening)
+        self.save(session)
+        return session
+
+    def get(self, session_id: str) -> Session | None:
+        raise NotImplementedError
+
+    def save(self, session: Session) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def _expired(self, session: Session, now: float) -> bool:
+        return bool(self.ttl) and now - session.updated_at > self.ttl
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store; idle sessions are evicted after `ttl` seconds."""
+
+    def __init__(self, ttl: float = SESSION_TTL, sweep_interval: float = 60.0):
+        super().__init__(ttl)
+        self._sessions: dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _sweep(self) -> None:
+        if time.monotonic() - self._last_sweep < self._sweep_interval:
+            return
+        now = time.time()
+        for sid in [sid for sid, s in self._sessions.items() if self._expired(s, now)]:
+            del self._sessions[sid]
+        self._last_sweep = time.monotonic()
+
+    def get(self, session_id: str) -> Session | None:
+        with self._lock:
+            self._sweep()
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session, time.time()):
+                del self._sessions[session_id]
+                return None
+            return session
+
+    def save(self, session: Session) -> None:
+        session.updated_at = time.time()
+        with self._lock:
+            self._sweep()
+            self._sessions[session.id] = session
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions persisted as JSON rows in a SQLite file; workers on one box share the file."""
+
+    shared = True
+
+    def __init__(self, path: str = "sessions.db", ttl: float = SESSION_TTL):
+        super().__init__(ttl)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)  # waits out other workers' writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = Session.from_dict(json.loads(row[0]))
+        if self._expired(session, time.time()):
+            self.delete(session_id)
+            return None
+        return session
+
+    def save(self, session: Session) -> None:
+        session.updated_at = time.time()
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                               (session.id, data, session.updated_at))
+            if self.ttl:
+                self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+class RedisSessionStore(SessionStore):
+    """Sessions as JSON strings under `<prefix><id>`; Redis expires them after `ttl` idle seconds."""
+
+    shared = True
+
+    def __init__(self, url: str | None = None, ttl: float = SESSION_TTL, prefix: str = "session:"):
+        super().__init__(ttl)
+        self._redis = redis_client(url)
+        self.prefix = prefix
+
+    def get(self, session_id: str) -> Session | None:
+        data = self._redis.get(self.prefix + session_id)
+        return Session.from_dict(json.loads(data)) if data is not None else None
+
+    def save(self, session: Session) -> None:
+        session.updated_at = time.time()
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        self._redis.set(self.prefix + session.id, data, ex=int(self.ttl) or None)
+
+    def delete(self, session_id: str) -> None:
+        self._redis.delete(self.prefix + session_id)
+
+def make_session_store() -> SessionStore:
+    """Build the store selected by SESSION_STORE (memory by default)."""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB", "sessions.db"))
+    if backend == "redis":
+        return RedisSessionStore(os.getenv("SESSION_REDIS_URL") or None)
+    if backend == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
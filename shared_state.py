@@ -0,0 +1,50 @@
+"""shared_state.py
+State shared by backend worker processes
+----------------------------------------
+With `python serve.py --workers N` every worker is its own process. Any
+request can land on any worker, so state a later request depends on has
+to live outside the process:
+
+- sessions          : SESSION_STORE=sqlite (one file, WAL) or redis
+- transcript cache  : TRANSCRIPT_CACHE_DB=<sqlite path> or redis://...
+- provider limits   : RATE_LIMITS is for the whole deployment; each worker
+                      enforces its 1/N share (rate_governor.per_worker)
+
+Caches that only save work stay per worker: Gemini context caches,
+per-turn judge notes, the model registry, breakers and /metrics. A
+request that lands on another worker rebuilds or skips them and gives
+the same answer.
+
+Redis (or anything that speaks its protocol: Valkey, KeyDB, Dragonfly) is
+optional. `redis` is imported the first time a Redis backend is built.
+
+Env vars:
+  REDIS_URL=redis://localhost:6379/0   WEB_CONCURRENCY=1 (set by serve.py)
+"""
+
+import os
+import threading
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+def redis_client(url: str | None = None):
+    """One client (connection pool) per URL and process; responses are decoded to str."""
+    url = url or REDIS_URL
+    with _clients_lock:
+        if url not in _clients:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError(f"{url} needs the redis package: pip install redis") from e
+            _clients[url] = redis.Redis.from_url(url, decode_responses=True)
+        return _clients[url]
+
+def is_redis_url(value: str | None) -> bool:
+    return bool(value) and value.startswith(("redis://", "rediss://", "unix://"))
+
+def worker_count() -> int:
+    """Number of backend worker processes sharing the box (WEB_CONCURRENCY, as uvicorn/gunicorn read it)."""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1") or 1))
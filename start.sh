@@ -1,5 +1,10 @@
 #!/bin/bash
 
+# ./start.sh          development: one backend process + Vite dev server
+# ./start.sh --prod   production: WEB_CONCURRENCY backend workers (default: one per core)
+#                     on shared session state + the built frontend
+MODE=${1:-dev}
+
 echo "🚀 Starting AI English Coach Application"
 echo "========================================"
 echo ""
@@ -24,11 +29,19 @@ fi
 
 # Start backend
 echo ""
-echo "🔧 Starting Backend (FastAPI)..."
-cd backend
-python main.py &
-BACKEND_PID=$!
-cd ..
+if [ "$MODE" = "--prod" ]; then
+    WORKERS=${WEB_CONCURRENCY:-$(nproc 2>/dev/null || echo 2)}
+    export SESSION_STORE=${SESSION_STORE:-sqlite}
+    echo "🔧 Starting Backend (FastAPI, $WORKERS workers, SESSION_STORE=$SESSION_STORE)..."
+    python serve.py --workers "$WORKERS" &
+    BACKEND_PID=$!
+else
+    echo "🔧 Starting Backend (FastAPI)..."
+    cd backend
+    python main.py &
+    BACKEND_PID=$!
+    cd ..
+fi
 
 # Wait for backend to start
 sleep 3
@@ -37,7 +50,11 @@ sleep 3
 echo ""
 echo "🎨 Starting Frontend (React)..."
 cd frontend
-npm run dev &
+if [ "$MODE" = "--prod" ]; then
+    npm run build && npm run preview -- --port 3000 &
+else
+    npm run dev &
+fi
 FRONTEND_PID=$!
 cd ..
 
@@ -51,6 +68,6 @@ echo ""
 echo "Press Ctrl+C to stop both servers"
 echo "========================================"
 
-# Wait for Ctrl+C
-trap "kill $BACKEND_PID $FRONTEND_PID; exit" INT
+# Wait for Ctrl+C; the backend finishes in-flight turns before exiting (DRAIN_TIMEOUT)
+trap "kill $BACKEND_PID $FRONTEND_PID; wait $BACKEND_PID; exit" INT TERM
 wait
@@ -0,0 +1,197 @@
+"""streaming_asr.py
+Real-time ASR with server-side endpointing
+------------------------------------------
+Audio arrives in small PCM frames while the learner is still speaking.
+An energy VAD with an adaptive noise floor finds the end of each
+utterance (END_SILENCE_MS of quiet after speech). Each finished segment
+goes to ASR straight away, and its text is reported as a partial
+transcript. When the learner stops, only the last segment is still
+waiting on ASR.
+
+Endpointing runs at the client's rate. Each finished segment is
+resampled to 16 kHz in one pass when it is encoded, so the resampler's
+filter never restarts at a frame boundary.
+
+Usage:
+    live = StreamingTranscriber(asr_router.atranscribe, sample_rate=48000, on_partial=send)
+    await live.feed(pcm_bytes)        # int16 little-endian mono, any rate
+    ...
+    transcript = await live.finish()
+
+Env vars:
+  LIVE_END_SILENCE_MS=600   LIVE_MAX_SEGMENT_S=20   LIVE_MAX_INFLIGHT=4
+"""
+
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from audio_preprocess import FRAME_MS, MARGIN_DB, MIN_DB, TARGET_RATE, encode, resample
+
+END_SILENCE_MS = int(os.getenv("LIVE_END_SILENCE_MS", "600"))
+MAX_SEGMENT_S  = float(os.getenv("LIVE_MAX_SEGMENT_S", "20"))
+MAX_INFLIGHT   = int(os.getenv("LIVE_MAX_INFLIGHT", "4"))
+SAMPLE_RATES   = (8000, 48000)   # client rates accepted (inclusive range)
+
+def check_sample_rate(rate) -> int:
+    """A client's sample rate as int Hz; ValueError if it isn't an integer within SAMPLE_RATES."""
+    low, high = SAMPLE_RATES
+    try:
+        value = int(rate)
+        integral = value == float(rate)
+    except (TypeError, ValueError):
+        integral = False
+    if not integral or not low <= value <= high:
+        raise ValueError(f"sample_rate must be an integer from {low} to {high} Hz, got {rate!r}")
+    return value
+
+class Endpointer:
+    """Frame-level energy VAD that cuts a PCM stream into utterances.
+
+    `push()` takes float mono samples at `rate` and returns the segments
+    (int16 arrays) that ended inside them. `flush()` returns whatever speech
+    is still open.
+    """
+
+    def __init__(self, rate: int = TARGET_RATE, end_silence_ms: int = END_SILENCE_MS,
+                 max_segment_s: float = MAX_SEGMENT_S, min_speech_ms: int = 200,
+                 pre_roll_ms: int = 300, floor_db: float = -60.0):
+        self.rate = rate
+        self.frame = rate * FRAME_MS // 1000
+        self.end_frames = max(1, end_silence_ms // FRAME_MS)
+        self.max_frames = int(max_segment_s * 1000 / FRAME_MS)
+        self.min_frames = max(1, min_speech_ms // FRAME_MS)
+        self.pre_roll = max(0, pre_roll_ms // FRAME_MS)
+        self.floor_db = floor_db      # adaptive noise floor (tracks quiet frames)
+        self._pending = np.zeros(0, np.float32)
+        self._frames: list[np.ndarray] = []   # open segment (or pre-roll while idle)
+        self._speech = 0                      # voiced frames in the open segment
+        self._silence = 0                     # trailing quiet frames
+        self.in_speech = False
+
+    def _is_speech(self, frame: np.ndarray) -> bool:
+        db = 20 * np.log10(np.sqrt(np.mean(frame * frame)) + 1e-10)
+        voiced = db > max(MIN_DB, self.floor_db + MARGIN_DB)
+        if not voiced:  # fall fast, rise slowly so speech doesn't lift the floor
+            self.floor_db += (db - self.floor_db) * (0.5 if db < self.floor_db else 0.05)
+        return voiced
+
+    def _close(self) -> np.ndarray | None:
+        frames = self._frames[:len(self._frames) - max(0, self._silence - self.pre_roll)]
+        enough = self._speech >= self.min_frames
+        self._frames, self._speech, self._silence, self.in_speech = [], 0, 0, False
+        if not enough or not frames:
+            return None
+        return (np.clip(np.concatenate(frames), -1.0, 1.0) * 32767).astype("<i2")
+
+    def push(self, samples: np.ndarray) -> list[np.ndarray]:
+        self._pending = np.concatenate([self._pending, samples.astype(np.float32)])
+        n = len(self._pending) // self.frame
+        done = []
+        for i in range(n):
+            frame = self._pending[i * self.frame:(i + 1) * self.frame]
+            voiced = self._is_speech(frame)
+            self._frames.append(frame)
+            if not self.in_speech:
+                if voiced:
+                    self.in_speech, self._speech, self._silence = True, 1, 0
+                else:
+                    del self._frames[:-self.pre_roll or len(self._frames)]
+                continue
+            if voiced:
+                self._speech += 1
+                self._silence = 0
+            else:
+                self._silence += 1
+            if self._silence >= self.end_frames or len(self._frames) >= self.max_frames:
+                segment = self._close()
+                if segment is not None:
+                    done.append(segment)
+        self._pending = self._pending[n * self.frame:]
+        return done
+
+    def flush(self) -> np.ndarray | None:
+        if self.in_speech:
+            self._frames.append(self._pending)
+        self._pending = np.zeros(0, np.float32)
+        return self._close() if self.in_speech else None
+
+class StreamingTranscriber:
+    """One live utterance stream: endpoint, transcribe segments as they close, report partials."""
+
+    def __init__(self, atranscribe_fn, sample_rate: int = TARGET_RATE, language_code: str = "auto",
+                 on_partial=None, max_inflight: int = MAX_INFLIGHT, fmt: str = "wav", **endpointer):
+        self.atranscribe_fn = atranscribe_fn
+        self.sample_rate = sample_rate = check_sample_rate(sample_rate)
+        self.language_code = language_code
+        self.on_partial = on_partial            # async (index, text, transcript_so_far)
+        self.fmt = fmt
+        self.endpointer = Endpointer(sample_rate, **endpointer)
+        self._gate = asyncio.Semaphore(max_inflight)
+        self._tasks: list[asyncio.Task] = []
+        self.texts: list[str | None] = []
+        self.audio_s = 0.0
+        self.stopped_at = None
+        self.tail_s = None                      # stop -> final transcript
+
+    @property
+    def transcript(self) -> str:
+        """Finished segments, in order, up to the first one still in flight."""
+        done = []
+        for text in self.texts:
+            if text is None:
+                break
+            done.append(text)
+        return " ".join(t for t in done if t)
+
+    def _encode(self, pcm: np.ndarray) -> tuple[bytes, str]:
+        """Resample a whole segment to TARGET_RATE (not frame by frame) and encode it."""
+        if self.sample_rate != TARGET_RATE:
+            samples = resample(pcm.astype(np.float32) / 32767, self.sample_rate)
+            pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        return encode(pcm, TARGET_RATE, self.fmt)
+
+    async def _transcribe(self, index: int, pcm: np.ndarray) -> None:
+        async with self._gate:
+            data, mime_type = await asyncio.to_thread(self._encode, pcm)
+            text = (await self.atranscribe_fn(data, self.language_code, mime_type=mime_type)).strip()
+        self.texts[index] = text
+        if self.on_partial is not None:
+            await self.on_partial(index, text, self.transcript)
+
+    def _dispatch(self, segments: list) -> list[int]:
+        indexes = []
+        for pcm in segments:
+            self.texts.append(None)
+            index = len(self.texts) - 1
+            self._tasks.append(asyncio.ensure_future(self._transcribe(index, pcm)))
+            indexes.append(index)
+        return indexes
+
+    async def feed(self, pcm_bytes: bytes) -> list[int]:
+        """Add int16 mono frames; returns indexes of segments that just closed."""
+        if len(pcm_bytes) % 2:
+            raise ValueError("PCM frames must hold whole int16 samples (even byte length)")
+        samples = np.frombuffer(pcm_bytes, "<i2").astype(np.float32) / 32768
+        self.audio_s += len(samples) / self.sample_rate
+        return self._dispatch(self.endpointer.push(samples))
+
+    async def finish(self) -> str:
+        """Close the last segment and wait for every in-flight transcription."""
+        self.stopped_at = time.perf_counter()
+        last = self.endpointer.flush()
+        self._dispatch([last] if last is not None else [])
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+        self.tail_s = time.perf_counter() - self.stopped_at
+        return self.transcript
+
+    async def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
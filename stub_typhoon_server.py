@@ -0,0 +1,78 @@
+"""stub_typhoon_server.py
+Local stand-in for Typhoon's /audio/transcriptions endpoint
+-----------------------------------------------------------
+Used by the benchmark scripts so they run without network or API keys.
+Speaks HTTP/1.1 so keep-alive behaves like the real API.
+
+Faults can be injected while it runs: `server.delay`, `server.status` and
+`server.text` are read on every request, and `server.requests` counts them.
+For load tests, `latency` (a providers.Latency spec) replaces the fixed
+delay with a sampled one, and `error_rate` answers that share of requests
+with a 503. `texts` are returned in turn instead of `text`.
+
+Usage:
+    from stub_typhoon_server import start_stub_typhoon
+    server = start_stub_typhoon(delay=0.3)
+    os.environ["TYPHOON_BASE_URL"] = server.base_url
+    server.status = 503              # outage from the next request on
+    start_stub_typhoon(latency="lognormal:0.4:0.3", error_rate=0.02, seed=1)
+"""
+
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from providers import Latency
+
+DEFAULT_TEXT = "I would like to order a coffee please"
+
+def start_stub_typhoon(delay: float = 0.0, text: str = DEFAULT_TEXT, status: int = 200, latency=None,
+                       error_rate: float = 0.0, texts=None, seed: int | None = None) -> ThreadingHTTPServer:
+    """Start the stub on a free port in a daemon thread; `server.base_url` points at it.
+    Every request waits `delay` seconds (or a `latency` sample), then answers `status`
+    (non-200 -> error body)."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with server.lock:
+                server.requests += 1
+                status = server.status
+                if status == 200 and server.error_rate and server.rng.random() < server.error_rate:
+                    status = 503
+                delay = server.latency.sample(server.rng) if server.latency is not None else server.delay
+                text = next(server.texts) if server.texts is not None else server.text
+            time.sleep(delay)
+            payload = {"text": text} if status == 200 else {"error": {"message": "stub failure"}}
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            try:
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up (timeout / cancelled hedge)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.delay, server.text, server.status, server.requests = delay, text, status, 0
+    server.latency = Latency.parse(latency) if latency is not None else None
+    server.error_rate, server.rng, server.lock = error_rate, random.Random(seed), threading.Lock()
+    server.texts = itertools.cycle(texts) if texts else None
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,263 @@
+"""telemetry.py
+Per-stage timing and Prometheus metrics
+---------------------------------------
+A request records each stage it goes through with `stage()`. Stages cover
+upload read, preprocessing, ASR (per backend), the coach call and so on.
+Every stage lands in a `stage_seconds{stage=...}` histogram. Inside a
+`trace()`, the stages are also collected for that one request, so an
+endpoint can return its own breakdown and slow requests can be logged
+with theirs.
+
+Histograms, counters and callback gauges are rendered in the Prometheus
+text format by `render()`. The backend serves that on /metrics. Nothing
+here needs prometheus_client.
+
+Usage:
+    with trace() as t:
+        with stage("asr"):
+            text = transcribe(audio)
+    t.timings_ms()                     # {"asr": 812.4, "total": 815.0}
+
+    LLM_SECONDS.labels(kind="coach", model="gemini-2.5-flash").observe(1.2)
+
+Env vars:
+  TRACE_SLOW_MS (unset): print the stage breakdown of traces slower than this
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+SIZE_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "0") or 0)
+
+_INF = 'le="+Inf"'
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple, object] = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, child in sorted(self._children.items()):
+            lines.append(f"{self.name}_total{_labels(self.labelnames, key)} {_number(child.value)}")
+        return lines
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for key, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, _INF)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+class CallbackMetric(_Metric):
+    """Values read at scrape time from `fn() -> {label values tuple: number}` (gauges, or
+    counters kept elsewhere such as cache hit counts)."""
+
+    def __init__(self, name: str, help: str, fn, labelnames: tuple = (), type: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        self.type = type
+
+    def render(self) -> list[str]:
+        try:
+            values = self.fn()
+        except Exception as e:  # a broken collector must not break the scrape
+            return [f"# {self.name} collection failed: {_escape(e)}"]
+        suffix = "_total" if self.type == "counter" else ""
+        lines = self._header()
+        for key, value in sorted(values.items()):
+            if value is None:
+                continue
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric  # re-registering (module reload) replaces
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, help: str, labelnames: tuple = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+def callback(name: str, help: str, fn, labelnames: tuple = (), type: str = "gauge") -> CallbackMetric:
+    return REGISTRY.register(CallbackMetric(name, help, fn, labelnames, type))
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    return REGISTRY.render()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------- Shared metrics ----------
+STAGE_SECONDS = histogram("stage_seconds", "Time spent per request stage", ("stage",))
+ASR_SECONDS = histogram("asr_backend_seconds", "ASR call latency by backend and outcome", ("backend", "outcome"))
+LLM_SECONDS = histogram("llm_seconds", "Gemini call latency by prompt kind", ("kind", "model", "outcome"))
+LLM_PROMPT_TOKENS = histogram("llm_prompt_tokens", "Prompt size per Gemini call (tokens)", ("kind",), SIZE_BUCKETS)
+LLM_RESPONSE_TOKENS = histogram("llm_response_tokens", "Response size per Gemini call (tokens)", ("kind",), SIZE_BUCKETS)
+LLM_CACHED_TOKENS = histogram("llm_cached_prompt_tokens", "Prompt tokens served from a context cache", ("kind",),
+                              SIZE_BUCKETS)
+
+# ---------- Per-request traces ----------
+class Trace:
+    """Stages recorded while this trace is active (in order; repeated stages add up)."""
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self.start = time.perf_counter()
+        self.stages: list[tuple[str, float]] = []
+        self.total = None
+
+    def timings_ms(self) -> dict:
+        """{stage: ms} plus "total" (elapsed so far while the trace is still open)."""
+        out: dict[str, float] = {}
+        for name, seconds in self.stages:
+            out[name] = round(out.get(name, 0.0) + seconds * 1000, 1)
+        total = self.total if self.total is not None else time.perf_counter() - self.start
+        out["total"] = round(total * 1000, 1)
+        return out
+
+_trace: ContextVar[Trace | None] = ContextVar("telemetry_trace", default=None)
+
+@contextmanager
+def trace(name: str = "request"):
+    """Collect the stages run inside (including tasks/threads started from here)."""
+    t = Trace(name)
+    token = _trace.set(t)
+    try:
+        yield t
+    finally:
+        try:
+            _trace.reset(token)
+        except ValueError:  # an async generator finalized outside the context that opened it
+            pass
+        t.total = time.perf_counter() - t.start
+        STAGE_SECONDS.observe(t.total, stage=f"{name}.total")
+        if TRACE_SLOW_MS and t.total * 1000 > TRACE_SLOW_MS:
+            print(f"Slow {name}: {t.timings_ms()}")
+
+def current() -> Trace | None:
+    return _trace.get()
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+    t = _trace.get()
+    if t is not None:
+        t.stages.append((name, seconds))
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage `name` (histogram + current trace)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
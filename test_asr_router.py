@@ -0,0 +1,168 @@
+"""
+Hedged ASR Router Tests (offline)
+---------------------------------
+Runs HedgedASRRouter against local stub Typhoon servers that are fast,
+slow (hung) or failing. No API keys or network needed.
+
+Usage:
+    python -m pytest test_asr_router.py
+    python test_asr_router.py
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+import requests
+
+from asr_router import ASRBackend, HedgedASRRouter
+from rate_governor import LIVE, current_priority, priority
+from stub_typhoon_server import start_stub_typhoon
+from telemetry import stage, trace
+
+def stub_backend(name: str, **stub_kwargs) -> ASRBackend:
+    server = start_stub_typhoon(**stub_kwargs)
+    url = f"{server.base_url}/audio/transcriptions"
+
+    def call(audio_bytes, language_code):
+        resp = requests.post(url, files={"file": ("a.wav", audio_bytes, "audio/wav")}, timeout=30)
+        resp.raise_for_status()
+        return resp.json()["text"]
+
+    async def acall(audio_bytes, language_code):
+        async with httpx.AsyncClient(timeout=30) as client:
+            resp = await client.post(url, files={"file": ("a.wav", audio_bytes, "audio/wav")})
+            resp.raise_for_status()
+            return resp.json()["text"]
+
+    return ASRBackend(name, call, acall)
+
+def test_fast_primary_wins_without_hedge():
+    router = HedgedASRRouter([stub_backend("primary", text="one"),
+                              stub_backend("backup", text="two")], hedge_delay=1.0)
+    assert router.transcribe(b"audio") == "one"
+    assert router.hedges == 0
+
+def test_hung_primary_is_hedged():
+    router = HedgedASRRouter([stub_backend("primary", delay=5, text="slow"),
+                              stub_backend("backup", delay=0.05, text="fast")], hedge_delay=0.2)
+    start = time.perf_counter()
+    assert router.transcribe(b"audio") == "fast"
+    assert time.perf_counter() - start < 1.0
+    assert router.hedges == 1 and router.wins["backup"] == 1
+
+def test_hung_losers_drain_from_pool():
+    hung, timeouts = threading.Event(), []
+
+    def hang(audio_bytes, language_code, timeout=None):
+        timeouts.append(timeout)
+        hung.wait(timeout)   # never set: only the attempt timeout ends the call
+        raise TimeoutError("read timed out")
+
+    router = HedgedASRRouter([ASRBackend("primary", hang, attempt_timeout=0.3),
+                              ASRBackend("backup", lambda audio_bytes, language_code: "fast")],
+                             hedge_delay=0.05, max_workers=2)
+    assert router.transcribe(b"audio") == "fast"
+    assert router.stats()["pool"] == {"workers": 2, "busy": 1, "abandoned": 1}
+    # with 2 threads, an unbounded loser per call would leave no thread for the next hedge
+    start = time.perf_counter()
+    assert [router.transcribe(b"audio") for _ in range(4)] == ["fast"] * 4
+    assert time.perf_counter() - start < 3.0
+    time.sleep(0.5)
+    assert router.stats()["pool"]["busy"] == 0
+    assert timeouts and set(timeouts) == {0.3}
+
+def test_typhoon_timeout_bounds_retries():
+    from model_service import TyphoonClient
+
+    hung = start_stub_typhoon(delay=5)
+    client = TyphoonClient(base_url=hung.base_url, api_key="test", read_timeout=60)
+    start = time.perf_counter()
+    with pytest.raises(requests.Timeout):
+        client.transcribe(b"audio", timeout=0.3)
+    assert time.perf_counter() - start < 1.5
+    busy = start_stub_typhoon(status=503)
+    client = TyphoonClient(base_url=busy.base_url, api_key="test", max_retries=5, backoff_base=1.0)
+    start = time.perf_counter()
+    with pytest.raises(requests.HTTPError):
+        client.transcribe(b"audio", timeout=0.5)   # no backoff that would outlast the budget
+    assert time.perf_counter() - start < 1.5
+
+def test_sync_calls_keep_caller_priority_and_trace():
+    seen = []
+
+    def slow(audio_bytes, language_code):
+        with stage("asr.slow"):
+            seen.append(current_priority())
+            time.sleep(0.2)
+        return "slow"
+
+    def fast(audio_bytes, language_code):
+        with stage("asr.fast"):
+            seen.append(current_priority())
+        return "fast"
+
+    router = HedgedASRRouter([ASRBackend("primary", slow), ASRBackend("backup", fast)], hedge_delay=0.05)
+    with priority(LIVE), trace("unit") as t:
+        assert router.transcribe(b"audio") == "fast"
+    time.sleep(0.3)
+    assert seen == [LIVE, LIVE] and {"asr.slow", "asr.fast"} <= set(t.timings_ms())
+
+def test_failing_primary_falls_back_before_hedge_delay():
+    router = HedgedASRRouter([stub_backend("primary", status=500),
+                              stub_backend("backup", text="ok")], hedge_delay=5.0)
+    start = time.perf_counter()
+    assert router.transcribe(b"audio") == "ok"
+    assert time.perf_counter() - start < 1.0
+    assert router.hedges == 0
+
+def test_all_backends_failing_raises():
+    router = HedgedASRRouter([stub_backend("primary", status=503),
+                              stub_backend("backup", status=500)], hedge_delay=0.1)
+    with pytest.raises(RuntimeError, match="All ASR backends failed"):
+        router.transcribe(b"audio")
+
+def test_async_hedge_cancels_loser():
+    router = HedgedASRRouter([stub_backend("primary", delay=5, text="slow"),
+                              stub_backend("backup", delay=0.05, text="fast")], hedge_delay=0.2)
+
+    async def run():
+        start = time.perf_counter()
+        text = await router.atranscribe(b"audio")
+        return text, time.perf_counter() - start
+
+    text, elapsed = asyncio.run(run())
+    assert text == "fast" and elapsed < 1.0
+    # the cancelled primary is not counted as a failure
+    assert router.backends[0].stats.error_rate == 0.0
+
+def test_error_prone_backend_is_demoted():
+    primary, backup = stub_backend("primary", status=500), stub_backend("backup", text="ok")
+    router = HedgedASRRouter([primary, backup], hedge_delay=1.0, min_samples=3)
+    for _ in range(4):
+        router.transcribe(b"audio")
+    assert router.ranked()[0] is backup
+
+def test_untried_backup_does_not_overtake_healthy_primary():
+    primary, backup = stub_backend("primary", text="one"), stub_backend("backup", text="two")
+    router = HedgedASRRouter([primary, backup], min_samples=3)
+    for _ in range(4):
+        router.transcribe(b"audio")
+    assert len(backup.stats) == 0
+    assert router.ranked()[0] is primary
+
+def test_p95_drives_hedge_delay():
+    backend = stub_backend("primary", delay=0.05)
+    router = HedgedASRRouter([backend], min_samples=3, min_delay=0.01)
+    assert router.delay_for(backend) == router.default_delay
+    for _ in range(5):
+        router.transcribe(b"audio")
+    assert 0.04 < router.delay_for(backend) < 1.0
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
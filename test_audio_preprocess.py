@@ -0,0 +1,79 @@
+"""
+Audio Preprocessing Tests (offline)
+-----------------------------------
+Checks decode / downmix / resample / VAD trim / encode on synthetic WAVs.
+
+Usage:
+    python -m pytest test_audio_preprocess.py
+    python test_audio_preprocess.py
+"""
+
+import io
+import wave
+
+import numpy as np
+
+import audio_preprocess
+from audio_preprocess import TARGET_RATE, preprocess
+
+def make_wav(signal: np.ndarray, rate: int, channels: int = 1, width: int = 2) -> bytes:
+    frames = np.repeat(signal[:, None], channels, axis=1)
+    if width == 1:
+        raw = (frames * 127 + 128).astype(np.uint8).tobytes()
+    else:
+        raw = (frames * 32767).astype("<i2").tobytes()
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(raw)
+    return buf.getvalue()
+
+def tone(seconds: float, rate: int, freq: float = 300.0, amp: float = 0.3) -> np.ndarray:
+    return amp * np.sin(2 * np.pi * freq * np.arange(int(seconds * rate)) / rate)
+
+def test_stereo_48k_becomes_16k_mono_wav():
+    audio = make_wav(tone(2.0, 48000), 48000, channels=2)
+    p = preprocess(audio, fmt="wav", trim=False)
+    with wave.open(io.BytesIO(p.data)) as w:
+        assert (w.getnchannels(), w.getframerate(), w.getsampwidth()) == (1, TARGET_RATE, 2)
+    assert abs(p.duration_s - 2.0) < 0.01
+    assert len(p.data) < len(audio) / 5
+    assert set(p.stage_ms) == {"decode", "downmix", "resample", "vad", "encode"}
+
+def test_resample_keeps_tone_amplitude():
+    out = audio_preprocess.resample(tone(1.0, 44100).astype(np.float32), 44100)
+    assert len(out) == TARGET_RATE
+    assert abs(np.abs(out[1000:-1000]).max() - 0.3) < 0.02
+
+def test_leading_and_trailing_silence_trimmed():
+    rate = 16000
+    quiet = np.random.default_rng(0).normal(0, 0.001, rate)
+    p = preprocess(make_wav(np.concatenate([quiet, tone(1.0, rate), quiet]), rate), fmt="wav")
+    pad = audio_preprocess.PAD_MS / 1000
+    assert abs(p.duration_s - (1.0 + 2 * pad)) < 0.05
+    assert abs(p.trimmed_s - (2.0 - 2 * pad)) < 0.05
+
+def test_all_silent_clip_kept_whole():
+    p = preprocess(make_wav(np.zeros(16000), 16000), fmt="wav")
+    assert abs(p.duration_s - 1.0) < 0.01
+
+def test_8bit_input_decodes():
+    p = preprocess(make_wav(tone(0.5, 8000), 8000, width=1), fmt="wav", trim=False)
+    assert abs(p.duration_s - 0.5) < 0.01
+
+def test_undecodable_input_passes_through():
+    blob = b"\x1aE\xdf\xa3 not a wav"  # e.g. webm without pydub/ffmpeg
+    p = preprocess(blob)
+    assert p.data == blob and p.pcm is None
+
+def test_missing_encoder_falls_back_to_wav():
+    p = preprocess(make_wav(tone(0.5, 16000), 16000), fmt="no-such-codec")
+    assert p.mime_type == "audio/wav" and p.filename == "audio.wav"
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,92 @@
+"""
+Batch Evaluation Tests (offline)
+--------------------------------
+Usage:
+    python -m pytest test_batch_eval.py
+    python test_batch_eval.py
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+
+from batch_eval import BatchEvaluator, completed_ids, load_sessions
+from judge_result import validate
+
+def fake_result(history) -> object:
+    band = min(9, len(history) + 4)
+    return validate({**{c: {"score": band, "justification": "ok"}
+                        for c in ("pronunciation", "vocabulary", "grammar", "fluency_coherence")},
+                     "overall_band": band, "strengths": ["s"], "weaknesses": ["w"], "examples": []})
+
+def write_archive(root: str, n: int = 6) -> str:
+    os.makedirs(os.path.join(root, "audio_session"))
+    for i in (2, 1):
+        with open(os.path.join(root, "audio_session", f"turn{i}.wav"), "wb") as f:
+            f.write(f"audio {i}".encode())
+    path = os.path.join(root, "sessions.jsonl")
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps({"id": f"s{i}", "turns": [{"user": "hello", "coach": "hi"}, "more text"]}) + "\n")
+        f.write(json.dumps({"id": "broken", "turns": []}) + "\n")
+    return root
+
+def test_directory_and_jsonl_loading():
+    with tempfile.TemporaryDirectory() as root:
+        sessions = {s.id: s for s in load_sessions(write_archive(root))}
+        assert len(sessions) == 8
+        audio = sessions["audio_session"]
+        assert audio.audio_turns == 2 and audio.turns[0]["audio"].endswith("turn1.wav")
+        assert sessions["s0"].turns[1] == "more text"
+
+def test_bounded_concurrency_sink_and_resume():
+    inflight, peak, calls = 0, 0, []
+
+    async def judge(history):
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.05)
+        inflight -= 1
+        calls.append(len(history))
+        return fake_result(history)
+
+    async def asr(audio_bytes, language_code):
+        return audio_bytes.decode()
+
+    with tempfile.TemporaryDirectory() as root:
+        sessions = load_sessions(write_archive(root))
+        out = os.path.join(root, "results.jsonl")
+        report = asyncio.run(BatchEvaluator(asr, judge, concurrency=3).run(sessions, out))
+        assert peak == 3 and report["ok"] == 7 and report["error"] == 1
+        rows = {r["id"]: r for r in map(json.loads, open(out))}
+        assert rows["audio_session"]["transcripts"] == ["audio 1", "audio 2"]
+        assert rows["s0"]["scores"]["overall_band"] == 6 and "session has no turns" in rows["broken"]["error"]
+        assert completed_ids(out) == set(rows) - {"broken"}
+
+        calls.clear()
+        report = asyncio.run(BatchEvaluator(asr, judge, concurrency=3).run(sessions, out))
+        assert report["skipped"] == 7 and report["sessions"] == 1 and calls == []  # only the failed one retried
+
+def test_judge_errors_do_not_stop_the_batch():
+    async def judge(history):
+        if history[0]["user"] == "bad":
+            raise RuntimeError("quota exceeded")
+        return fake_result(history)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "in.jsonl")
+        with open(path, "w") as f:
+            for text in ("good", "bad", "good"):
+                f.write(json.dumps({"turns": [text]}) + "\n")
+        out = os.path.join(root, "out.jsonl")
+        report = asyncio.run(BatchEvaluator(None, judge).run(load_sessions(path), out))
+        assert (report["ok"], report["error"]) == (2, 1)
+        assert report["sessions_per_min"] > 0 and report["latency_ms"]["p50"] is not None
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,111 @@
+"""
+Chunked ASR Tests (offline)
+---------------------------
+Usage:
+    python -m pytest test_chunked_asr.py
+    python test_chunked_asr.py
+"""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from chunked_asr import atranscribe_chunked, plan_segments, stitch, transcribe_chunked
+from rate_governor import BATCH, current_priority, priority
+from telemetry import stage, trace
+
+RATE = 16000
+
+def speech_with_pauses(phrases: int = 12, phrase_s: float = 9.0, pause_s: float = 0.6) -> tuple[np.ndarray, list]:
+    """int16 PCM of tone 'phrases' separated by near-silent pauses; returns pause centres (samples)."""
+    rng = np.random.default_rng(0)
+    parts, pauses, pos = [], [], 0
+    for i in range(phrases):
+        t = np.arange(int(phrase_s * RATE)) / RATE
+        parts.append(0.3 * np.sin(2 * np.pi * 200 * t))
+        pos += len(parts[-1])
+        if i < phrases - 1:
+            parts.append(rng.normal(0, 0.001, int(pause_s * RATE)))
+            pauses.append(pos + len(parts[-1]) // 2)
+            pos += len(parts[-1])
+    return (np.concatenate(parts) * 32767).astype("<i2"), pauses
+
+def test_short_clip_is_one_segment():
+    pcm, _ = speech_with_pauses(phrases=2)
+    assert plan_segments(pcm, RATE, chunk_s=20) == [(0, len(pcm))]
+
+def test_cuts_land_in_pauses_and_segments_overlap():
+    pcm, pauses = speech_with_pauses()
+    segments = plan_segments(pcm, RATE, chunk_s=20, overlap_s=1.0)
+    assert len(segments) >= 4
+    assert segments[0][0] == 0 and segments[-1][1] == len(pcm)
+    for (a0, a1), (b0, b1) in zip(segments, segments[1:]):
+        cut = (a1 + b0) // 2
+        assert a1 - b0 == 2 * RATE  # 1 s of overlap each side of the cut
+        assert min(abs(cut - p) for p in pauses) < 0.3 * RATE
+
+def test_stitch_removes_overlap_words():
+    assert stitch(["I went to the market", "the Market and bought rice."]) == \
+        "I went to the market and bought rice."
+    assert stitch(["no overlap here", "next part"]) == "no overlap here next part"
+    assert stitch(["", "only", ""]) == "only"
+
+def test_stitch_character_overlap_for_unspaced_scripts():
+    assert stitch(["สวัสดีครับผมชื่อ", "ผมชื่อสมชาย"]) == "สวัสดีครับผมชื่อสมชาย"
+
+def test_segments_run_in_parallel_and_stitch_in_order():
+    pcm, _ = speech_with_pauses()
+    calls, lock, active, peak = [], threading.Lock(), [0], [0]
+
+    def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        with lock:
+            calls.append(mime_type)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        return f"part{len(audio_bytes)}"
+
+    start = time.perf_counter()
+    text = transcribe_chunked(pcm, RATE, fake_asr, max_workers=3, chunk_s=20)
+    elapsed = time.perf_counter() - start
+    n = len(plan_segments(pcm, RATE, chunk_s=20))
+    assert len(calls) == n and peak[0] == 3
+    assert elapsed < 0.2 * n  # not serial
+    assert text.count("part") == n
+
+def test_segments_keep_caller_priority_and_trace():
+    pcm, _ = speech_with_pauses()
+    seen = []
+
+    def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        with stage("asr.segment"):
+            seen.append(current_priority())
+        return "part"
+
+    with priority(BATCH), trace("unit") as t:
+        transcribe_chunked(pcm, RATE, fake_asr, max_workers=3, chunk_s=20)
+    assert seen == [BATCH] * len(plan_segments(pcm, RATE, chunk_s=20)) and "asr.segment" in t.timings_ms()
+
+def test_async_respects_worker_bound():
+    pcm, _ = speech_with_pauses()
+    active, peak = [0], [0]
+
+    async def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.05)
+        active[0] -= 1
+        return "word"
+
+    text = asyncio.run(atranscribe_chunked(pcm, RATE, fake_asr, max_workers=2, chunk_s=20))
+    assert peak[0] == 2 and text == "word"  # identical texts collapse across seams
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
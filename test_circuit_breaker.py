@@ -0,0 +1,152 @@
+"""
+Circuit Breaker Tests (offline)
+-------------------------------
+Unit tests for the breaker state machine, plus the ASR router against
+fault-injecting local stub Typhoon servers (outage, hang, recovery).
+
+Usage:
+    python -m pytest test_circuit_breaker.py
+    python test_circuit_breaker.py
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+
+from asr_router import ASRBackend, HedgedASRRouter
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from stub_typhoon_server import start_stub_typhoon
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def fail(breaker: CircuitBreaker, n: int = 1) -> None:
+    for _ in range(n):
+        assert breaker.allow()
+        breaker.record(False, error=RuntimeError("boom"))
+
+def test_opens_on_failure_rate_and_recovers_through_a_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("t", failure_rate=0.5, min_calls=4, open_s=10, clock=clock)
+    breaker.allow(); breaker.record(True)
+    fail(breaker, 2)
+    assert breaker.state == CLOSED  # 2/3 failed, but fewer than min_calls
+    fail(breaker)
+    assert breaker.state == OPEN and not breaker.available and not breaker.allow()
+
+    clock.now = 10
+    assert breaker.available and breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record(True)
+    assert breaker.state == CLOSED and breaker.snapshot()["window_calls"] == 0
+
+def test_failed_probe_backs_off():
+    clock = FakeClock()
+    breaker = CircuitBreaker("t", min_calls=1, open_s=10, clock=clock)
+    fail(breaker)
+    clock.now = 10
+    fail(breaker)  # the probe
+    assert breaker.state == OPEN and breaker.snapshot()["retry_in_s"] == 20
+    clock.now = 25
+    assert not breaker.allow()
+    clock.now = 30
+    assert breaker.allow()
+
+def test_slow_calls_count_as_failures_and_abandoned_probes_free_the_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker("t", min_calls=2, slow_call_s=1.0, clock=clock)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record(True, seconds=5.0)
+    assert breaker.state == OPEN and "slow call" in breaker.last_error
+    clock.now = 30
+    assert breaker.allow()
+    breaker.abandon()  # probe lost a hedge race
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+def test_guard():
+    breaker = CircuitBreaker("t", min_calls=1)
+    with pytest.raises(ValueError):
+        with breaker.guard():
+            raise ValueError("bad")
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pass
+
+def stub_backend(name: str, server, timeout: float = 5.0, **breaker) -> ASRBackend:
+    url = f"{server.base_url}/audio/transcriptions"
+
+    def call(audio_bytes, language_code):
+        resp = requests.post(url, files={"file": ("a.wav", audio_bytes, "audio/wav")}, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()["text"]
+
+    async def acall(audio_bytes, language_code):
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            resp = await client.post(url, files={"file": ("a.wav", audio_bytes, "audio/wav")})
+            resp.raise_for_status()
+            return resp.json()["text"]
+
+    return ASRBackend(name, call, acall, breaker=CircuitBreaker(name, **breaker))
+
+def test_outage_trips_breaker_and_asr_skips_straight_to_fallback():
+    typhoon_stub, gemini_stub = start_stub_typhoon(status=503), start_stub_typhoon(text="backup")
+    typhoon = stub_backend("Typhoon", typhoon_stub, min_calls=3, open_s=0.3)
+    router = HedgedASRRouter([typhoon, stub_backend("Gemini", gemini_stub)], hedge=False)
+
+    for _ in range(3):
+        assert router.transcribe(b"x") == "backup"
+    assert typhoon.breaker.state == OPEN and typhoon_stub.requests == 3
+    assert router.stats()["order"] == ["Gemini", "Typhoon"]
+
+    for _ in range(5):
+        assert router.transcribe(b"x") == "backup"
+    assert typhoon_stub.requests == 3  # no traffic while open
+
+    typhoon_stub.status = 200  # Typhoon comes back
+    time.sleep(0.35)
+    assert router.stats()["order"][0] == "Typhoon"
+    assert router.transcribe(b"x") != "backup"  # the probe goes first and succeeds
+    assert typhoon.breaker.state == CLOSED and typhoon_stub.requests == 4
+    assert router.stats()["backends"]["Typhoon"]["error_rate"] == 0  # outage window forgotten
+
+def test_hung_primary_stops_costing_a_timeout_per_call():
+    typhoon_stub, gemini_stub = start_stub_typhoon(delay=2.0), start_stub_typhoon(text="backup")
+    typhoon = stub_backend("Typhoon", typhoon_stub, timeout=0.2, min_calls=2)
+    router = HedgedASRRouter([typhoon, stub_backend("Gemini", gemini_stub)], hedge=False)
+
+    async def run():
+        waits = []
+        for _ in range(4):
+            start = time.perf_counter()
+            assert await router.atranscribe(b"x") == "backup"
+            waits.append(time.perf_counter() - start)
+        return waits
+
+    waits = asyncio.run(run())
+    assert min(waits[:2]) >= 0.2  # each waited for the read timeout
+    assert max(waits[2:]) < 0.15  # breaker open: straight to the backup
+    assert typhoon_stub.requests == 2 and typhoon.breaker.state == OPEN
+
+def test_all_open_fails_fast():
+    stub = start_stub_typhoon(status=500)
+    router = HedgedASRRouter([stub_backend("A", stub, min_calls=1), stub_backend("B", stub, min_calls=1)])
+    with pytest.raises(RuntimeError):
+        router.transcribe(b"x")
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="circuit is open"):
+        router.transcribe(b"x")
+    assert time.perf_counter() - start < 0.1
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,171 @@
+"""
+Context Cache Tests (offline)
+-----------------------------
+The per-session cache manager with fake create/delete/touch functions run
+inline (no Gemini calls): when caches are built, extended, refreshed,
+expired and deleted, and how many turns a coach call still has to send.
+Then the coach request model_service builds before and after a session is
+cached (stub Gemini).
+
+Usage:
+    python -m pytest test_context_cache.py
+    python test_context_cache.py
+"""
+
+from context_cache import ContextCacheManager, turns_tokens
+from conversation_context import ConversationContext
+
+SYSTEM = "You are a friendly English conversation partner."
+TURN = ("I went to the market yesterday and bought some vegetables for dinner. " * 3,
+        "That sounds lovely! What did you cook with them? " * 2)   # ~80 tokens per turn
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeGemini:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.created, self.deleted, self.touched = [], [], []
+
+    def create(self, system_prompt, turns, ttl_s):
+        if self.fail:
+            raise RuntimeError("400 cached content is too small")
+        handle = f"cache-{len(self.created)}:{len(turns)}"
+        self.created.append(handle)
+        return handle
+
+    def manager(self, clock=None, **kwargs) -> ContextCacheManager:
+        options = dict(min_tokens=350, extend_tokens=300, max_tokens=4000, ttl_s=600)
+        options.update(kwargs)
+        return ContextCacheManager(self.create, self.deleted.append, lambda h, ttl: self.touched.append(h),
+                                   run=lambda fn, *args: fn(*args), clock=clock or FakeClock(), **options)
+
+def run_session(manager, n_turns, session_id="s1"):
+    """Simulate a session: lookup before each coach call, then append the turn. Returns prefixes."""
+    turns, prefixes = [], []
+    for _ in range(n_turns):
+        prefixes.append(manager.lookup(session_id, SYSTEM, turns))
+        turns.append(TURN)
+    return turns, prefixes
+
+def test_no_cache_below_min_tokens():
+    gemini = FakeGemini()
+    manager = gemini.manager()
+    _, prefixes = run_session(manager, 4)   # < 350 tokens of history
+    assert gemini.created == []
+    assert all(p.handle is None and p.turns == 0 for p in prefixes)
+    assert manager.stats()["misses"] == 4
+
+def test_cache_created_then_used_next_turn():
+    gemini = FakeGemini()
+    manager = gemini.manager()
+    turns, prefixes = run_session(manager, 7)
+    assert gemini.created[0] == "cache-0:5"          # built once the prefix reached min_tokens
+    assert prefixes[5].handle is None                 # the call that triggered the build wasn't delayed
+    assert prefixes[6].handle == "cache-0:5" and prefixes[6].turns == 5
+
+def test_uncached_suffix_stays_bounded():
+    gemini = FakeGemini()
+    manager = gemini.manager()
+    turns, prefixes = run_session(manager, 40)
+    uncached = [turns_tokens(turns[p.turns:i]) for i, p in enumerate(prefixes)]
+    assert max(uncached[10:]) <= 300 + turns_tokens([TURN])   # extend_tokens + one turn
+    assert len(gemini.created) > 3
+    assert gemini.deleted == gemini.created[:-1]              # each extension deletes the old cache
+
+def test_ttl_refresh_and_expiry():
+    clock = FakeClock()
+    gemini = FakeGemini()
+    manager = gemini.manager(clock=clock)
+    turns, _ = run_session(manager, 6)
+    assert manager.lookup("s1", SYSTEM, turns).handle == "cache-0:5"
+    clock.now = 400                                    # past half the TTL: refreshed on use
+    assert manager.lookup("s1", SYSTEM, turns).handle == "cache-0:5"
+    assert gemini.touched == ["cache-0:5"]
+    clock.now = 1200                                   # idle past the TTL: gone server-side
+    prefix = manager.lookup("s1", SYSTEM, turns)
+    assert prefix.handle is None and prefix.turns == 0
+    assert gemini.created[-1] == "cache-1:6"           # rebuilt in the background
+
+def test_invalidate_ignores_replaced_handle():
+    gemini = FakeGemini()
+    manager = gemini.manager()
+    turns, _ = run_session(manager, 12)
+    old, current = gemini.created[-2], gemini.created[-1]
+    manager.invalidate("s1", old)                      # a 404 from a cache already replaced
+    assert manager.lookup("s1", SYSTEM, turns).handle == current
+    manager.invalidate("s1", current)
+    assert manager.lookup("s1", SYSTEM, turns).handle is None
+
+def test_failed_build_backs_off():
+    gemini = FakeGemini(fail=True)
+    manager = gemini.manager()
+    run_session(manager, 8)
+    assert manager.stats()["failures"] == 1            # not retried until the prefix grows by extend_tokens
+
+def test_release_eviction_and_close_delete_caches():
+    gemini = FakeGemini()
+    manager = gemini.manager(max_sessions=2)
+    for sid in ("a", "b"):
+        run_session(manager, 7, sid)
+    manager.release("a")
+    assert gemini.deleted == ["cache-0:5"]
+    run_session(manager, 7, "c")
+    run_session(manager, 1, "d")                       # evicts "b"
+    assert "cache-1:5" in gemini.deleted
+    manager.close()
+    assert set(gemini.created) == set(gemini.deleted)
+
+def test_too_long_or_changed_prompt_drops_cache():
+    gemini = FakeGemini()
+    manager = gemini.manager(max_tokens=1000)
+    turns, _ = run_session(manager, 7)
+    assert manager.lookup("s1", "another scenario", turns).handle is None
+    assert gemini.deleted == ["cache-0:5"]
+    assert manager.lookup("s1", SYSTEM, turns * 2) is None   # past max_tokens: rolling-summary prompt
+
+def test_conversation_context_keeps_transcript():
+    ctx = ConversationContext(max_verbatim=2)
+    for i in range(5):
+        ctx.append(f"user {i}", f"coach {i}")
+    assert ctx.transcript() == [(f"user {i}", f"coach {i}") for i in range(5)]
+    restored = ConversationContext.from_dict(ctx.to_dict())
+    assert restored.transcript() == ctx.transcript()
+    legacy = ctx.to_dict()
+    del legacy["coach_turns"]
+    assert ConversationContext.from_dict(legacy).transcript() is None
+
+def test_coach_request_sends_summary_until_cached():
+    import model_service
+    from providers import StubGemini
+
+    model_service.use_stubs(StubGemini(latency=0))
+    saved, builds = model_service.context_caches, []
+    model_service.context_caches = ContextCacheManager(
+        model_service._create_coach_cache, lambda cache: None, run=lambda fn, *args: builds.append((fn, args)),
+        min_tokens=350, extend_tokens=300, max_tokens=4000)
+    try:
+        short = [{"user": TURN[0], "coach": TURN[1]}]
+        request, _ = model_service._coach_request("Hi", short, session_id="s1")
+        assert isinstance(request["user_prompt"], list)           # below min_tokens: verbatim is cheap
+        long = short * 8
+        request, prefix = model_service._coach_request("Hi", long, session_id="s1")
+        assert isinstance(request["user_prompt"], str) and prefix is None   # build pending: summary prompt
+        assert len(builds) == 1
+        fn, args = builds.pop()
+        fn(*args)
+        request, prefix = model_service._coach_request("Hi", long + short, session_id="s1")
+        assert prefix.turns == 8 and request["model"] is not None
+        assert len(request["user_prompt"]) == 3                   # the uncached turn + the new message
+    finally:
+        model_service.context_caches = saved
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,96 @@
+"""
+Incremental Judge Tests (offline)
+---------------------------------
+Usage:
+    python -m pytest test_incremental_judge.py
+    python test_incremental_judge.py
+"""
+
+import asyncio
+import time
+
+from incremental_judge import IncrementalJudge, turn_features
+
+def test_turn_features():
+    f = turn_features("Um, I like reading. I read, like, every day!")
+    assert f["words"] == 9 and f["sentences"] == 2
+    assert f["fillers"] == 2  # um + ", like,"; "I like reading" is the verb
+    assert f["unique_words"] == 7
+
+def test_turns_are_judged_in_background():
+    def slow_judge(text, turn):
+        time.sleep(0.2)
+        return f"notes {turn}"
+
+    judge = IncrementalJudge(slow_judge)
+    start = time.perf_counter()
+    for turn in range(1, 5):
+        judge.submit(turn, f"answer {turn}")
+    assert time.perf_counter() - start < 0.1  # submit doesn't block
+    assert judge.covers(4) and not judge.covers(5)
+    assessments = judge.assessments(4)
+    assert [a.notes for a in assessments] == ["notes 1", "notes 2", "notes 3", "notes 4"]
+    assert time.perf_counter() - start < 0.5  # ran concurrently
+
+def test_failed_turn_is_kept_with_error():
+    def flaky(text, turn):
+        if turn == 2:
+            raise RuntimeError("quota")
+        return "ok"
+
+    judge = IncrementalJudge(flaky)
+    judge.submit(1, "a")
+    judge.submit(2, "b")
+    first, second = judge.assessments(2)
+    assert first.notes == "ok" and second.notes is None and "quota" in second.error
+
+def test_async_submissions():
+    async def ajudge(text, turn):
+        await asyncio.sleep(0.05)
+        return text.upper()
+
+    async def run():
+        judge = IncrementalJudge(None, ajudge)
+        judge.asubmit(1, "hello")
+        judge.asubmit(1, "hello")          # same turn, same transcript: already submitted
+        judge.asubmit(2, "world")
+        return await judge.aassessments(2)
+
+    assert [a.notes for a in asyncio.run(run())] == ["HELLO", "WORLD"]
+
+def test_rerecorded_turn_replaces_stale_assessment():
+    calls = []
+
+    def judge_turn(text, turn):
+        calls.append(text)
+        return f"notes on {text}"
+
+    judge = IncrementalJudge(judge_turn)
+    judge.submit(1, "I want a table")
+    judge.submit(2, "uh the coach call failed")   # never saved
+    judge.submit(3, "stale follow-up")
+    judge.submit(2, "For two people, please")     # the learner re-records turn 2
+    saved = ["I want a table", "For two people, please"]
+    assert not judge.covers(3) and judge.covers(2, saved)
+    assert not judge.covers(2, ["I want a table", "uh the coach call failed"])
+    assert [a.transcript for a in judge.assessments(2)] == saved
+    assert "For two people, please" in calls
+
+def test_aggregate_prompt_uses_saved_transcripts():
+    import model_service
+    from conversation_context import ConversationContext
+
+    judge = IncrementalJudge(lambda text, turn: "ok")
+    judge.submit(1, "something the learner never saved")
+    context = ConversationContext()
+    context.append("I would like a coffee", "Sure!")
+    assert not judge.covers(1, context.user_turns)          # falls back to the full evaluation
+    judge.submit(1, "I would like a coffee")
+    prompt = model_service._aggregate_user_prompt(judge.assessments(1), context.user_turns)
+    assert "I would like a coffee" in prompt and "never saved" not in prompt
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
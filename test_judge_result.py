@@ -0,0 +1,70 @@
+"""
+Judge Result Tests (offline)
+----------------------------
+Usage:
+    python -m pytest test_judge_result.py
+    python test_judge_result.py
+"""
+
+import json
+
+import pytest
+
+from judge_result import JudgeResultError, ielts_round, parse_judge_result, repair_prompt
+
+def payload(**overrides) -> dict:
+    data = {
+        "pronunciation": {"score": 6.5, "justification": "Mostly clear."},
+        "vocabulary": {"score": 6, "justification": "Adequate range."},
+        "grammar": {"score": 5.5, "justification": "Frequent tense errors."},
+        "fluency_coherence": {"score": 7, "justification": "Few hesitations."},
+        "overall_band": 6,
+        "strengths": ["Speaks at length"],
+        "weaknesses": ["Past tense"],
+        "examples": [{"sentence": "I go there yesterday.", "comment": "went", "strong": False}],
+    }
+    data.update(overrides)
+    return data
+
+def test_parses_valid_json_and_fenced_json():
+    plain = parse_judge_result(json.dumps(payload()))
+    fenced = parse_judge_result("```json\n" + json.dumps(payload()) + "\n```")
+    assert plain == fenced
+    assert plain.scores == {"pronunciation": 6.5, "vocabulary": 6, "grammar": 5.5,
+                            "fluency_coherence": 7, "overall": 6.5}
+
+def test_scores_snap_to_half_bands_and_overall_is_recomputed():
+    result = parse_judge_result(json.dumps(payload(vocabulary={"score": 6.2, "justification": ""},
+                                                   overall_band=9)))
+    assert result.vocabulary.score == 6.0
+    assert result.overall_band == 6.5  # mean 6.25 rounds up, the model's 9 is ignored
+
+def test_ielts_rounding():
+    assert [ielts_round(v) for v in (6.125, 6.25, 6.6, 6.75)] == [6.0, 6.5, 6.5, 7.0]
+
+@pytest.mark.parametrize("text", [
+    "The candidate scores 6.",
+    json.dumps(payload(grammar={"score": 11, "justification": ""})),
+    json.dumps(payload(grammar={"score": "six", "justification": ""})),
+    json.dumps({k: v for k, v in payload().items() if k != "fluency_coherence"}),
+    json.dumps(payload(strengths=[])),
+])
+def test_invalid_output_raises(text):
+    with pytest.raises(JudgeResultError):
+        parse_judge_result(text)
+
+def test_round_trip_and_markdown():
+    result = parse_judge_result(json.dumps(payload()))
+    assert parse_judge_result(json.dumps(result.to_dict())) == result
+    md = result.to_markdown()
+    assert "**Overall band: 6.5**" in md and "Fluency & Coherence: 7" in md and "I go there yesterday." in md
+
+def test_repair_prompt_names_the_error():
+    prompt = repair_prompt("not json", JudgeResultError("invalid JSON: x"))
+    assert "invalid JSON" in prompt and "not json" in prompt
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and name != "test_invalid_output_raises":
+            fn()
+            print(f"✅ {name}")
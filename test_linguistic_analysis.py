@@ -0,0 +1,65 @@
+"""
+Linguistic Analysis Tests (offline)
+-----------------------------------
+Usage:
+    python -m pytest test_linguistic_analysis.py
+    python test_linguistic_analysis.py
+"""
+
+import time
+
+from linguistic_analysis import analyze, band_of, count_fillers, instant_score, mtld, render, tokenize
+
+BASIC = ["Um, I like it. It is good. I like it, um, a lot."]
+ADVANCED = ["I'd argue that public transport infrastructure deserves considerable investment, "
+            "because congestion significantly undermines productivity. Although subsidies are "
+            "expensive, the long-term benefits for commuters and the environment are substantial.",
+            "Whereas my parents commuted by car, my generation increasingly prefers cycling, which "
+            "is healthier and, frankly, more enjoyable when the weather cooperates."]
+
+def test_bands_and_inflections():
+    assert band_of("went") == "K1" and band_of("stopped") == "K1" and band_of("studies") == "K1"
+    assert band_of("crowded") == "K2" and band_of("significantly") == "AWL"
+    assert band_of("xylophone") is None
+
+def test_mtld_rewards_variety():
+    repetitive = tokenize("I like it and I like it and I like it " * 5)
+    varied = tokenize(" ".join(ADVANCED))
+    assert mtld(repetitive) < 10 < 40 < mtld(varied)
+
+def test_features_of_a_conversation():
+    f = analyze(["Um, I I go to school. It's nice.", "I usually study because exams matter."])
+    assert f["turns"] == 2 and f["words"] == 14 and f["words_per_turn"] == 7.0
+    assert f["hesitations"] == 1 and f["repetitions"] == 1 and f["fillers"] == 1
+    assert f["sentences"] == 3 and f["complex_sentence_share"] == 0.33
+    assert abs(sum(f["bands"].values()) - 1) < 0.01
+
+def test_like_and_actually_count_only_as_discourse_markers():
+    for text in ("I would like a coffee please", "I like reading books.", "I actually finished it.",
+                 "I'd like the soup, please.", "I eat fruit, like apples."):
+        assert count_fillers(text) == 0, text
+    assert count_fillers("Actually, I finished it.") == 1
+    assert count_fillers("It was, like, really big, you know.") == 2
+    assert count_fillers("It was like, huge. Um, I actually liked it") == 2
+    assert count_fillers("Like, I don't know") == 1
+
+def test_instant_score_separates_levels_without_pronunciation():
+    basic, advanced = instant_score(analyze(BASIC)), instant_score(analyze(ADVANCED))
+    assert basic["pronunciation"] is None and advanced["pronunciation"] is None
+    for name in ("vocabulary", "grammar", "fluency_coherence", "overall"):
+        assert basic[name] < advanced[name], name
+        assert advanced[name] * 2 == int(advanced[name] * 2)
+    assert instant_score(analyze([]))["overall"] is None
+
+def test_render_is_compact_and_fast():
+    turns = ADVANCED * 20
+    start = time.perf_counter()
+    line = render(analyze(turns))
+    assert time.perf_counter() - start < 0.1
+    assert "MTLD" in line and "AWL" in line and "\n" not in line and len(line) < 400
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
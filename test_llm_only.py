@@ -6,6 +6,7 @@ Perfect for testing when you don't have audio files
 
 Usage:
     python test_llm_only.py
+    STUB_PROVIDERS=all python test_llm_only.py     # offline, against the stubs in providers.py
 """
 
 from model_service import coach_feedback, judge_feedback, judge_final_evaluation, SCENARIOS
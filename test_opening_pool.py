@@ -0,0 +1,140 @@
+"""
+Opening Pool Tests (offline)
+----------------------------
+Conversation starts: concurrent identical openings share one call (threads
+and event loops, errors included), the per-scenario pool pops locally and
+refills below its low-water mark, and model_service serves starts from the
+pool with stub Gemini.
+
+Usage:
+    python -m pytest test_opening_pool.py
+    python test_opening_pool.py
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+
+from opening_pool import OpeningPool, SingleFlight
+
+def test_single_flight_threads_share_one_call():
+    flight, calls = SingleFlight(), []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return "Hello!"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("restaurant", slow))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["Hello!"] * 8 and len(calls) == 1
+    assert flight.stats() == {"calls": 1, "shared": 7, "in_flight": 0}
+    assert flight.do("restaurant", lambda: "again") == "again"    # only concurrent calls are merged
+
+def test_single_flight_shares_errors():
+    flight, errors = SingleFlight(), []
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("quota")
+
+    def start():
+        try:
+            flight.do("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=start) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == ["quota"] * 4 and flight.calls == 1
+
+def test_single_flight_async_survives_cancelled_caller():
+    async def run():
+        flight, calls = SingleFlight(), []
+
+        async def greet():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "Welcome!"
+
+        first = asyncio.ensure_future(flight.ado("hotel", greet))
+        rest = [asyncio.ensure_future(flight.ado("hotel", greet)) for _ in range(5)]
+        other = asyncio.ensure_future(flight.ado("shopping", greet))
+        await asyncio.sleep(0.01)
+        first.cancel()                     # that client went away; the others still get the opening
+        return await asyncio.gather(*rest, other), len(calls), flight.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == ["Welcome!"] * 6 and calls == 2
+    assert stats == {"calls": 2, "shared": 5, "in_flight": 0}
+
+def make_pool(size=3, refill_at=None, fail=False):
+    counter = itertools.count(1)
+
+    def generate(key):
+        if fail:
+            raise RuntimeError("down")
+        return f"{key} opening {next(counter)}"
+
+    return OpeningPool(generate, size=size, refill_at=refill_at, run=lambda fn, *args: fn(*args))
+
+def test_pool_fills_pops_and_refills():
+    pool = make_pool(size=3, refill_at=2)
+    assert pool.fill("restaurant") and pool.stats()["pooled"] == 3
+    assert not pool.fill("restaurant")                    # already full
+    assert pool.pop("restaurant") == "restaurant opening 1"
+    assert pool.stats()["pooled"] == 2                    # at the low-water mark, not below it
+    assert pool.pop("restaurant") == "restaurant opening 2"
+    assert pool.stats()["pooled"] == 3                    # dropped below 2: topped up again
+    assert [pool.pop("restaurant") for _ in range(3)] == [f"restaurant opening {i}" for i in (3, 4, 5)]
+    stats = pool.stats()
+    assert stats["hits"] == 5 and stats["misses"] == 0 and stats["generated"] == 7
+
+def test_pool_miss_schedules_refill_and_failures_back_off():
+    pool = make_pool(size=2)
+    assert pool.pop("free") is None and pool.pop("free") == "free opening 1"   # first start warms the key
+    failing = make_pool(size=2, fail=True)
+    assert failing.pop("free") is None and failing.pop("free") is None
+    assert failing.stats()["failures"] == 2 and failing.stats()["refilling"] == 0
+    off = make_pool(size=0)
+    assert off.pop("free") is None and not off.fill("free") and off.stats()["misses"] == 0
+
+def test_pool_close_stops_refills():
+    pool = make_pool(size=2)
+    pool.fill("hotel")
+    pool.close()
+    assert pool.pop("hotel") is None and pool.stats()["pooled"] == 0
+    assert not pool.fill("hotel")
+
+def test_model_service_starts_from_pool():
+    import model_service
+    from providers import StubGemini
+
+    model_service.use_stubs(StubGemini(latency=0, coach_replies=("Hi there!",)))
+    saved = model_service.openings
+    model_service.openings = OpeningPool(model_service._generate_opening, size=2,
+                                         run=lambda fn, *args: fn(*args))
+    try:
+        assert model_service.warm_opening_pool() == 1 + len(model_service.SCENARIOS)
+        calls = model_service.gemini.calls
+        scenario = model_service.SCENARIOS["restaurant"]
+        assert model_service.start_conversation(scenario) == "Hi there!"
+        assert asyncio.run(model_service.astart_conversation(scenario)) == "Hi there!"
+        assert model_service.gemini.calls == calls + 2        # both pops refilled in the background
+        assert model_service.opening_metrics()["pool"]["hits"] == 2
+    finally:
+        model_service.openings = saved
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,159 @@
+"""
+Provider Stub Tests (offline)
+-----------------------------
+The stub Gemini provider and Typhoon server: latency specs, seeded error
+rates and canned outputs. Then model_service and the load-test harness
+running on top of them in a fresh interpreter, with no keys and no network.
+
+Usage:
+    python -m pytest test_providers.py
+    python test_providers.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+
+from judge_result import JSON_GENERATION_CONFIG, parse_judge_result
+from providers import Latency, StubGemini, StubProviderError, stubbed
+from stub_typhoon_server import start_stub_typhoon
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AUDIO = {"mime_type": "audio/wav", "data": b"\0" * 100}
+
+def test_latency_specs():
+    assert Latency.parse("0.25").sample(random.Random()) == 0.25
+    uniform = Latency.parse("uniform:0.1:0.2")
+    assert all(0.1 <= uniform.sample(random.Random(i)) <= 0.2 for i in range(20))
+    lognormal = Latency.parse("lognormal:0.4:0.5")
+    samples = sorted(lognormal.sample(random.Random(i)) for i in range(501))
+    assert 0.3 < samples[250] < 0.55                      # median ~0.4
+    assert [lognormal.sample(random.Random(7)) for _ in range(2)] == [lognormal.sample(random.Random(7))] * 2
+    for bad in ("fast", "uniform:1", "gamma:1:2"):
+        try:
+            Latency.parse(bad)
+        except ValueError:
+            continue
+        raise AssertionError(bad)
+
+def test_stub_gemini_canned_outputs():
+    gemini = StubGemini(latency=0, chunk_interval=0, coach_replies=("one two three four five six",))
+    assert gemini.model("m").generate_content(["Transcribe", AUDIO]).text == gemini.transcript
+    judge = gemini.model("m", "judge", JSON_GENERATION_CONFIG).generate_content("turns")
+    assert parse_judge_result(judge.text).overall_band == 6.0
+    chunks = [c.text for c in gemini.model("m", "coach").generate_content("hi", stream=True)]
+    assert chunks == ["one two three four ", "five six"]
+
+    async def run():
+        resp = await gemini.model("m", "coach").generate_content_async("hi")
+        stream = await gemini.model("m", "coach").generate_content_async("hi", stream=True)
+        return resp.text, "".join([c.text async for c in stream])
+
+    assert asyncio.run(run()) == ("one two three four five six",) * 2
+    assert gemini.calls == 5
+
+def test_stub_gemini_seeded_errors():
+    def failures(seed):
+        gemini = StubGemini(latency=0, error_rate=0.3, seed=seed)
+        outcomes = []
+        for _ in range(50):
+            try:
+                gemini.model("m").generate_content("hi")
+                outcomes.append(True)
+            except StubProviderError:
+                outcomes.append(False)
+        return outcomes
+
+    assert failures(3) == failures(3)
+    assert 5 < failures(3).count(False) < 25
+
+def test_stub_cache_usage_and_prefill_cost():
+    gemini = StubGemini(latency=0, prefill_s_per_1k=0.5)
+    content = gemini.create_cache("m", "system", [{"role": "user", "parts": ["x" * 4000]}], ttl_s=60)
+    model = gemini.cached_model(content)
+    delay, _, usage = model._plan([{"role": "user", "parts": ["hi"]}])
+    assert usage.cached_content_token_count == content.tokens > 1000
+    assert delay < 0.01                                  # cached tokens are not prefilled again
+    assert gemini.model("m", "system")._plan("x" * 4000)[0] > 0.4
+    content.delete()
+    assert gemini.caches == {}
+
+def test_gemini_cache_ttl_converts_in_sdk():
+    from google.generativeai import caching
+    from google.generativeai.types import caching_types
+
+    from providers import GeminiProvider
+
+    ttls, create = [], caching.CachedContent.create
+    caching.CachedContent.create = classmethod(lambda cls, model, **kwargs: ttls.append(kwargs["ttl"]))
+    try:
+        GeminiProvider().create_cache("m", "system", [], ttl_s=900.0)   # CONTEXT_CACHE_TTL is read as a float
+    finally:
+        caching.CachedContent.create = create
+    GeminiProvider().touch_cache(SimpleNamespace(update=lambda ttl: ttls.append(ttl)), 450.0)
+    assert [caching_types.to_optional_ttl(ttl) for ttl in ttls] == [{"seconds": 900, "nanos": 0},
+                                                                     {"seconds": 450, "nanos": 0}]
+
+def test_stub_typhoon_error_rate_and_texts():
+    server = start_stub_typhoon(latency="uniform:0:0.001", error_rate=0.5, texts=["a", "b"], seed=1)
+    results = []
+    for _ in range(20):
+        req = urllib.request.Request(f"{server.base_url}/audio/transcriptions", data=b"x", method="POST")
+        try:
+            with urllib.request.urlopen(req) as resp:
+                results.append(json.load(resp)["text"])
+        except urllib.error.HTTPError as e:
+            results.append(e.code)
+    server.shutdown()
+    assert 3 < results.count(503) < 17
+    assert set(results) == {"a", "b", 503}
+
+def test_stub_providers_env():
+    os.environ["STUB_PROVIDERS"] = "gemini"
+    try:
+        assert stubbed() == {"gemini"}
+        os.environ["STUB_PROVIDERS"] = "all"
+        assert stubbed() == {"typhoon", "gemini"}
+    finally:
+        del os.environ["STUB_PROVIDERS"]
+
+def run_child(args: list, **env) -> subprocess.CompletedProcess:
+    base = {k: v for k, v in os.environ.items() if k not in ("TYPHOON_API_KEY", "GEMINI_API_KEY")}
+    proc = subprocess.run([sys.executable, *args], cwd=HERE, env={**base, **env},
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    return proc
+
+def test_model_service_runs_on_stubs_without_keys():
+    code = ("import model_service as m\n"
+            "m.init()\n"
+            "print(m.coach_feedback('hello', None, None, 's1'))\n"
+            "print(m.judge_final_scores([{'user': 'I like tea', 'coach': 'ok'}]).overall_band)\n")
+    out = run_child(["-c", code], STUB_PROVIDERS="all", STUB_GEMINI_LATENCY="0", STUB_TYPHOON_LATENCY="0")
+    coach, band = out.stdout.strip().splitlines()[-2:]
+    assert coach.startswith("That sounds great!") and band == "6.0"
+
+def test_loadtest_in_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.json")
+        run_child(["loadtest.py", "--sessions", "3", "--turns", "2", "--evaluate", "--audio-seconds", "0.2",
+                   "--gemini-latency", "0", "--typhoon-latency", "0", "--json", path])
+        with open(path) as f:
+            report = json.load(f)
+    assert report["turns"] == 6 and report["errors"] == 0
+    assert report["endpoints"]["process"]["count"] == 6 and report["endpoints"]["evaluate"]["count"] == 3
+    assert report["endpoints"]["start"]["p95_ms"] is not None
+    assert "asr" in report["server_stages_ms"] and "coach" in report["server_stages_ms"]
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
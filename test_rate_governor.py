@@ -0,0 +1,116 @@
+"""
+Rate Governor Tests (offline)
+-----------------------------
+Usage:
+    python -m pytest test_rate_governor.py
+    python test_rate_governor.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rate_governor import (BATCH, INTERACTIVE, LIVE, Governor, GovernorRegistry, Limits,
+                           current_priority, parse_limits, priority)
+
+def test_token_bucket_spaces_requests():
+    gov = Governor("t", Limits(rps=20, burst=2))
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(6):
+            async with gov.aslot():
+                pass
+        return time.perf_counter() - start
+
+    assert 0.17 < asyncio.run(run()) < 0.4  # 2 from the burst, then 4 at 50 ms
+    m = gov.metrics()
+    assert m["granted"] == 6 and m["queued"] >= 3 and m["wait_ms"]["max"] >= 40
+
+def test_concurrency_cap_across_threads():
+    gov = Governor("t", Limits(concurrency=2))
+    inflight, peak, lock = 0, 0, threading.Lock()
+
+    def call():
+        nonlocal inflight, peak
+        with gov.slot():
+            with lock:
+                inflight += 1
+                peak = max(peak, inflight)
+            time.sleep(0.05)
+            with lock:
+                inflight -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    m = gov.metrics()
+    assert peak == 2 and m["inflight"] == 0 and m["queue_depth"] == 0 and m["max_queue_depth"] >= 3
+
+def test_live_work_jumps_the_queue():
+    gov = Governor("t", Limits(concurrency=1))
+    order = []
+
+    async def call(name, level):
+        with priority(level):
+            async with gov.aslot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+    async def run():
+        async with gov.aslot():  # hold the only slot while everyone queues
+            tasks = [asyncio.ensure_future(call(f"batch{i}", BATCH)) for i in range(3)]
+            tasks.append(asyncio.ensure_future(call("interactive", INTERACTIVE)))
+            tasks.append(asyncio.ensure_future(call("live", LIVE)))
+            await asyncio.sleep(0.02)
+            assert gov.metrics()["queue_depth"] == 5
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["live", "interactive", "batch0", "batch1", "batch2"]
+    assert gov.metrics()["granted_by_priority"] == {"live": 1, "interactive": 2, "batch": 3}
+
+def test_priority_follows_tasks_and_threads():
+    async def run():
+        with priority(LIVE):
+            task = asyncio.ensure_future(asyncio.sleep(0, result=current_priority()))
+            thread = await asyncio.to_thread(current_priority)
+        return await task, thread, current_priority()
+
+    assert asyncio.run(run()) == (LIVE, LIVE, INTERACTIVE)
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    gov = Governor("t", Limits(concurrency=1))
+
+    async def run():
+        async with gov.aslot():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(gov.aacquire(), 0.05)
+        async with gov.aslot():  # would hang if the timed-out waiter had kept a slot
+            pass
+
+    asyncio.run(asyncio.wait_for(run(), 2))
+    assert gov.metrics()["inflight"] == 0 and gov.metrics()["queue_depth"] == 0
+
+def test_limits_config_and_lookup():
+    limits = parse_limits("typhoon=10/5, gemini-2.5-flash=16/8/4, gemini:gemini-2.5-pro=2")
+    assert limits["typhoon"] == Limits(10, 5, 0) and limits["gemini-2.5-flash"] == Limits(16, 8, 4)
+    registry = GovernorRegistry(limits, defaults={"gemini": Limits(concurrency=16)})
+    assert registry.get("typhoon", "typhoon-asr-large-v1").limits.rps == 5
+    assert registry.get("gemini", "gemini-2.5-pro").limits == Limits(2)
+    assert registry.get("gemini", "gemini-2.0-flash").limits == Limits(16)
+    assert registry.get("gemini", "gemini-2.5-flash") is registry.get("gemini", "gemini-2.5-flash")
+    assert set(registry.metrics()) == {"typhoon:typhoon-asr-large-v1", "gemini:gemini-2.5-pro",
+                                       "gemini:gemini-2.0-flash", "gemini:gemini-2.5-flash"}
+    with pytest.raises(ValueError):
+        parse_limits("typhoon")
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,148 @@
+"""
+Multi-worker Serving Tests (offline)
+------------------------------------
+Shared state and graceful shutdown: the SQLite session store seen from
+another process, RATE_LIMITS split across workers, the in-flight turn
+tracker, and serve.py with two workers on stub providers finishing a turn
+that is still running when it gets SIGTERM.
+
+Usage:
+    python -m pytest test_serve.py
+    python test_serve.py
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from drain import Draining, TurnTracker
+from rate_governor import Limits, per_worker
+from serve import check_shared_state
+from session_store import SQLiteSessionStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def test_sqlite_sessions_shared_across_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        store = SQLiteSessionStore(path)
+        session = store.create("restaurant", "Hello!")
+        code = ("import sys; from session_store import SQLiteSessionStore\n"
+                "store = SQLiteSessionStore(sys.argv[1]); s = store.get(sys.argv[2])\n"
+                "s.add_turn('I want soup', 'Sure.'); s.evaluating = 1.0; store.save(s)\n")
+        subprocess.run([sys.executable, "-c", code, path, session.id], cwd=HERE, check=True, timeout=60)
+        shared = store.get(session.id)
+        store.close()
+    assert shared.turns == [{"user": "I want soup", "coach": "Sure."}]
+    assert shared.opening == "Hello!" and shared.evaluating == 1.0 and store.shared
+
+def test_rate_limits_split_across_workers():
+    limits = {"typhoon": Limits(10, 5.0), "gemini": Limits(3, 0.0, 8)}
+    assert per_worker(limits, 1) == limits
+    assert per_worker(limits, 4) == {"typhoon": Limits(3, 1.25), "gemini": Limits(1, 0.0, 2)}
+
+def test_memory_store_refused_with_workers():
+    os.environ.pop("SESSION_STORE", None)
+    assert check_shared_state(1) is None
+    assert "SESSION_STORE" in check_shared_state(2)
+    os.environ["SESSION_STORE"] = "sqlite"
+    try:
+        assert check_shared_state(4) is None
+    finally:
+        del os.environ["SESSION_STORE"]
+
+def test_drain_waits_for_turns_and_tracked_tasks():
+    async def run():
+        tracker = TurnTracker()
+
+        async def turn():
+            with tracker.turn():
+                await asyncio.sleep(0.2)
+            return "turn"
+
+        running = asyncio.ensure_future(turn())
+        background = asyncio.ensure_future(asyncio.sleep(0.3, "evaluation"))
+        tracker.track(background)
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        drained = await tracker.drain(timeout=5)
+        waited = time.perf_counter() - start
+        try:
+            tracker.begin()
+            refused = False
+        except Draining:
+            refused = True
+        return drained, waited, running.result(), background.result(), refused, tracker.stats()
+
+    drained, waited, turn, background, refused, stats = asyncio.run(run())
+    assert drained and 0.25 < waited < 1 and (turn, background) == ("turn", "evaluation")
+    assert refused and stats == {"active_turns": 0, "background_tasks": 0, "draining": True, "refused": 1}
+
+def test_drain_timeout():
+    async def run():
+        tracker = TurnTracker()
+        tracker.begin()   # never ends
+        return await tracker.drain(timeout=0.05), tracker.active
+
+    assert asyncio.run(run()) == (False, 1)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_serve_two_workers_drains_on_sigterm():
+    import httpx
+    from loadtest import wav_bytes
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**{k: v for k, v in os.environ.items() if k not in ("TYPHOON_API_KEY", "GEMINI_API_KEY")},
+               "STUB_PROVIDERS": "all", "STUB_GEMINI_LATENCY": "1.5", "STUB_TYPHOON_LATENCY": "0",
+               "SESSION_STORE": "sqlite", "SESSION_DB": os.path.join(tmp, "sessions.db")}
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, "serve.py"), "--workers", "2",
+                                 "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                                cwd=tmp, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        try:
+            client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30)
+            for _ in range(100):
+                try:
+                    if client.get("/api/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.2)
+            # the opening (1.5 s) and the turn run on whichever workers accept them; the store is shared
+            session_id = client.post("/api/conversation/start", json={"scenario_id": "free"}).json()["session_id"]
+            result = {}
+
+            def turn():
+                result["resp"] = client.post("/api/conversation/process", data={"session_id": session_id},
+                                             files={"file": ("turn.wav", wav_bytes(0.3, 300), "audio/wav")})
+
+            thread = threading.Thread(target=turn)
+            thread.start()
+            time.sleep(0.7)                      # the coach call is in flight
+            proc.send_signal(signal.SIGTERM)
+            thread.join(30)
+            assert proc.wait(30) == 0, proc.stdout.read()
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+        resp = result["resp"]
+        assert resp.status_code == 200 and resp.json()["turn"] == 1
+        store = SQLiteSessionStore(env["SESSION_DB"])
+        assert len(store.get(session_id).turns) == 1
+        store.close()
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -6,6 +6,7 @@ No ffmpeg/ffprobe needed!
 
 Usage:
     python test_simple.py
+    STUB_PROVIDERS=all python test_simple.py     # offline, against the stubs in providers.py
 """
 
 from model_service import coach_feedback, judge_feedback, SCENARIOS
@@ -0,0 +1,70 @@
+"""
+Startup Tests (offline)
+-----------------------
+`import model_service` in a fresh interpreter with no API keys: it must
+succeed without loading the Gemini SDK or the HTTP clients. init() must
+then report exactly which keys are missing. Import timing is gated
+separately by bench_import.py.
+
+Usage:
+    python -m pytest test_startup.py
+    python test_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SDKS = ("google.generativeai", "google.api_core", "requests", "httpx", "dotenv", "openai")
+
+def run_child(code: str, **env) -> dict:
+    """Run `code` in a fresh interpreter (no keys, empty cwd so no .env) and return its printed JSON."""
+    base = {k: v for k, v in os.environ.items() if k not in ("TYPHOON_API_KEY", "GEMINI_API_KEY", "PYTHONPATH")}
+    base["PYTHONPATH"] = HERE
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, env={**base, **env},
+                              capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def test_import_needs_no_keys_and_loads_no_sdk():
+    out = run_child(
+        "import json, sys, model_service\n"
+        f"print(json.dumps(sorted(m for m in {SDKS!r} if m in sys.modules)))\n"
+    )
+    assert out == []
+
+def test_init_reports_missing_keys():
+    out = run_child(
+        "import json, model_service\n"
+        "errors = []\n"
+        "for providers in (('typhoon', 'gemini'), ('gemini',)):\n"
+        "    try:\n"
+        "        model_service.init(providers)\n"
+        "    except RuntimeError as e:\n"
+        "        errors.append(str(e))\n"
+        "print(json.dumps(errors))\n",
+        GEMINI_API_KEY="",
+    )
+    assert "TYPHOON_API_KEY" in out[0] and "GEMINI_API_KEY" in out[0]
+    assert "TYPHOON_API_KEY" not in out[1]
+
+def test_typhoon_init_configures_client_lazily():
+    out = run_child(
+        "import json, sys, model_service\n"
+        "model_service.init(('typhoon',))\n"
+        "model_service.init(('typhoon',))\n"   # idempotent
+        "print(json.dumps([model_service.typhoon.headers, model_service.typhoon._session is None,\n"
+        "                  'google.generativeai' in sys.modules]))\n",
+        TYPHOON_API_KEY="t-key",
+    )
+    assert out == [{"Authorization": "Bearer t-key"}, True, False]
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,139 @@
+"""
+Streaming ASR Tests (offline)
+-----------------------------
+Usage:
+    python -m pytest test_streaming_asr.py
+    python test_streaming_asr.py
+"""
+
+import asyncio
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_preprocess import resample
+from streaming_asr import Endpointer, StreamingTranscriber, check_sample_rate
+from test_chunked_asr import RATE, speech_with_pauses
+
+def frames(pcm: np.ndarray, ms: int = 40):
+    step = RATE * ms // 1000
+    for i in range(0, len(pcm), step):
+        yield pcm[i:i + step]
+
+def test_endpointer_cuts_at_pauses():
+    pcm, _ = speech_with_pauses(phrases=3, phrase_s=2.0, pause_s=0.9)
+    ep = Endpointer(RATE, end_silence_ms=600)
+    segments = []
+    for chunk in frames(pcm.astype(np.float32) / 32768):
+        segments += ep.push(chunk)
+    assert len(segments) == 2  # third phrase is still open
+    tail = ep.flush()
+    assert tail is not None
+    for seg in segments + [tail]:
+        assert 2.0 <= len(seg) / RATE <= 2.0 + 0.3 + 0.6 + 0.1  # speech + pre-roll + kept silence
+
+def test_short_pause_does_not_split():
+    pcm, _ = speech_with_pauses(phrases=3, phrase_s=1.0, pause_s=0.3)
+    ep = Endpointer(RATE, end_silence_ms=600)
+    segments = [s for chunk in frames(pcm.astype(np.float32) / 32768) for s in ep.push(chunk)]
+    assert segments == [] and len(ep.flush()) / RATE > 3.5
+
+def test_clicks_are_ignored_and_long_speech_is_capped():
+    ep = Endpointer(RATE, min_speech_ms=200, max_segment_s=1.0)
+    quiet = np.random.default_rng(0).normal(0, 0.001, RATE).astype(np.float32)
+    click = np.full(RATE * 30 // 1000, 0.5, np.float32)
+    assert ep.push(np.concatenate([quiet, click, quiet])) == []
+    tone = (0.3 * np.sin(2 * np.pi * 200 * np.arange(3 * RATE) / RATE)).astype(np.float32)
+    capped = ep.push(tone)
+    assert len(capped) == 3 and all(len(s) <= RATE for s in capped)
+
+def test_partials_arrive_while_speaking_and_only_tail_waits_at_stop():
+    pcm, _ = speech_with_pauses(phrases=4, phrase_s=2.0, pause_s=0.9)
+    partials = []
+
+    async def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        await asyncio.sleep(0.1)
+        return f"s{len(partials)}"
+
+    async def on_partial(index, text, transcript):
+        partials.append((index, transcript))
+
+    async def run():
+        live = StreamingTranscriber(fake_asr, RATE, on_partial=on_partial)
+        for chunk in frames(pcm):
+            await live.feed(chunk.tobytes())
+            await asyncio.sleep(0.005)  # real time is ~8x slower; enough for ASR to overlap
+        before_stop = len(partials)
+        text = await live.finish()
+        return live, before_stop, text
+
+    live, before_stop, text = asyncio.run(run())
+    assert len(live.texts) == 4 and before_stop >= 2
+    assert text == "s0 s1 s2 s3"
+    assert live.tail_s < 0.3  # one segment's ASR, not four
+
+def test_resamples_browser_rate():
+    pcm, _ = speech_with_pauses(phrases=2, phrase_s=1.0, pause_s=0.9)
+    seen = []
+
+    async def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        seen.append(len(audio_bytes))
+        return "x"
+
+    async def run():
+        live = StreamingTranscriber(fake_asr, 48000)
+        await live.feed(np.repeat(pcm, 3).tobytes())
+        return await live.finish(), live
+
+    text, live = asyncio.run(run())
+    assert text == "x x" and abs(live.audio_s - len(pcm) / RATE) < 0.01
+    assert all(n < 2 * 2 * RATE for n in seen)  # 16 kHz int16, ~1-2 s each
+
+def test_browser_frames_resample_like_one_pass():
+    rate = 44100
+    t = np.arange(rate) / rate
+    pcm = np.concatenate([0.5 * np.sin(2 * np.pi * 440 * t), np.zeros(rate)]).astype(np.float32)
+    sent = []
+
+    async def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        with wave.open(io.BytesIO(audio_bytes)) as w:
+            assert w.getframerate() == RATE
+            sent.append(np.frombuffer(w.readframes(w.getnframes()), "<i2") / 32767)
+        return "x"
+
+    async def run():
+        live = StreamingTranscriber(fake_asr, rate)
+        step = rate // 10                     # ~100 ms browser frames
+        for i in range(0, len(pcm), step):
+            await live.feed((pcm[i:i + step] * 32767).astype("<i2").tobytes())
+        return await live.finish()
+
+    assert asyncio.run(run()) == "x" and len(sent) == 1
+    expected = resample(pcm, rate)[:len(sent[0])]
+    inner = slice(RATE // 100, RATE - RATE // 100)   # away from the tone's own edges
+    assert np.max(np.abs(sent[0][inner] - expected[inner])) < 1e-3
+
+def test_bad_client_input_is_rejected():
+    async def fake_asr(audio_bytes, language_code, mime_type="audio/wav"):
+        return "x"
+
+    assert check_sample_rate("44100") == check_sample_rate(44100.0) == 44100
+    for rate in (0, 30, 96000, 44100.5, "fast", None):
+        with pytest.raises(ValueError, match="sample_rate"):
+            StreamingTranscriber(fake_asr, rate)
+
+    async def run():
+        live = StreamingTranscriber(fake_asr, RATE)
+        with pytest.raises(ValueError, match="int16"):
+            await live.feed(b"\0\0\0")
+        return await live.feed(b"\0\0" * 160)   # the stream carries on after a bad frame
+
+    assert asyncio.run(run()) == []
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
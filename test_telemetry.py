@@ -0,0 +1,100 @@
+"""
+Telemetry Tests (offline)
+-------------------------
+Histograms/counters/callbacks and their Prometheus text rendering, plus
+per-request traces across threads and asyncio tasks.
+
+Usage:
+    python -m pytest test_telemetry.py
+    python test_telemetry.py
+"""
+
+import asyncio
+import time
+
+import telemetry
+from telemetry import Counter, Histogram, Registry, stage, trace
+
+def lines_of(metric) -> list[str]:
+    return [line for line in metric.render() if not line.startswith("#")]
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "test", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value, kind="coach")
+    assert lines_of(h) == [
+        't_seconds_bucket{kind="coach",le="0.1"} 1',
+        't_seconds_bucket{kind="coach",le="1.0"} 3',
+        't_seconds_bucket{kind="coach",le="+Inf"} 4',
+        't_seconds_sum{kind="coach"} 4.25',
+        't_seconds_count{kind="coach"} 4',
+    ]
+
+def test_counter_and_label_escaping():
+    c = Counter("t_events", "test", ("name",))
+    c.inc(name='say "hi"\n')
+    c.inc(2, name='say "hi"\n')
+    assert lines_of(c) == ['t_events_total{name="say \\"hi\\"\\n"} 3.0']
+
+def test_registry_render_has_help_type_and_callbacks():
+    registry = Registry()
+    registry.register(Counter("t_calls", "Calls made"))
+    registry.register(telemetry.CallbackMetric("t_depth", "Queue depth", lambda: {("typhoon",): 3}, ("governor",)))
+    registry.register(telemetry.CallbackMetric("t_broken", "Fails", lambda: 1 / 0))
+    text = registry.render()
+    assert "# HELP t_calls Calls made\n# TYPE t_calls counter\n" in text
+    assert '# TYPE t_depth gauge\nt_depth{governor="typhoon"} 3\n' in text
+    assert "t_broken collection failed" in text   # a broken collector doesn't break the scrape
+    assert text.endswith("\n")
+
+def test_trace_collects_stages_and_sums_repeats():
+    with trace("unit") as t:
+        with stage("asr"):
+            time.sleep(0.01)
+        with stage("coach"):
+            pass
+        with stage("coach"):
+            time.sleep(0.01)
+    timings = t.timings_ms()
+    assert list(timings) == ["asr", "coach", "total"]
+    assert timings["asr"] >= 10 and timings["coach"] >= 10
+    assert timings["total"] >= timings["asr"] + timings["coach"]
+    assert telemetry.current() is None
+    assert telemetry.STAGE_SECONDS.labels(stage="unit.total").count >= 1
+
+def test_stage_outside_trace_only_feeds_histogram():
+    before = telemetry.STAGE_SECONDS.labels(stage="unit.loose").count
+    with stage("unit.loose"):
+        pass
+    assert telemetry.STAGE_SECONDS.labels(stage="unit.loose").count == before + 1
+
+def test_trace_follows_threads_and_tasks():
+    def work():
+        with stage("thread"):
+            pass
+
+    async def task():
+        with stage("task"):
+            await asyncio.sleep(0)
+
+    async def main():
+        with trace("unit") as t:
+            await asyncio.gather(asyncio.to_thread(work), asyncio.ensure_future(task()))
+        return t
+
+    assert set(asyncio.run(main()).timings_ms()) == {"thread", "task", "total"}
+
+def test_stage_records_on_error():
+    with trace("unit") as t:
+        try:
+            with stage("asr"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+    assert "asr" in t.timings_ms()
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
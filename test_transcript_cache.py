@@ -0,0 +1,60 @@
+"""
+Transcript Cache Tests (offline)
+--------------------------------
+Usage:
+    python -m pytest test_transcript_cache.py
+    python test_transcript_cache.py
+"""
+
+import os
+import tempfile
+import time
+
+from audio_preprocess import preprocess
+from test_audio_preprocess import make_wav, tone
+from transcript_cache import TranscriptCache, audio_key
+
+def test_same_speech_different_container_same_key():
+    mono = preprocess(make_wav(tone(1.0, 16000), 16000), trim=False)
+    stereo = preprocess(make_wav(tone(1.0, 16000), 16000, channels=2), trim=False)
+    assert audio_key(mono.pcm, "en", "m") == audio_key(stereo.pcm, "en", "m")
+    assert audio_key(mono.pcm, "en", "m") != audio_key(mono.pcm, "th", "m")
+    assert audio_key(mono.pcm, "en", "m") != audio_key(mono.pcm, "en", "other-model")
+
+def test_lru_evicts_least_recently_used():
+    cache = TranscriptCache(maxsize=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # a is now most recent
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+def test_disk_tier_survives_restart():
+    path = os.path.join(tempfile.mkdtemp(), "transcripts.db")
+    first = TranscriptCache(path=path)
+    first.put("k", "hello")
+    first.close()
+    second = TranscriptCache(path=path)
+    assert second.get("k", disk=False) is None
+    assert second.get("k") == "hello"
+    assert second.get("k", disk=False) == "hello"  # promoted to memory
+    assert second.stats()["disk_hits"] == 1
+
+def test_expired_disk_entries_ignored():
+    path = os.path.join(tempfile.mkdtemp(), "transcripts.db")
+    TranscriptCache(path=path, ttl=0.0001).put("k", "old")
+    time.sleep(0.01)
+    assert TranscriptCache(path=path, ttl=0.0001).get("k") is None
+
+def test_disabled_cache_stores_nothing():
+    cache = TranscriptCache(maxsize=0)
+    cache.put("k", "v")
+    assert cache.get("k") is None
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,152 @@
+"""transcript_cache.py
+Content-addressed transcript cache
+----------------------------------
+Retried submissions (the Streamlit "Send & Get Feedback" button, client
+retries on /api/conversation/process) re-upload the same recording. The
+cache key is a BLAKE2b digest of the normalised 16 kHz mono PCM, so the
+same speech re-encoded by the browser still hits; model_service also
+stores a raw-bytes alias so byte-identical retries skip decoding. The
+language code and ASR model are part of the key.
+
+Tiers:
+- memory : LRU bounded by entry count (always on)
+- disk   : SQLite file shared across restarts/workers (TRANSCRIPT_CACHE_DB), or
+           Redis shared across boxes (TRANSCRIPT_CACHE_DB=redis://...)
+
+Env vars:
+  TRANSCRIPT_CACHE_SIZE=1024 (0 disables)   TRANSCRIPT_CACHE_DB=   (unset = memory only)
+  TRANSCRIPT_CACHE_TTL=604800
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from shared_state import is_redis_url, redis_client
+
+def audio_key(pcm_or_bytes, language_code: str, model: str) -> str:
+    """BLAKE2b-128 over the audio, then language and model: '<hex>:<lang>:<model>'."""
+    data = pcm_or_bytes.tobytes() if hasattr(pcm_or_bytes, "tobytes") else pcm_or_bytes
+    return f"{hashlib.blake2b(data, digest_size=16).hexdigest()}:{language_code}:{model}"
+
+REDIS_PREFIX = "transcript:"
+
+class TranscriptCache:
+    """Two-tier transcript cache; all methods are thread-safe."""
+
+    def __init__(self, maxsize: int = 1024, path: str | None = None, ttl: float = 7 * 24 * 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        self._conn = self._redis = None
+        if is_redis_url(path):
+            self._redis = redis_client(path)
+        elif path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS transcripts (
+                key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)""")
+            self._conn.commit()
+            self._db_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def _remember(self, key: str, text: str) -> None:
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, disk: bool = True, final: bool = True) -> str | None:
+        """Memory first, then (if `disk`) the SQLite tier; disk hits are promoted to memory.
+
+        Pass `final=False` for a probe that will be followed by another lookup, so one
+        request that misses is counted as one miss.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+        if disk and self._conn is not None:
+            with self._db_lock:
+                row = self._conn.execute("SELECT text, created_at FROM transcripts WHERE key = ?",
+                                         (key,)).fetchone()
+            if row is not None and (not self.ttl or time.time() - row[1] <= self.ttl):
+                self._remember(key, row[0])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[0]
+        if disk and self._redis is not None:
+            text = self._redis.get(REDIS_PREFIX + key)
+            if text is not None:
+                self._remember(key, text)
+                with self._lock:
+                    self.disk_hits += 1
+                return text
+        if final:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        if not self.enabled:
+            return
+        self._remember(key, text)
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.execute("INSERT OR REPLACE INTO transcripts (key, text, created_at) VALUES (?, ?, ?)",
+                                   (key, text, time.time()))
+                if self.ttl:
+                    self._conn.execute("DELETE FROM transcripts WHERE created_at < ?", (time.time() - self.ttl,))
+                self._conn.commit()
+        if self._redis is not None:
+            self._redis.set(REDIS_PREFIX + key, text, ex=int(self.ttl) or None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.execute("DELETE FROM transcripts")
+                self._conn.commit()
+        if self._redis is not None:
+            for key in self._redis.scan_iter(REDIS_PREFIX + "*"):
+                self._redis.delete(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "disk": self._conn is not None or self._redis is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def make_transcript_cache() -> TranscriptCache:
+    """Build the cache from TRANSCRIPT_CACHE_* env vars."""
+    return TranscriptCache(
+        maxsize=int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1024")),
+        path=os.getenv("TRANSCRIPT_CACHE_DB") or None,
+        ttl=float(os.getenv("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 3600))),
+    )